@@ -0,0 +1,212 @@
+# Orthogonal polynomials by three-term recurrence on arrays.
+#
+# hermite.ipynb and HydrogenAtom.laguerre build the coefficient vector of a
+# single degree and evaluate it with np.polyval. The coefficients grow
+# factorially and alternate in sign, so the sum cancels catastrophically and
+# overflows long before degree 500. Here every function runs the recurrence
+# directly on the values, which is stable, and returns all degrees 0..n in
+# one pass as an array of shape (n + 1,) + x.shape.
+#
+# The normalised variants (hermite_functions, laguerre_functions and
+# legendre with normalised=True) carry the normalisation through the
+# recurrence, so the values stay of order one at any degree.
+
+import numpy as np
+from scipy.special import gammaln, xlogy
+
+
+def _check_degree(n):
+    if np.logical_or(round(n) - n != 0, n < 0):
+        raise ValueError('n must be a non-negative integer')
+    return int(n)
+
+
+def _output(n, x, out):
+    shape = (n + 1,) + x.shape
+    if out is None:
+        return np.empty(shape)
+    if out.shape != shape:
+        raise ValueError(f'out must have shape {shape}')
+    return out
+
+
+def hermite(n, x, out=None):
+    """
+    Physicists' Hermite polynomials H_0..H_n.
+
+    H_{k+1} = 2x H_k - 2k H_{k-1}. The values themselves overflow a double
+    for large n and x, use hermite_functions for high degrees.
+
+    n = highest degree                              [int]
+    x = points                                      [array]
+    out = optional output array of shape (n + 1,) + x.shape
+
+    returns H with H[k] = H_k(x)
+    """
+    n = _check_degree(n)
+    x = np.asarray(x, dtype=float)
+    H = _output(n, x, out)
+    H[0] = 1
+    if n > 0:
+        np.multiply(2, x, out=H[1, ...])
+    for k in range(1, n):
+        np.multiply(H[1], H[k], out=H[k + 1, ...])
+        H[k + 1] -= 2*k*H[k - 1]
+    return H
+
+
+def hermite_functions(n, x, out=None):
+    """
+    Normalised Hermite functions psi_0..psi_n.
+
+    psi_k(x) = H_k(x) exp(-x^2/2)/sqrt(2^k k! sqrt(pi)), the harmonic
+    oscillator eigenfunctions in units of the oscillator length, from
+    psi_{k+1} = sqrt(2/(k+1)) x psi_k - sqrt(k/(k+1)) psi_{k-1}.
+
+    returns psi with psi[k] = psi_k(x), orthonormal on the real line
+    """
+    n = _check_degree(n)
+    x = np.asarray(x, dtype=float)
+    psi = _output(n, x, out)
+    psi[0] = np.pi**-0.25*np.exp(-x**2/2)
+    if n > 0:
+        np.multiply(np.sqrt(2)*x, psi[0], out=psi[1, ...])
+    for k in range(1, n):
+        np.multiply(x, psi[k], out=psi[k + 1, ...])
+        psi[k + 1] *= np.sqrt(2/(k + 1))
+        psi[k + 1] -= np.sqrt(k/(k + 1))*psi[k - 1]
+    return psi
+
+
+def laguerre(n, alpha, x, out=None):
+    """
+    Generalised Laguerre polynomials L_0^alpha..L_n^alpha.
+
+    (k+1) L_{k+1} = (2k + 1 + alpha - x) L_k - (k + alpha) L_{k-1}
+
+    n = highest degree                              [int]
+    alpha = order, > -1                             [float]
+    x = points                                      [array]
+
+    returns L with L[k] = L_k^alpha(x), same convention as
+    HydrogenAtom.laguerre and scipy.special.eval_genlaguerre
+    """
+    n = _check_degree(n)
+    x = np.asarray(x, dtype=float)
+    L = _output(n, x, out)
+    L[0] = 1
+    if n > 0:
+        np.subtract(1 + alpha, x, out=L[1, ...])
+    for k in range(1, n):
+        np.subtract(2*k + 1 + alpha, x, out=L[k + 1, ...])
+        L[k + 1] *= L[k]
+        L[k + 1] -= (k + alpha)*L[k - 1]
+        L[k + 1] /= k + 1
+    return L
+
+
+def laguerre_functions(n, alpha, x, out=None):
+    """
+    Normalised Laguerre functions l_0..l_n.
+
+    l_k(x) = sqrt(k!/Gamma(k + alpha + 1)) x^(alpha/2) exp(-x/2) L_k^alpha(x),
+    orthonormal on [0, inf), as needed for the radial hydrogen wave
+    functions at large n.
+
+    returns l with l[k] = l_k(x)
+
+    exp(-x/2) underflows for x > ~1400 while the high degrees are still of
+    order one up to x ~ 4n, so there the recurrence runs on l_k exp(shift)
+    and the shift is reduced whenever the values grow large, and removed at
+    the end.
+    """
+    n = _check_degree(n)
+    x = np.asarray(x, dtype=float)
+    l = _output(n, x, out)
+    # x^(alpha/2) is 1 at x = 0 for alpha = 0, where alpha/2*log(x) would be 0*-inf
+    log_l0 = xlogy(alpha/2, x) - x/2 - gammaln(alpha + 1)/2
+    shift = np.where(np.isfinite(log_l0), np.maximum(-log_l0 - 600, 0), 0)
+    l[0] = np.exp(log_l0 + shift)
+    scaled = np.flatnonzero(shift)
+    segments = [(0, shift)]             # rows from k on carry exp(shift)
+
+    if n > 0:
+        np.subtract(1 + alpha, x, out=l[1, ...])
+        l[1] *= l[0]/np.sqrt(1 + alpha)
+    for k in range(1, n):
+        # ratios of the normalisation constants c_{k+1}/c_k and c_{k+1}/c_{k-1}
+        r1 = np.sqrt((k + 1)/(k + alpha + 1))
+        r2 = np.sqrt((k + 1)*k/((k + alpha + 1)*(k + alpha)))
+        np.subtract(2*k + 1 + alpha, x, out=l[k + 1, ...])
+        l[k + 1] *= l[k]
+        l[k + 1] *= r1
+        l[k + 1] -= (k + alpha)*r2*l[k - 1]
+        l[k + 1] /= k + 1
+
+        if scaled.size:
+            big = np.abs(l[k + 1, ...].flat[scaled]) > 1e250
+            if big.any():
+                shift = shift.copy()
+                idx = scaled[big]
+                d = np.minimum(shift.flat[idx], np.log(np.abs(l[k + 1, ...].flat[idx])))
+                shift.flat[idx] -= d
+                l[k, ...].flat[idx] *= np.exp(-d)
+                l[k + 1, ...].flat[idx] *= np.exp(-d)
+                segments.append((k, shift))
+                scaled = np.flatnonzero(shift)
+
+    bounds = [k for k, _ in segments[1:]] + [n + 1]
+    for (start, s), stop in zip(segments, bounds):
+        if s.any():
+            l[start:stop] *= np.exp(-s)
+    return l
+
+
+def legendre(n, m, x, normalised=False, out=None):
+    """
+    Associated Legendre functions P_l^m for l = 0..n.
+
+    The recurrence runs on the normalised functions
+        Pbar_l^m = sqrt((2l+1)/(4 pi) (l-m)!/(l+m)!) P_l^m,
+    for which Y_lm = Pbar_l^m(cos theta) exp(i m phi), starting from
+    Pbar_m^m and Pbar_{m+1}^m = sqrt(2m+3) x Pbar_m^m. Entries with l < |m|
+    are zero. The Condon-Shortley phase (-1)^m is included, as in
+    scipy.special.lpmv.
+
+    n = highest degree l                            [int]
+    m = order, |m| <= n                             [int]
+    x = points in [-1, 1]                           [array]
+    normalised = return Pbar_l^m instead of P_l^m. P_l^m itself overflows
+        for large l and m.
+
+    returns P with P[l] = P_l^m(x)
+    """
+    n = _check_degree(n)
+    if round(m) - m != 0 or abs(m) > n:
+        raise ValueError('m must be an integer with abs(m) <= n')
+    m_abs = abs(int(m))
+    x = np.asarray(x, dtype=float)
+    P = _output(n, x, out)
+    P[:m_abs] = 0
+
+    # Pbar_m^m = (-1)^m sqrt((2m+1)/(4pi) prod (2k-1)/(2k)) (1-x^2)^(m/2)
+    k = np.arange(1, m_abs + 1)
+    log_c = 0.5*(np.log((2*m_abs + 1)/(4*np.pi)) + np.sum(np.log((2*k - 1)/(2*k))))
+    P[m_abs] = (-1)**m_abs*np.exp(log_c)*(1 - x**2)**(m_abs/2)
+    if m_abs < n:
+        np.multiply(np.sqrt(2*m_abs + 3)*x, P[m_abs], out=P[m_abs + 1, ...])
+    for l in range(m_abs + 2, n + 1):
+        a = np.sqrt((4*l**2 - 1)/(l**2 - m_abs**2))
+        a_prev = np.sqrt((4*(l - 1)**2 - 1)/((l - 1)**2 - m_abs**2))
+        np.multiply(x, P[l - 1], out=P[l, ...])
+        P[l] -= P[l - 2]/a_prev
+        P[l] *= a
+
+    if m < 0:
+        # Pbar_l^{-m} = (-1)^m Pbar_l^m
+        P *= (-1)**m_abs
+    if not normalised:
+        l = np.arange(m_abs, n + 1)
+        log_norm = 0.5*(np.log((2*l + 1)/(4*np.pi)) + gammaln(l - m + 1) - gammaln(l + m + 1))
+        P[m_abs:] /= np.exp(log_norm).reshape((-1,) + (1,)*x.ndim)
+    return P
@@ -0,0 +1,145 @@
+# Benchmark of orthopoly against the coefficient + polyval functions of
+# hermite.ipynb and HydrogenAtom.py, numba and scipy.special.
+#
+# Run from this folder:  python orthopoly_benchmark.py [n_points] [degree]
+# Every timing is the best of `repeat` runs on the same fixed grid, so the
+# numbers are reproducible up to machine load. Accuracy is the largest
+# relative deviation from scipy.special at the chosen degree, and the
+# stability section goes to degree 500, where the coefficient method fails.
+
+import sys
+import timeit
+import numpy as np
+from scipy import special
+
+import orthopoly
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import HydrogenAtom             # needs numba and matplotlib
+except ImportError:
+    HydrogenAtom = None
+
+
+def hermite_polyval(n, x):
+    # Coefficient recurrence and polyval, as in hermite.ipynb
+    hp_l = np.zeros(n + 1)
+    hp_u = np.zeros(n + 1)
+    if n == 0:
+        hp = np.ones(1)
+    elif n == 1:
+        hp = np.array([0.0, 2.0])
+    else:
+        hp_l[0] = 1.0
+        hp_u[1] = 2.0
+        for m in range(2, n + 1):
+            hp = 2*(np.concatenate(([0], hp_u[0:n])) - (m - 1)*hp_l)
+            hp_l, hp_u = hp_u, hp
+    return np.polyval(np.flipud(hp), x)
+
+
+if njit is not None:
+    @njit(cache=True)
+    def hermite_numba(n, x):
+        # Value recurrence for a single degree, one point at a time
+        y = np.empty_like(x)
+        for i in range(x.size):
+            h0, h1 = 1.0, 2*x[i]
+            if n == 0:
+                h1 = h0
+            for k in range(1, n):
+                h0, h1 = h1, 2*x[i]*h1 - 2*k*h0
+            y[i] = h1
+        return y
+
+
+def best_time(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def relative_error(values, reference):
+    return np.max(np.abs(values - reference))/np.max(np.abs(reference))
+
+
+def report(name, seconds, error=None):
+    err = '' if error is None else f'{error:12.1e}'
+    print(f'  {name:<42}{seconds*1e3:10.1f} ms{err}')
+
+
+def run(n_points=10**6, degree=50, repeat=3):
+    x = np.linspace(0, 1, n_points)
+    coeffs = np.zeros(degree + 1)
+    coeffs[degree] = 1
+    print(f'{n_points} points, degree {degree}, best of {repeat}\n'
+          f'  {"":<42}{"time":>13}{"rel. error":>12}')
+
+    print('Hermite H_n')
+    ref = special.eval_hermite(degree, x)
+    report('scipy.special.eval_hermite (degree n)', best_time(lambda: special.eval_hermite(degree, x), repeat))
+    report('np.polynomial.hermite.hermval (degree n)', best_time(lambda: np.polynomial.hermite.hermval(x, coeffs), repeat),
+           relative_error(np.polynomial.hermite.hermval(x, coeffs), ref))
+    report('hermite.ipynb polyval (degree n)', best_time(lambda: hermite_polyval(degree, x), repeat),
+           relative_error(hermite_polyval(degree, x), ref))
+    if njit is not None:
+        hermite_numba(degree, x[:10])               # compile outside the timing
+        report('numba recurrence (degree n)', best_time(lambda: hermite_numba(degree, x), repeat),
+               relative_error(hermite_numba(degree, x), ref))
+    out = np.empty((degree + 1, n_points))
+    report('orthopoly.hermite (all degrees 0..n)', best_time(lambda: orthopoly.hermite(degree, x, out), repeat),
+           relative_error(out[degree], ref))
+    report('orthopoly.hermite_functions (all degrees)', best_time(lambda: orthopoly.hermite_functions(degree, x, out), repeat))
+
+    alpha = 3
+    print(f'Generalised Laguerre L_n^{alpha}')
+    xl = 10*x
+    ref = special.eval_genlaguerre(degree, alpha, xl)
+    report('scipy.special.eval_genlaguerre (degree n)', best_time(lambda: special.eval_genlaguerre(degree, alpha, xl), repeat))
+    if HydrogenAtom is not None:
+        report('HydrogenAtom.laguerre (degree n)', best_time(lambda: HydrogenAtom.laguerre(degree, alpha, xl), repeat),
+               relative_error(HydrogenAtom.laguerre(degree, alpha, xl), ref))
+    report('orthopoly.laguerre (all degrees 0..n)', best_time(lambda: orthopoly.laguerre(degree, alpha, xl, out), repeat),
+           relative_error(out[degree], ref))
+    report('orthopoly.laguerre_functions (all degrees)', best_time(lambda: orthopoly.laguerre_functions(degree, alpha, xl, out), repeat))
+
+    m = 2
+    print(f'Associated Legendre P_n^{m}')
+    xs = 2*x - 1
+    ref = special.lpmv(m, degree, xs)
+    report('scipy.special.lpmv (degree n)', best_time(lambda: special.lpmv(m, degree, xs), repeat))
+    report('orthopoly.legendre (all degrees 0..n)', best_time(lambda: orthopoly.legendre(degree, m, xs, out=out), repeat),
+           relative_error(out[degree], ref))
+
+    # Degree 500, where coefficients and plain polynomial values break down
+    print('Stability at degree 500')
+    n = 500
+    y = np.linspace(-40, 40, 40001)
+    psi = orthopoly.hermite_functions(n, y)
+    norms = np.sum(psi**2, axis=1)*(y[1] - y[0])
+    print(f'  hermite_functions: max |norm - 1| over degrees 0..{n} = {np.max(np.abs(norms - 1)):.1e}, '
+          f'<psi_{n}|psi_{n - 2}> = {np.sum(psi[n]*psi[n - 2])*(y[1] - y[0]):.1e}')
+    with np.errstate(all='ignore'):
+        poly = hermite_polyval(n, y[::1000])*np.exp(-y[::1000]**2/2)
+    print(f'  hermite.ipynb polyval at degree {n}: {np.count_nonzero(~np.isfinite(poly))} of {poly.size} values not finite')
+
+    xl = np.array([0.5, 5, 50, 300])
+    ref = special.eval_genlaguerre(n, alpha, xl)
+    print(f'  laguerre: rel. error {relative_error(orthopoly.laguerre(n, alpha, xl)[n], ref):.1e} '
+          f'against scipy.special.eval_genlaguerre')
+    if HydrogenAtom is not None:
+        with np.errstate(all='ignore'):
+            print(f'  HydrogenAtom.laguerre: rel. error '
+                  f'{relative_error(HydrogenAtom.laguerre(n, alpha, xl), ref):.1e}')
+
+    xs = np.linspace(-1, 1, 11)
+    P = orthopoly.legendre(n, 7, xs, normalised=True)
+    ref = special.sph_legendre_p(np.arange(n + 1)[:, None], 7, np.arccos(xs))
+    print(f'  legendre (normalised): max abs error {np.max(np.abs(P - ref)):.1e} against scipy.special.sph_legendre_p')
+
+
+if __name__ == "__main__":
+    args = [int(float(a)) for a in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,33 @@
+# Tests of orthopoly against scipy.special (python -m pytest).
+
+import numpy as np
+import pytest
+from scipy import special
+
+import orthopoly
+
+K = np.arange(4)
+
+
+def test_laguerre_functions_at_zero():
+    # x^(alpha/2) = 1 at x = 0 for alpha = 0, so l_k(0) = L_k(0) = 1
+    l = orthopoly.laguerre_functions(3, 0, [0., 1.])
+    assert np.all(np.isfinite(l))
+    assert np.allclose(l[:, 0], 1)
+    assert np.allclose(orthopoly.laguerre_functions(3, 1.5, [0.])[:, 0], 0)
+
+
+@pytest.mark.parametrize('function, expected', [
+    (lambda x: orthopoly.hermite(3, x), lambda x: special.eval_hermite(K, x)),
+    (lambda x: orthopoly.hermite_functions(3, x), None),
+    (lambda x: orthopoly.laguerre(3, 0.5, x), lambda x: special.eval_genlaguerre(K, 0.5, x)),
+    (lambda x: orthopoly.laguerre_functions(3, 0.5, x), None),
+    (lambda x: orthopoly.legendre(3, 1, x), lambda x: special.lpmv(1, K, x)),
+])
+def test_scalar_x(function, expected):
+    # a scalar gives the column of a one-point array, shape (n + 1,)
+    values = function(0.5)
+    assert values.shape == (4,)
+    assert np.allclose(values, function(np.array([0.5]))[:, 0])
+    if expected is not None:
+        assert np.allclose(values, expected(0.5))
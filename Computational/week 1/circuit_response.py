@@ -0,0 +1,126 @@
+# %%
+# Frequency response of the Elliptic filter from Elliptic_Initial_Test.ipynb.
+# The 9x9 nodal matrix is assembled for every angular frequency (and every
+# set of component values) as one stacked array and solved in a single
+# batched np.linalg.solve, instead of row by row inside a frequency loop.
+
+import numpy as np
+
+# Nominal component values, as in the notebook
+NOMINAL = dict(
+    R1=8.4e5, R2=8.4e5, R3=4.7e5, R4=8.4e5, R5=1e4, R6=1e4,   # Ohms
+    C1=4.7e-10, C2=4.7e-10, C3=5*4.7e-10, C4=15*4.7e-10,       # Farads
+)
+
+# Input vector, the source drives equation 5
+VIN = np.array([0, 0, 0, 0, 0, -1, 0, 0, 0], dtype=complex)
+
+
+def nodal_matrices(w, R1, R2, R3, R4, R5, R6, C1, C2, C3, C4):
+    """
+    Assemble the nodal matrices for all frequencies at once.
+
+    w = angular frequencies                         [array, shape (F,)]
+    R1..R6, C1..C4 = component values               [float or array, shape (B,)]
+
+    returns M with shape (B, F, 9, 9), or (F, 9, 9) for scalar components
+    """
+    w = np.asarray(w, dtype=float)
+    comps = np.broadcast_arrays(*[np.asarray(c, dtype=float)[..., None]
+                                  for c in (R1, R2, R3, R4, R5, R6, C1, C2, C3, C4)])
+    R1, R2, R3, R4, R5, R6, C1, C2, C3, C4 = comps
+
+    # broadcasted impedances, shape (..., F)
+    ZC1 = 1/(1j*w*C1)
+    ZC2 = 1/(1j*w*C2)
+    ZC3 = 1/(1j*w*C3)
+    ZC4 = 1/(1/R4 + 1j*w*C4)
+
+    shape = np.broadcast_shapes(ZC1.shape, R1.shape)
+    M = np.zeros(shape + (9, 9), dtype=complex)
+    M[..., 0, 7] = 1
+    M[..., 0, 8] = -R5/(R5 + R6)
+    M[..., 1, 0], M[..., 1, 1], M[..., 1, 2], M[..., 1, 3] = R1, R2, ZC1, ZC2
+    M[..., 2, 0], M[..., 2, 1], M[..., 2, 4] = 1, -1, 1
+    M[..., 3, 1], M[..., 3, 3], M[..., 3, 7] = ZC4, -ZC4, -1
+    M[..., 4, 2], M[..., 4, 3], M[..., 4, 6] = -R3, R3, -1
+    M[..., 5, 0], M[..., 5, 5] = -R1, -1
+    M[..., 6, 1], M[..., 6, 5], M[..., 6, 7] = -R2, 1, -1
+    M[..., 7, 3], M[..., 7, 6], M[..., 7, 7] = -ZC2, -1, 1
+    M[..., 8, 4], M[..., 8, 5], M[..., 8, 8] = -ZC3, -1, 1
+    return M
+
+
+def elliptic_response(w, chunk_elements=2**22, **components):
+    """
+    Output voltage Vout[8] of the Elliptic filter for every frequency.
+
+    w = angular frequencies                         [array, shape (F,)]
+    chunk_elements = max matrix entries per solve   [int]
+    **components = R1..R6, C1..C4 overrides         [float or array, shape (B,)]
+        missing values are taken from NOMINAL
+
+    returns Vout with shape (B, F), or (F,) for scalar components
+    """
+    values = {**NOMINAL, **components}
+    names = list(NOMINAL)
+    batch = np.broadcast_shapes(*[np.shape(values[k]) for k in names])
+    flat = {k: np.broadcast_to(values[k], batch).ravel() for k in names}
+    n_batch = int(np.prod(batch))
+    w = np.atleast_1d(np.asarray(w, dtype=float))
+
+    # solve a block of component sets at a time to bound the (B, F, 9, 9) stack
+    block = max(1, chunk_elements//(81*w.size))
+    Vout = np.empty((n_batch, w.size), dtype=complex)
+    for i in range(0, n_batch, block):
+        M = nodal_matrices(w, **{k: v[i:i + block] for k, v in flat.items()})
+        rhs = np.broadcast_to(VIN, M.shape[:-1])[..., None]
+        Vout[i:i + block] = np.linalg.solve(M, rhs)[..., 8, 0]
+    return Vout.reshape(batch + (w.size,))
+
+
+def tolerance_samples(n, tol_R=0.01, tol_C=0.05, rng=None):
+    """
+    Monte-Carlo component values, uniform within the given relative tolerances.
+
+    n = number of circuits                          [int]
+    tol_R, tol_C = relative tolerances              [float]
+
+    returns dict of arrays of shape (n,), ready for elliptic_response(w, **values)
+    """
+    rng = np.random.default_rng(rng)
+    values = {}
+    for k, v in NOMINAL.items():
+        tol = tol_R if k.startswith('R') else tol_C
+        values[k] = v*(1 + tol*rng.uniform(-1, 1, size=n))
+    return values
+
+
+# %%
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    w_v = np.logspace(0, 4, 100)*2*np.pi
+    Vout_final = elliptic_response(w_v)
+
+    # Monte-Carlo tolerance analysis, 1000 circuits x 10^4 frequencies
+    w_mc = np.logspace(0, 4, 10**4)*2*np.pi
+    start = time.perf_counter()
+    Vout_mc = elliptic_response(w_mc, **tolerance_samples(1000, rng=0))
+    print(f'{Vout_mc.size} responses in {time.perf_counter() - start:.2f} s')
+    gain = np.abs(Vout_mc)
+    low, high = np.percentile(gain, [2.5, 97.5], axis=0)
+
+    plt.figure(1)
+    plt.fill_between(w_mc/(2*np.pi), low, high, alpha=0.4, label='95% of circuits')
+    plt.loglog(w_v/(2*np.pi), np.absolute(Vout_final), label='Nominal')
+    plt.xlabel('Frequency (Hz)')
+    plt.ylabel('Amplitude(V/V)')
+    plt.legend()
+
+    plt.figure(2)
+    plt.semilogx(w_v/(2*np.pi), np.angle(Vout_final))
+    plt.xlabel('Frequency (Hz)')
+    plt.ylabel('Phase(rads)')
+    plt.show()
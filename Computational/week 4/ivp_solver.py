@@ -0,0 +1,273 @@
+# %%
+# Ensemble initial value problem solvers for IVP_practical_problem.ipynb.
+# The state of every member of an ensemble (different initial conditions,
+# parameters or step sizes) is one NumPy array whose first axis runs over
+# the members, so each step is a few array operations instead of a Python
+# loop with list appends per member. Euler and RK4 write into preallocated
+# output arrays; Dormand-Prince 5(4) adapts the step size of each member
+# separately and only keeps iterating the members that have not reached
+# t_end yet.
+#
+# f(t, y, *args) must work on the ensemble: y has shape (M, ...) and t is
+# either a scalar or an array shaped (M, 1, ...) so it broadcasts against y.
+# Arguments whose first axis has length M are treated as per-member values.
+
+import numpy as np
+import scipy.stats
+
+
+def dy_dt(t, y, k=2.3):
+    return -k*y
+
+
+def exact_soln(t, k=2.3):
+    return np.exp(-k*t)
+
+
+def euler_step(f, t, y, h, args=()):
+    return y + h*f(t, y, *args)
+
+
+def rk4_step(f, t, y, h, args=()):
+    k1 = f(t, y, *args)
+    k2 = f(t + h/2, y + h/2*k1, *args)
+    k3 = f(t + h/2, y + h/2*k2, *args)
+    k4 = f(t + h, y + h*k3, *args)
+    return y + h/6*(k1 + 2*k2 + 2*k3 + k4)
+
+
+STEPPERS = {'euler': euler_step, 'rk4': rk4_step}
+
+# Dormand-Prince 5(4) Butcher tableau
+DP_C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+DP_B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+DP_E = DP_B - np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+
+def _column(v, ndim):
+    # reshape a per-member array to broadcast against a state of ndim axes
+    return np.reshape(v, np.shape(v) + (1,)*(ndim - np.ndim(v)))
+
+
+def _members(args, index, n):
+    # select members from the per-member arguments
+    return tuple(a[index] if np.ndim(a) > 0 and np.shape(a)[0] == n else a for a in args)
+
+
+def integrate(f, y0, t_span, n_steps, method='rk4', args=(), dense=True):
+    """
+    Fixed step integration of an ensemble.
+
+    f = right hand side f(t, y, *args)
+    y0 = initial states                     [array, shape (M, ...)]
+    t_span = (t_0, t_end)
+    n_steps = number of steps               [int]
+    method = 'euler' or 'rk4'
+    args = extra arguments of f, per member if the first axis has length M
+    dense = keep every step, otherwise only the end state
+
+    returns t (shape (n_steps + 1,)) and y (shape (n_steps + 1, M, ...)),
+    or t_end and the end states if dense is False
+    """
+    step = STEPPERS[method]
+    y_n = np.array(y0, dtype=float)
+    t = np.linspace(t_span[0], t_span[1], n_steps + 1)
+    h = (t_span[1] - t_span[0])/n_steps
+
+    if dense:
+        y = np.empty((n_steps + 1,) + y_n.shape)
+        y[0] = y_n
+    for i in range(n_steps):
+        y_n = step(f, t[i], y_n, h, args)
+        if dense:
+            y[i + 1] = y_n
+    return (t, y) if dense else (t[-1], y_n)
+
+
+def integrate_steps(f, y0, t_span, n_steps, method='rk4', args=()):
+    """
+    End states for several step counts in one ensemble run.
+
+    Member j is integrated with n_steps[j] steps of size
+    (t_end - t_0)/n_steps[j]. All members advance together and a member
+    drops out of the ensemble once it has taken its steps.
+
+    y0 = initial state, shared by all members   [array]
+    n_steps = step counts                       [array of int, shape (K,)]
+
+    returns end states, shape (K, ...)
+    """
+    step = STEPPERS[method]
+    n_steps = np.asarray(n_steps, dtype=int)
+    y0 = np.asarray(y0, dtype=float)
+    y_end = np.empty(n_steps.shape + y0.shape)
+    ndim = y0.ndim + 1
+
+    # sort by step count so the active members are always a leading slice
+    order = np.argsort(n_steps)
+    counts = n_steps[order]
+    h = (t_span[1] - t_span[0])/counts
+    y_n = np.broadcast_to(y0, y_end.shape).copy()
+    args = _members(args, order, n_steps.size)
+
+    start = 0
+    for i in range(counts[-1]):
+        # members with n_steps == i are finished
+        done = np.searchsorted(counts, i, side='right')
+        if done > start:
+            y_end[order[start:done]] = y_n[:done - start]
+            y_n = y_n[done - start:]
+            args = _members(args, slice(done - start, None), counts.size - start)
+            start = done
+        t_i = _column(t_span[0] + i*h[start:], ndim)
+        y_n = step(f, t_i, y_n, _column(h[start:], ndim), args)
+    y_end[order[start:]] = y_n
+    return y_end
+
+
+def dormand_prince(f, y0, t_span, rtol=1e-6, atol=1e-9, h0=None, args=(), max_steps=10**5):
+    """
+    Adaptive Dormand-Prince 5(4) integration of an ensemble.
+
+    Each member has its own step size, chosen from its own error estimate.
+    Accepted steps reuse the last stage as the first stage of the next step
+    (FSAL), and members that reach t_end leave the ensemble.
+
+    y0 = initial states                     [array, shape (M, ...)]
+    rtol, atol = error tolerances
+    h0 = initial step size, default 1% of the interval
+
+    returns end states (shape (M, ...)), accepted and rejected step counts
+    per member
+    """
+    y = np.array(y0, dtype=float)
+    n = y.shape[0]
+    ndim = y.ndim
+    t0, t_end = t_span
+    direction = np.sign(t_end - t0)
+    h0 = 0.01*abs(t_end - t0) if h0 is None else abs(h0)
+
+    y_end = np.empty_like(y)
+    accepted = np.zeros(n, dtype=int)
+    rejected = np.zeros(n, dtype=int)
+    active = np.arange(n)
+    t = np.full(n, float(t0))
+    h = np.full(n, h0*direction)
+    k1 = f(_column(t, ndim), y, *args)
+
+    for _ in range(max_steps):
+        a = _members(args, active, n)
+        h = direction*np.minimum(np.abs(h), np.abs(t_end - t))
+        hc = _column(h, ndim)
+        tc = _column(t, ndim)
+        k = [k1]
+        for s in range(1, 7):
+            y_s = y + hc*sum(c*k_j for c, k_j in zip(DP_A[s], k) if c != 0)
+            k.append(f(tc + DP_C[s]*hc, y_s, *a))
+        y_new = y_s                     # the 7th stage is at the 5th order solution
+        err = hc*sum(e*k_j for e, k_j in zip(DP_E, k) if e != 0)
+        scale = atol + rtol*np.maximum(np.abs(y), np.abs(y_new))
+        err = np.sqrt(np.mean((err/scale).reshape(y.shape[0], -1)**2, axis=1))
+
+        ok = err <= 1
+        accepted[active[ok]] += 1
+        rejected[active[~ok]] += 1
+        t = np.where(ok, t + h, t)
+        y = np.where(_column(ok, ndim), y_new, y)
+        k1 = np.where(_column(ok, ndim), k[6], k1)
+        with np.errstate(divide='ignore'):
+            factor = np.clip(0.9*err**-0.2, 0.2, 5)
+        h = h*np.where(ok, factor, np.minimum(factor, 1))
+
+        # members that reached t_end leave the ensemble
+        finished = ok & (np.abs(t_end - t) <= 1e-12*max(abs(t_end), 1))
+        if finished.any():
+            y_end[active[finished]] = y[finished]
+            keep = ~finished
+            active, t, h, y, k1 = active[keep], t[keep], h[keep], y[keep], k1[keep]
+        if active.size == 0:
+            break
+    else:
+        raise RuntimeError(f'{active.size} members did not reach t_end in {max_steps} steps')
+    return y_end, accepted, rejected
+
+
+def convergence_order(n_steps, errors, tail=5):
+    """
+    Power law fit error ~ N^slope to the last `tail` step counts.
+
+    returns the scipy.stats.linregress result, slope = -order
+    """
+    n_steps, errors = np.asarray(n_steps)[-tail:], np.asarray(errors)[-tail:]
+    return scipy.stats.linregress(np.log(n_steps), np.log(errors))
+
+
+# %%
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+    from scipy.integrate import solve_ivp
+
+    t_0, t_end = 0.0, 4.0
+    y_exact = exact_soln(t_end)
+
+    # Convergence study, every step count in one ensemble run
+    N_steps_array = 2**np.arange(1, 13)
+    for method in ('euler', 'rk4'):
+        y_end = integrate_steps(dy_dt, 1.0, (t_0, t_end), N_steps_array, method)
+        errors = np.abs(y_end - y_exact)
+        # leave out step counts that hit the round-off floor
+        above = errors > 1e-12
+        fit = convergence_order(N_steps_array[above], errors[above])
+        print(f"{method}: order {-fit.slope:.3f}")
+        plt.scatter(N_steps_array, errors, label=method)
+    plt.yscale('log')
+    plt.xscale('log')
+    plt.xlabel("$N$")
+    plt.ylabel(r"$|y_{\mathrm{final}}-y_{\mathrm{exact}}|$")
+    plt.legend()
+
+    # Ensemble of decay rates, dy/dt = -k y with k around 2.3
+    M = 10**5
+    k = np.random.default_rng(0).uniform(1, 4, M)
+    y0 = np.ones(M)
+    exact = np.exp(-k*t_end)
+
+    start = time.perf_counter()
+    _, y_rk4 = integrate(dy_dt, y0, (t_0, t_end), 400, 'rk4', args=(k,), dense=False)
+    t_rk4 = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_dp, accepted, rejected = dormand_prince(dy_dt, y0, (t_0, t_end), rtol=1e-8, atol=1e-12, args=(k,))
+    t_dp = time.perf_counter() - start
+
+    # solve_ivp one member at a time, timed on a subset
+    n_ref = 200
+    start = time.perf_counter()
+    y_ref = np.array([solve_ivp(dy_dt, (t_0, t_end), [1.0], args=(k_i,), method='RK45',
+                                rtol=1e-8, atol=1e-12).y[0, -1] for k_i in k[:n_ref]])
+    t_ref = (time.perf_counter() - start)*M/n_ref
+
+    # solve_ivp on the whole ensemble as one system (shared step size)
+    start = time.perf_counter()
+    y_sys = solve_ivp(dy_dt, (t_0, t_end), y0, args=(k,), method='RK45',
+                      rtol=1e-8, atol=1e-12).y[:, -1]
+    t_sys = time.perf_counter() - start
+
+    print(f"{M} members:")
+    print(f"  RK4, 400 steps         {t_rk4:7.3f} s, max error {np.max(np.abs(y_rk4 - exact)):.1e}")
+    print(f"  Dormand-Prince         {t_dp:7.3f} s, max error {np.max(np.abs(y_dp - exact)):.1e}, "
+          f"mean {accepted.mean():.1f} steps")
+    print(f"  solve_ivp per member   {t_ref:7.3f} s (estimated from {n_ref}), "
+          f"max error {np.max(np.abs(y_ref - exact[:n_ref])):.1e}")
+    print(f"  solve_ivp as a system  {t_sys:7.3f} s, max error {np.max(np.abs(y_sys - exact)):.1e}")
+    plt.show()
@@ -0,0 +1,135 @@
+# %%
+# Finite difference eigensolver for the 1D Schrodinger problems of
+# Harmonic_Oscillator.ipynb and Infinite_Square_Well_Potential.ipynb.
+# -hbar^2/2m d^2/dx^2 + V(x) on a uniform grid with psi = 0 at both ends is
+# a symmetric tridiagonal matrix, so the lowest k energies and eigenfunctions
+# come out of one eigh_tridiagonal (or sparse eigsh) call, without guessing
+# E_init for every state.
+#
+# Units as in the notebooks: x in nm, E and V in aJ, h in aJ s, m in kg.
+
+import numpy as np
+from scipy.linalg import eigh_tridiagonal
+from scipy import sparse
+from scipy.sparse.linalg import eigsh
+
+h = 6.62e-16            # Planck's constant in aJs
+hbar = h/(2*np.pi)
+m = 9.109e-31           # Electron mass in kgs
+
+
+def hamiltonian(V, x_start, x_end, n_points, mass=m, hbar=hbar):
+    """
+    Tridiagonal finite difference Hamiltonian on the interior grid points.
+
+    V = potential, function of x                   [callable]
+    x_start, x_end = interval, psi = 0 at both ends
+    n_points = number of interior grid points      [int]
+
+    returns x (interior points), diagonal and off diagonal of H
+    """
+    x, dx = np.linspace(x_start, x_end, n_points + 2, retstep=True)
+    x = x[1:-1]
+    t = hbar**2/(2*mass*dx**2)
+    diag = 2*t + np.broadcast_to(V(x), x.shape)
+    off = np.full(n_points - 1, -t)
+    return x, diag, off
+
+
+def eigenstates(V, x_start, x_end, k=10, n_points=2000, mass=m, hbar=hbar, method='tridiagonal'):
+    """
+    Lowest k energies and normalised eigenfunctions of H = -hbar^2/2m d^2 + V.
+
+    k = number of states                           [int]
+    n_points = number of interior grid points      [int]
+    method = 'tridiagonal' (eigh_tridiagonal) or 'sparse' (shift-invert eigsh)
+
+    returns E (shape (k,)), psi (shape (k, n_points + 2), including the
+    zero boundary values) and x (shape (n_points + 2,))
+    """
+    x, diag, off = hamiltonian(V, x_start, x_end, n_points, mass, hbar)
+    if method == 'tridiagonal':
+        E, vec = eigh_tridiagonal(diag, off, select='i', select_range=(0, k - 1))
+    elif method == 'sparse':
+        H = sparse.diags([off, diag, off], [-1, 0, 1], format='csc')
+        E, vec = eigsh(H, k=k, sigma=diag.min() - 2*abs(off[0]), which='LM')
+        order = np.argsort(E)
+        E, vec = E[order], vec[:, order]
+    else:
+        raise ValueError(f'unknown method {method!r}')
+
+    dx = x[1] - x[0]
+    psi = np.zeros((k, n_points + 2))
+    psi[:, 1:-1] = vec.T
+    # the end points are zero, so the trapezoid rule is a plain sum
+    psi /= np.sqrt(np.sum(psi**2, axis=1, keepdims=True)*dx)
+    # fix the arbitrary sign, the first lobe from the left is positive
+    first = np.argmax(np.abs(psi) > 1e-3*np.abs(psi).max(axis=1, keepdims=True), axis=1)
+    psi *= np.sign(psi[np.arange(k), first])[:, None]
+    return E, psi, np.concatenate([[x_start], x, [x_end]])
+
+
+def richardson(V, x_start, x_end, k=10, n_points=2000, mass=m, hbar=hbar):
+    """
+    Energies extrapolated to zero grid spacing.
+
+    The finite difference energies have an O(dx^2) error, so combining grid
+    spacings dx and dx/2 as (4 E(dx/2) - E(dx))/3 removes the leading term.
+
+    returns the extrapolated energies and the estimated error of E(dx/2)
+    """
+    E_1 = eigenstates(V, x_start, x_end, k, n_points, mass, hbar)[0]
+    E_2 = eigenstates(V, x_start, x_end, k, 2*n_points + 1, mass, hbar)[0]
+    E = (4*E_2 - E_1)/3
+    return E, np.abs(E_2 - E)
+
+
+# %%
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    # Harmonic oscillator, first 50 states
+    omega = 1e15
+    V0 = (1/2)*m*omega**2
+    oscillator = lambda x: V0*x**2
+    n = np.arange(50)
+    E_actual = hbar*omega*(n + 1/2)
+
+    start = time.perf_counter()
+    E, psi, x = eigenstates(oscillator, -6, 6, k=50, n_points=2000)
+    print(f"50 oscillator states in {(time.perf_counter() - start)*1e3:.1f} ms, "
+          f"max relative error {np.max(np.abs(E/E_actual - 1)):.1e}")
+
+    start = time.perf_counter()
+    E_sparse, _, _ = eigenstates(oscillator, -6, 6, k=50, n_points=2000, method='sparse')
+    print(f"sparse eigsh in {(time.perf_counter() - start)*1e3:.1f} ms, "
+          f"max difference {np.max(np.abs(E_sparse - E)):.1e} aJ")
+
+    E_rich, err = richardson(oscillator, -6, 6, k=50, n_points=1000)
+    print(f"Richardson: max relative error {np.max(np.abs(E_rich/E_actual - 1)):.1e}")
+
+    # Infinite square well, d = 1 nm
+    d = 1
+    E_well, psi_well, x_well = eigenstates(lambda x: 0*x, -d/2, d/2, k=5, n_points=1000)
+    E_well_rich, _ = richardson(lambda x: 0*x, -d/2, d/2, k=5, n_points=1000)
+    print('Square well energies =', E_well)
+    print('Richardson          =', E_well_rich)
+    print('Exact               =', (np.arange(1, 6)*h)**2/(8*m*d**2))
+
+    plt.figure(1)
+    for i in range(4):
+        plt.plot(x, psi[i] + E[i]/(hbar*omega), label=f'n = {i}')
+    plt.xlabel("x (nm)")
+    plt.ylabel(r"$\psi$ + E/$\hbar\omega$")
+    plt.grid()
+    plt.legend()
+
+    plt.figure(2)
+    plt.plot(x_well, psi_well[0], label='Numerical Solution')
+    plt.plot(x_well, np.sqrt(2/d)*np.cos(np.pi*x_well/d), '--', label='Exact Solution')
+    plt.xlabel("x (nm)")
+    plt.ylabel(r"$\psi$")
+    plt.grid()
+    plt.legend()
+    plt.show()
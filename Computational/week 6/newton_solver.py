@@ -0,0 +1,145 @@
+# %%
+# Vectorised Newton-Raphson (and Halley) root finding on arrays of starting
+# points, real or complex. Each point carries its own convergence flag and
+# only the points that have not converged are iterated further, so the cost
+# of an iteration shrinks as the basins fill in. This lets us map the basins
+# of attraction of f(x) = x^3 - x - 2 (newton-raphson-video.py) on the
+# complex plane at megapixel resolution.
+
+import numpy as np
+
+
+def f(x):
+    return x**3 - x - 2
+
+
+def df(x):
+    return 3 * x**2 - 1
+
+
+def d2f(x):
+    return 6 * x
+
+
+def newton(f, df, x0, d2f=None, tol=1e-12, max_iter=100):
+    """
+    Newton (or Halley, if d2f is given) iteration on every element of x0.
+
+    f, df, d2f = function and its derivatives, elementwise on arrays
+    x0 = starting points                        [array, real or complex]
+    tol = step size at which a point has converged
+    max_iter = maximum number of iterations
+
+    returns x (final points), n_iter (iterations used per point) and
+    converged (bool per point), all with the shape of x0
+    """
+    x0 = np.asarray(x0)
+    x = np.array(x0, dtype=np.result_type(x0.dtype, float))
+    shape = x.shape
+    x = x.ravel()
+    n_iter = np.zeros(x.size, dtype=np.int32)
+    converged = np.zeros(x.size, dtype=bool)
+
+    active = np.arange(x.size)          # indices still being iterated
+    xa = x.copy()
+    for it in range(1, max_iter + 1):
+        fx = f(xa)
+        dfx = df(xa)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if d2f is None:
+                step = fx / dfx
+            else:
+                step = 2 * fx * dfx / (2 * dfx**2 - fx * d2f(xa))
+        xa = xa - step
+
+        done = np.abs(step) < tol * np.maximum(np.abs(xa), 1)
+        bad = ~np.isfinite(xa)
+        finished = done | bad
+        # write back the points that stop here, keep iterating the rest
+        x[active[finished]] = xa[finished]
+        n_iter[active[finished]] = it
+        converged[active[done & ~bad]] = True
+        active = active[~finished]
+        xa = xa[~finished]
+        if active.size == 0:
+            break
+
+    x[active] = xa
+    n_iter[active] = max_iter
+    return x.reshape(shape), n_iter.reshape(shape), converged.reshape(shape)
+
+
+def find_roots(x, converged, tol=1e-6):
+    """
+    Distinct roots among the converged points: points within tol of
+    each other (np.isclose) are one root, whichever side of a rounding
+    boundary they fall on.
+
+    returns a sorted 1D array of roots
+    """
+    r = np.sort(x[converged])
+    roots = []
+    while r.size:
+        same = np.isclose(r, r[0], rtol=0, atol=tol)
+        roots.append(r[same].mean())
+        r = r[~same]
+    return np.array(roots, dtype=x.dtype)
+
+
+def root_index(x, converged, roots, tol=1e-6):
+    """
+    Index of the root in `roots` each point converged to, -1 if none.
+    """
+    dist = np.abs(x[..., None] - np.asarray(roots))
+    index = np.argmin(dist, axis=-1)
+    ok = converged & (np.min(dist, axis=-1) < tol)
+    return np.where(ok, index, -1)
+
+
+def basins(f, df, extent=(-2, 2, -2, 2), resolution=(1000, 1000), d2f=None,
+           roots=None, tol=1e-12, max_iter=100):
+    """
+    Basins of attraction of Newton's method on a complex grid.
+
+    extent = (re_min, re_max, im_min, im_max)
+    resolution = (n_re, n_im) pixels
+
+    returns index (root index per pixel, -1 = no convergence),
+    n_iter (iterations per pixel), roots (the roots found)
+    """
+    re = np.linspace(extent[0], extent[1], resolution[0])
+    im = np.linspace(extent[2], extent[3], resolution[1])
+    z0 = re[None, :] + 1j * im[:, None]
+    z, n_iter, converged = newton(f, df, z0, d2f=d2f, tol=tol, max_iter=max_iter)
+    if roots is None:
+        roots = find_roots(z, converged)
+    return root_index(z, converged, roots), n_iter, roots
+
+
+# %%
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    # Many real starting points at once, as opposed to the single x = -1.5
+    x, n_iter, converged = newton(f, df, np.linspace(-3, 3, 10**6))
+    print(f"real root {x[converged][0]:.12f}, {converged.mean()*100:.1f}% converged, "
+          f"mean {n_iter.mean():.1f} iterations")
+
+    extent = (-2, 2, -2, 2)
+    for name, second in (("Newton", None), ("Halley", d2f)):
+        start = time.perf_counter()
+        index, n_iter, roots = basins(f, df, extent, (1000, 1000), d2f=second)
+        print(f"{name}: 1000x1000 basins in {time.perf_counter() - start:.2f} s, "
+              f"roots {np.round(roots, 6)}, mean {n_iter.mean():.1f} iterations")
+
+    fig, ax = plt.subplots(1, 2, figsize=(12, 6))
+    ax[0].imshow(index, extent=extent, origin="lower", cmap="brg")
+    ax[0].set_title("Basins of attraction of $x^3 - x - 2$")
+    ax[1].imshow(np.log(n_iter), extent=extent, origin="lower", cmap="magma")
+    ax[1].set_title("log(iterations)")
+    for a in ax:
+        a.set_xlabel("Re(x)")
+        a.set_ylabel("Im(x)")
+    plt.savefig("newton_basins.png", dpi=200)
+    plt.show()
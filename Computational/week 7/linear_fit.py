@@ -0,0 +1,221 @@
+# %%
+# Least squares fast path for models that are linear in their parameters,
+# like quad_model in polynomial_fitting.py and polynomial_2D in ravelling.py.
+# curve_fit treats them as general nonlinear models and iterates
+# Levenberg-Marquardt. For f(x, p) = f(x, 0) + sum_j p_j phi_j(x) the basis
+# functions phi_j are found by evaluating the model once per parameter, the
+# design matrix is QR factorised once, and every dataset sampled on the same
+# x (or x, y) grid is then one triangular solve: thousands of spectra or
+# images are fitted with a single matrix product.
+
+import inspect
+import numpy as np
+from scipy.linalg import qr, solve_triangular
+from scipy.optimize import curve_fit
+
+
+def n_model_params(model):
+    # number of parameters after the independent variable, as curve_fit
+    parameters = inspect.signature(model).parameters.values()
+    if any(p.kind == inspect.Parameter.VAR_POSITIONAL for p in parameters):
+        raise ValueError('cannot determine the number of parameters of a model '
+                         'f(x, *parameters), give p0 (or n_params)')
+    return len(parameters) - 1
+
+
+def _batch_shape(shape, N):
+    # leading axes of a data stack whose trailing axes hold N points
+    for k in range(len(shape) - 1, -1, -1):
+        if np.prod(shape[k:]) == N:
+            return shape[:k]
+    raise ValueError(f'data of shape {shape} does not end in {N} points')
+
+
+def design_matrix(model, x, n_params=None):
+    """
+    Design matrix of a model linear in its parameters.
+
+    model = f(x, *p), output of any shape          [callable]
+    x = independent variable, anything model accepts (e.g. np.array((X, Y)))
+    n_params = number of parameters, default from the signature of model
+
+    returns A (shape (N, n_params)) and the offset f(x, 0) (shape (N,)),
+    so that f(x, p).ravel() = A @ p + offset
+    """
+    n_params = n_model_params(model) if n_params is None else n_params
+    offset = np.ravel(model(x, *np.zeros(n_params)))
+    A = np.empty((offset.size, n_params))
+    for j, e in enumerate(np.eye(n_params)):
+        A[:, j] = np.ravel(model(x, *e)) - offset
+    return A, offset
+
+
+def is_linear(model, x, n_params=None, n_trials=2, rtol=1e-9, rng=None):
+    """
+    Check that model(x, p) = A @ p + offset for random parameter vectors.
+    """
+    rng = np.random.default_rng(rng)
+    # nonlinear models may not be defined at p = 0 or the unit vectors
+    with np.errstate(all='ignore'):
+        A, offset = design_matrix(model, x, n_params)
+        if not (np.all(np.isfinite(A)) and np.all(np.isfinite(offset))):
+            return False
+        for _ in range(n_trials):
+            p = rng.normal(size=A.shape[1])
+            f = np.ravel(model(x, *p))
+            lin = A @ p + offset
+            if not np.allclose(f, lin, rtol=rtol, atol=rtol*np.max(np.abs(lin))):
+                return False
+    return True
+
+
+class LinearLeastSquares:
+    """
+    Weighted linear least squares with one QR factorisation per grid.
+
+    model = f(x, *p), linear in p                  [callable]
+    x = independent variable shared by all datasets
+    n_params = number of parameters, default from the signature of model
+    sigma = uncertainty of each data point         [float or array, shape (N,)]
+
+    Attributes A (design matrix), R (triangular factor) and Q are kept, so
+    fit() on new data costs two matrix products.
+    """
+
+    def __init__(self, model, x, n_params=None, sigma=None):
+        self.model = model
+        self.x = x
+        self.A, self.offset = design_matrix(model, x, n_params)
+        N, P = self.A.shape
+        self.sigma = np.ones(N) if sigma is None else np.broadcast_to(np.asarray(sigma, dtype=float).ravel(), (N,))
+        self.Q, self.R = qr(self.A/self.sigma[:, None], mode='economic')
+        if np.min(np.abs(np.diag(self.R))) < 1e-12*np.max(np.abs(np.diag(self.R))):
+            raise np.linalg.LinAlgError('design matrix is rank deficient, the basis functions are not independent')
+        # (A^T W A)^-1 = R^-1 R^-T
+        R_inv = solve_triangular(self.R, np.eye(P))
+        self.unscaled_cov = R_inv @ R_inv.T
+
+    @property
+    def n_params(self):
+        return self.A.shape[1]
+
+    def fit(self, ydata, absolute_sigma=False):
+        """
+        Fit every dataset in ydata.
+
+        ydata = data on the grid, shape (N,), or a stack of datasets whose
+            trailing axes hold the N points, e.g. (K, N) or (K, Ny, Nx)
+        absolute_sigma = as in curve_fit, otherwise the covariance is scaled
+            by the reduced chi-square of each dataset
+
+        returns popt (shape (..., n_params)) and pcov
+        (shape (..., n_params, n_params))
+        """
+        N, P = self.A.shape
+        ydata = np.asarray(ydata, dtype=float)
+        batch = _batch_shape(ydata.shape, N)
+        Y = ydata.reshape(-1, N)
+        B = (Y - self.offset)/self.sigma           # weighted right hand sides, shape (K, N)
+        popt = solve_triangular(self.R, self.Q.T @ B.T).T
+
+        pcov = np.broadcast_to(self.unscaled_cov, (Y.shape[0], P, P))
+        if not absolute_sigma:
+            if N > P:
+                chi2 = np.sum((B - popt @ (self.A/self.sigma[:, None]).T)**2, axis=1)
+                pcov = pcov*(chi2/(N - P))[:, None, None]
+            else:
+                pcov = np.full((Y.shape[0], P, P), np.inf)
+        return popt.reshape(batch + (P,)), np.array(pcov).reshape(batch + (P, P))
+
+    def evaluate(self, popt):
+        """Model values for fitted parameters, shape (..., N)."""
+        return np.asarray(popt) @ self.A.T + self.offset
+
+
+def linear_curve_fit(model, x, ydata, p0=None, sigma=None, absolute_sigma=False, linear=None, **kwargs):
+    """
+    curve_fit with a fast path for models linear in their parameters.
+
+    linear = True to declare the model linear, False to always use
+        curve_fit, None to test it with is_linear
+    ydata may hold a stack of datasets, shape (..., N), which are fitted
+    together on the linear path and one by one with curve_fit otherwise.
+
+    returns popt, pcov as curve_fit
+    """
+    n_params = len(p0) if p0 is not None else None
+    if linear is None:
+        linear = is_linear(model, x, n_params)
+    if linear:
+        return LinearLeastSquares(model, x, n_params, sigma).fit(ydata, absolute_sigma)
+
+    ydata = np.asarray(ydata, dtype=float)
+    flat = lambda t, *p: np.ravel(model(t, *p))
+    n = np.size(flat(x, *(p0 if p0 is not None else np.ones(n_model_params(model)))))
+    Y = ydata.reshape(-1, n)
+    fits = [curve_fit(flat, x, y, p0=p0, sigma=sigma, absolute_sigma=absolute_sigma, **kwargs) for y in Y]
+    popt = np.array([f[0] for f in fits])
+    pcov = np.array([f[1] for f in fits])
+    batch = _batch_shape(ydata.shape, n)
+    P = popt.shape[1]
+    return popt.reshape(batch + (P,)), pcov.reshape(batch + (P, P))
+
+
+# %%
+if __name__ == "__main__":
+    import time
+
+    def quad_model(x, a, b, c):
+        return x**2 * a + x * b + c
+
+    def polynomial_2D(x, y, ax, bx, cx, ay, by, cy):
+        return (
+            (ax*x**3 + bx*x**2 + cx*x) + (ay*y**3 + by*y**2 + cy*y)
+        )
+
+    # as in ravelling.py, the parameters are forwarded with *parameters, so
+    # their number is given by p0
+    def polynomial_ravelled(t, *parameters):
+        return polynomial_2D(t[0], t[1], *parameters).ravel()
+
+    # The spectrum of polynomial_fitting.py
+    true_p = [2, 0.3, 4]
+    D_x = np.linspace(0, 5, 100)
+    np.random.seed(0)
+    std = 10
+    D_y = quad_model(D_x, *true_p) + np.random.normal(0, std, len(D_x))
+
+    print("quad_model linear:", is_linear(quad_model, D_x))
+    fit_p_lin, fit_cov_lin = linear_curve_fit(quad_model, D_x, D_y)
+    fit_p_curv, fit_cov_curv = curve_fit(quad_model, D_x, D_y)
+    for i, (p, var) in enumerate(zip(fit_p_lin, np.diag(fit_cov_lin))):
+        print(f"p[{i}] = {p:.4g} ± {np.sqrt(var):.2g} (curve_fit {fit_p_curv[i]:.4g} "
+              f"± {np.sqrt(fit_cov_curv[i, i]):.2g}, True = {true_p[i]})")
+
+    # Thousands of noisy images of ravelling.py on one 101x100 grid
+    Nx, Ny = 100, 101
+    x = np.linspace(-10, 10, Nx)
+    y = np.linspace(-10, 10, Ny)
+    X, Y = np.meshgrid(x, y)
+    t = np.array((X, Y))
+    p = [0, 1, 0, 0.1, 1, 0.2]
+    p0 = np.ones(len(p))
+    n_images = 2000
+    rng = np.random.default_rng(1)
+    params = p + rng.normal(0, 0.1, (n_images, len(p)))
+    images = np.einsum('kp,np->kn', params, design_matrix(polynomial_ravelled, t, len(p0))[0]).reshape(n_images, Ny, Nx)
+    images += rng.normal(0, 5, images.shape)
+
+    start = time.perf_counter()
+    solver = LinearLeastSquares(polynomial_ravelled, t, len(p0))
+    popt, pcov = solver.fit(images)
+    t_lin = time.perf_counter() - start
+
+    n_ref = 20
+    start = time.perf_counter()
+    ref = [curve_fit(polynomial_ravelled, t, z.ravel(), p0=p0)[0] for z in images[:n_ref]]
+    t_ref = (time.perf_counter() - start)*n_images/n_ref
+    print(f"{n_images} images: linear fit {t_lin:.3f} s, curve_fit {t_ref:.1f} s (estimated from {n_ref}), "
+          f"max difference {np.max(np.abs(popt[:n_ref] - ref)):.1e}")
+    pull = (popt - params)/np.sqrt(np.diagonal(pcov, axis1=-2, axis2=-1))
+    print("pull std per parameter:", np.round(pull.std(axis=0), 3))
@@ -0,0 +1,218 @@
+# %%
+# Automatic decomposition of a spectrum into Gaussian peaks on a constant
+# background, for measured_data.dat of gaussdata.py and for batches of
+# similar spectra. Instead of hand-written Gauss / two_Gauss lambdas and
+# hand-picked p0, starting values come from scipy.signal.find_peaks on the
+# smoothed spectrum, models with 1..K components are fitted with the
+# analytic Jacobian (optionally in a process pool), and the number of
+# components is chosen by AIC or BIC.
+#
+# Parameters are ordered as in two_Gauss: a1, b1, c1, a2, b2, c2, ..., d
+# (amplitude, centre and standard deviation of each peak, then the constant).
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from scipy.ndimage import gaussian_filter1d
+from scipy.optimize import curve_fit
+from scipy.signal import find_peaks, peak_widths
+
+FWHM = 2*np.sqrt(2*np.log(2))
+
+
+def gaussians(x, *p):
+    """
+    Sum of Gaussians plus a constant.
+
+    p = a1, b1, c1, ..., ak, bk, ck, d
+    """
+    peaks = np.reshape(p[:-1], (-1, 3))
+    a, b, c = peaks[:, :1], peaks[:, 1:2], peaks[:, 2:]
+    return np.sum(a*np.exp(-(x - b)**2/(2*c**2)), axis=0) + p[-1]
+
+
+def gaussians_jac(x, *p):
+    """
+    Analytic Jacobian of gaussians, shape (len(x), len(p)).
+    """
+    peaks = np.reshape(p[:-1], (-1, 3))
+    a, b, c = peaks[:, :1], peaks[:, 1:2], peaks[:, 2:]
+    u = (x - b)/c
+    g = np.exp(-u**2/2)
+    J = np.empty((len(p), np.size(x)))
+    J[0:-1:3] = g                       # d/da
+    J[1:-1:3] = a*g*u/c                 # d/db
+    J[2:-1:3] = a*g*u**2/c              # d/dc
+    J[-1] = 1
+    return J.T
+
+
+def initial_guess(x, y, n_components, smooth=None):
+    """
+    Starting values for n_components peaks.
+
+    The spectrum is smoothed with a Gaussian of `smooth` samples (default
+    0.5% of the points) and the background is its 10th percentile. Peaks
+    are then taken greedily: the highest maximum of the residual found by
+    find_peaks, with the width from peak_widths, is subtracted before
+    looking for the next one, so blended peaks and shoulders also get a
+    starting point.
+
+    returns p0 = [a1, b1, c1, ..., d]
+    """
+    x = np.asarray(x, dtype=float)
+    smooth = max(len(y)//200, 1) if smooth is None else smooth
+    ys = gaussian_filter1d(np.asarray(y, dtype=float), smooth)
+    d = np.percentile(ys, 10)
+    residual = ys - d
+    index = np.arange(x.size)
+
+    p0 = []
+    for _ in range(n_components):
+        peaks, _ = find_peaks(residual)
+        i = peaks[np.argmax(residual[peaks])] if peaks.size else np.argmax(residual)
+        _, _, left, right = peak_widths(residual, [i], rel_height=0.5)
+        width = np.interp(right[0], index, x) - np.interp(left[0], index, x)
+        a = max(residual[i], 0)
+        b = x[i]
+        c = max(width/FWHM, x[1] - x[0])
+        p0 += [a, b, c]
+        residual = residual - a*np.exp(-(x - b)**2/(2*c**2))
+    return np.array(p0 + [d])
+
+
+def information_criteria(n, n_params, rss=None, chi2=None):
+    """
+    AIC and BIC of a least squares fit.
+
+    With known uncertainties (chi2) -2 log L = chi2, otherwise the noise is
+    estimated from the residual sum of squares and -2 log L = n log(rss/n).
+    """
+    m2logL = chi2 if chi2 is not None else n*np.log(rss/n)
+    return m2logL + 2*n_params, m2logL + n_params*np.log(n)
+
+
+def fit_components(n_components, x, y, sigma=None, p0=None, smooth=None, max_nfev=None):
+    """
+    Fit n_components Gaussians plus a constant.
+
+    sigma = uncertainty of each point, as in curve_fit (absolute)
+    p0 = starting values, default initial_guess
+
+    returns dict with n_components, params, errors, cov, rss, chi2, aic,
+    bic and success
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    p0 = initial_guess(x, y, n_components, smooth) if p0 is None else np.asarray(p0, dtype=float)
+    dx = np.min(np.abs(np.diff(x)))
+    lower = np.tile([0, x.min(), dx/10], n_components).tolist() + [-np.inf]
+    upper = np.tile([np.inf, x.max(), np.ptp(x)], n_components).tolist() + [np.inf]
+    p0 = np.clip(p0, lower, upper)
+
+    result = dict(n_components=n_components, params=p0, errors=np.full(p0.size, np.nan),
+                  cov=np.full((p0.size, p0.size), np.nan), rss=np.inf, chi2=None,
+                  aic=np.inf, bic=np.inf, success=False)
+    try:
+        params, cov = curve_fit(gaussians, x, y, p0=p0, sigma=sigma, absolute_sigma=sigma is not None,
+                                jac=gaussians_jac, bounds=(lower, upper), method='trf', max_nfev=max_nfev)
+    except (RuntimeError, ValueError):
+        return result
+
+    # order the peaks by centre
+    peaks = params[:-1].reshape(-1, 3)
+    order = np.argsort(peaks[:, 1])
+    perm = np.concatenate([(3*order[:, None] + np.arange(3)).ravel(), [params.size - 1]])
+    params, cov = params[perm], cov[np.ix_(perm, perm)]
+
+    r = y - gaussians(x, *params)
+    rss = np.sum(r**2)
+    chi2 = None if sigma is None else np.sum((r/sigma)**2)
+    aic, bic = information_criteria(x.size, params.size, rss, chi2)
+    result.update(params=params, errors=np.sqrt(np.diag(cov)), cov=cov, rss=rss, chi2=chi2,
+                  aic=aic, bic=bic, success=bool(np.all(np.isfinite(cov))))
+    return result
+
+
+def decompose(x, y, max_components=4, criterion='bic', sigma=None, smooth=None, n_processes=1):
+    """
+    Fit 1..max_components peaks and select the model by AIC or BIC.
+
+    n_processes = worker processes for the candidate fits
+
+    returns the result dict of the selected model (see fit_components) and
+    the list of all candidates
+    """
+    if criterion not in ('aic', 'bic'):
+        raise ValueError("criterion must be 'aic' or 'bic'")
+    fit = partial(fit_components, x=x, y=y, sigma=sigma, smooth=smooth)
+    ks = range(1, max_components + 1)
+    if n_processes > 1:
+        with ProcessPoolExecutor(n_processes) as pool:
+            candidates = list(pool.map(fit, ks))
+    else:
+        candidates = [fit(k) for k in ks]
+    best = min(candidates, key=lambda r: r[criterion])
+    return best, candidates
+
+
+def _decompose_one(y, x, max_components, criterion, sigma, smooth):
+    return decompose(x, y, max_components, criterion, sigma, smooth)[0]
+
+
+def decompose_batch(x, Y, max_components=4, criterion='bic', sigma=None, smooth=None, n_processes=1, chunksize=8):
+    """
+    decompose every spectrum of Y, shape (n_spectra, len(x)), spread over
+    a process pool.
+
+    returns the list of selected result dicts
+    """
+    work = partial(_decompose_one, x=x, max_components=max_components, criterion=criterion,
+                   sigma=sigma, smooth=smooth)
+    if n_processes > 1:
+        with ProcessPoolExecutor(n_processes) as pool:
+            return list(pool.map(work, Y, chunksize=chunksize))
+    return [work(y) for y in Y]
+
+
+# %%
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    D_x, D_y = np.loadtxt("measured_data.dat")
+
+    start = time.perf_counter()
+    best, candidates = decompose(D_x, D_y, max_components=4, n_processes=4)
+    print(f"decomposition in {time.perf_counter() - start:.2f} s")
+    print(" K        AIC        BIC")
+    for r in candidates:
+        print(f"{r['n_components']:2d} {r['aic']:10.1f} {r['bic']:10.1f}")
+
+    names = ['a', 'b', 'c']
+    print(f"BIC selects {best['n_components']} Gaussians:")
+    for i, (p, e) in enumerate(zip(best['params'][:-1], best['errors'][:-1])):
+        print(f"  {names[i % 3]}{i//3 + 1} = {p:.4f} ± {e:.4f}")
+    print(f"  d  = {best['params'][-1]:.4f} ± {best['errors'][-1]:.4f}")
+
+    # Unattended run over a batch of synthetic spectra like the measured one
+    rng = np.random.default_rng(0)
+    n_spectra = 200
+    truth = best['params']
+    scatter = np.tile([0.05*truth[0], 0.02, 0.05*truth[2]], best['n_components']).tolist() + [0.05]
+    Y = np.array([gaussians(D_x, *(truth + scatter*rng.normal(size=truth.size)))
+                  for _ in range(n_spectra)])
+    Y += rng.normal(0, np.sqrt(best['rss']/D_x.size), Y.shape)
+    start = time.perf_counter()
+    results = decompose_batch(D_x, Y, max_components=4, n_processes=4)
+    counts = np.bincount([r['n_components'] for r in results], minlength=5)[1:]
+    print(f"{n_spectra} spectra in {time.perf_counter() - start:.1f} s, "
+          f"selected component counts 1..4: {counts}")
+
+    plt.plot(D_x, D_y, label='Data')
+    for r in candidates[:3]:
+        plt.plot(D_x, gaussians(D_x, *r['params']), label=f"{r['n_components']} Gaussian")
+    plt.xlabel('D_x')
+    plt.ylabel('D_y')
+    plt.legend()
+    plt.show()
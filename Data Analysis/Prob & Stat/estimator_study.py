@@ -0,0 +1,161 @@
+import numpy as np
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Estimators act on a (trials, n_samples) block and return one value per trial
+def mean(samples):
+    return samples.mean(axis=1)
+
+
+def variance(samples):
+    """Biased variance, divides by n (also the normal MLE of the variance)."""
+    return samples.var(axis=1)
+
+
+def corrected_variance(samples):
+    """Unbiased variance, divides by n - 1."""
+    return samples.var(axis=1, ddof=1)
+
+
+def median(samples):
+    return np.median(samples, axis=1)
+
+
+def mle_sigma(samples):
+    """Normal MLE of the standard deviation, ``sqrt`` of the biased variance."""
+    return samples.std(axis=1)
+
+
+ESTIMATORS = {
+    'mean': mean,
+    'variance': variance,
+    'corrected_variance': corrected_variance,
+    'median': median,
+    'mle': variance,
+    'mle_sigma': mle_sigma,
+}
+
+
+def _normal(rng, size, loc, scale):
+    return rng.normal(loc, scale, size=size)
+
+
+def normal_sampler(loc=0.0, scale=1.0):
+    r"""Picklable sampler drawing ``rng.normal(loc, scale, size)``."""
+    return partial(_normal, loc=loc, scale=scale)
+
+
+def _power_sums(estimator, sampler, n_samples, n_trials, truth, block_trials, seed, keep):
+    """Run ``n_trials`` trials in blocks, return sums of (est - truth)**k."""
+    rng = np.random.default_rng(seed)
+    sums = np.zeros(4)
+    values = np.empty(n_trials) if keep else None
+    for start in range(0, n_trials, block_trials):
+        m = min(block_trials, n_trials - start)
+        est = estimator(sampler(rng, (m, n_samples)))
+        if keep:
+            values[start:start + m] = est
+        d = est - truth
+        d2 = d*d
+        sums += (d.sum(), d2.sum(), (d2*d).sum(), (d2*d2).sum())
+    return sums, values
+
+
+def run_study(estimator, n_samples, n_trials, truth, sampler=None, block_elements=2**22,
+              n_processes=1, seed=None, keep=False, z=1.96):
+    r"""Sampling distribution of an estimator from Monte-Carlo trials.
+
+    Replaces the ``for i in range(10**5)`` loops of
+    ``4-statistical_estimators.ipynb``. Trials are drawn from a
+    ``np.random.Generator`` as ``(trials, n_samples)`` blocks of at most
+    ``block_elements`` draws, the estimator is applied along the sample
+    axis, and only running power sums of ``estimate - truth`` are kept
+    unless ``keep`` is set.
+
+    Parameters
+    ----------
+    estimator : str or callable
+        Key of ``ESTIMATORS`` or a function of a ``(trials, n_samples)``
+        array returning ``(trials,)`` estimates. Must be picklable (module
+        level) when ``n_processes > 1``.
+    n_samples : int
+        Sample size of each trial.
+    n_trials : int
+        Number of trials.
+    truth : float
+        True value of the estimated quantity.
+    sampler : callable, optional
+        ``sampler(rng, size)``, defaults to ``normal_sampler()``.
+    block_elements : int
+        Maximum number of draws held in memory per block.
+    n_processes : int
+        Split the trials across a process pool with independent seeds
+        spawned from ``seed``.
+    seed : int, optional
+        Root seed.
+    keep : bool
+        Also return every estimate, e.g. for a histogram.
+    z : float
+        Width of the confidence bands in standard errors.
+
+    Returns
+    -------
+    result : dict
+        ``bias``, ``variance`` and ``mse`` of the estimator, each with a
+        ``(low, high)`` band under the key ``<name>_ci``, ``mean`` of the
+        estimates, ``n_trials``, and ``values`` if ``keep`` is set.
+    """
+    if isinstance(estimator, str):
+        estimator = ESTIMATORS[estimator]
+    if sampler is None:
+        sampler = normal_sampler()
+    block_trials = max(1, block_elements//n_samples)
+
+    n_jobs = max(1, min(n_processes, n_trials))
+    counts = np.full(n_jobs, n_trials//n_jobs)
+    counts[:n_trials % n_jobs] += 1
+    seeds = np.random.SeedSequence(seed).spawn(n_jobs)
+    jobs = [(estimator, sampler, n_samples, int(c), truth, block_trials, s, keep)
+            for c, s in zip(counts, seeds)]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            results = list(pool.map(_power_sums, *zip(*jobs)))
+    else:
+        results = [_power_sums(*jobs[0])]
+
+    m1, m2, m3, m4 = np.sum([r[0] for r in results], axis=0)/n_trials
+    var = m2 - m1**2
+    mu4 = m4 - 4*m1*m3 + 6*m1**2*m2 - 3*m1**4     # central 4th moment
+    err = {
+        'bias': np.sqrt(var/n_trials),
+        'variance': np.sqrt(max(mu4 - var**2, 0)/n_trials),
+        'mse': np.sqrt(max(m4 - m2**2, 0)/n_trials),
+    }
+
+    result = {'mean': truth + m1, 'bias': m1, 'variance': var, 'mse': m2, 'n_trials': n_trials}
+    for key, e in err.items():
+        result[key + '_ci'] = (result[key] - z*e, result[key] + z*e)
+    if keep:
+        result['values'] = np.concatenate([r[1] for r in results])
+    return result
+
+
+if __name__ == "__main__":
+    import time
+
+    # Sampling distribution of the mean, as in the notebook (10^5 trials of 10^3)
+    start = time.perf_counter()
+    res = run_study('mean', 10**3, 10**5, 50, normal_sampler(50, 20), seed=0)
+    print(f"Mean of means: {res['mean']:.3f}, stddev of means: {np.sqrt(res['variance']):.3f} "
+          f"(nominal {20/np.sqrt(1000):.3f}), {time.perf_counter() - start:.2f} s")
+
+    # Variance estimators with n = 5, 10^7 trials
+    for name in ('variance', 'corrected_variance', 'mle_sigma', 'median'):
+        truth = 10 if name == 'mle_sigma' else 50 if name == 'median' else 100
+        start = time.perf_counter()
+        res = run_study(name, 5, 10**7, truth, normal_sampler(50, 10), n_processes=4, seed=1)
+        low, high = res['bias_ci']
+        print(f"{name:>18}: bias {res['bias']:+.3f} [{low:+.3f}, {high:+.3f}], "
+              f"variance {res['variance']:.2f}, MSE {res['mse']:.2f}, {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,238 @@
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _evaluate(log_prob, points, vectorized, args):
+    """Log-probability of a ``(k, ndim)`` batch of walker positions."""
+    if vectorized:
+        return np.asarray(log_prob(points, *args), dtype=float)
+    return np.array([log_prob(p, *args) for p in points], dtype=float)
+
+
+def sample(log_prob, p0, n_steps, args=(), a=2.0, vectorized=True, rng=None,
+           out=None, thin=1):
+    r"""Affine-invariant ensemble MCMC (Goodman & Weare stretch move).
+
+    The walkers are split into two halves; each half is moved in one NumPy
+    step using stretch moves towards randomly chosen walkers of the other
+    half, so a step costs two calls of ``log_prob``.
+
+    Parameters
+    ----------
+    log_prob : callable
+        ``log_prob(theta, *args)``. With ``vectorized=True`` ``theta`` has
+        shape ``(k, ndim)`` and an array of ``k`` log-probabilities is
+        returned; otherwise it is called once per walker with a
+        ``(ndim,)`` vector. Return ``-np.inf`` outside the prior support.
+    p0 : array-like
+        Initial walker positions, shape ``(n_walkers, ndim)``. ``n_walkers``
+        must be even and larger than ``2*ndim``.
+    n_steps : int
+        Number of ensemble steps.
+    args : tuple
+        Extra arguments for ``log_prob``.
+    a : float
+        Stretch scale parameter.
+    vectorized : bool
+        Whether ``log_prob`` accepts a batch of walkers.
+    rng : np.random.Generator or int, optional
+    out : str, optional
+        Path of a ``.npy`` file. The chain is written there through a
+        memory map as it is produced instead of being held in memory.
+    thin : int
+        Keep every ``thin``-th step.
+
+    Returns
+    -------
+    chain : ndarray or np.memmap
+        Walker positions, shape ``(n_steps//thin, n_walkers, ndim)``.
+    lnp : ndarray
+        Log-probabilities, shape ``(n_steps//thin, n_walkers)``.
+    acceptance : ndarray
+        Acceptance fraction of each walker.
+    """
+    rng = np.random.default_rng(rng)
+    p = np.array(p0, dtype=float)
+    n_walkers, ndim = p.shape
+    if n_walkers % 2 or n_walkers <= 2*ndim:
+        raise ValueError('n_walkers must be even and larger than 2*ndim')
+    half = n_walkers//2
+    halves = (slice(0, half), slice(half, n_walkers))
+
+    n_keep = n_steps//thin
+    if out is None:
+        chain = np.empty((n_keep, n_walkers, ndim))
+    else:
+        chain = np.lib.format.open_memmap(out, mode='w+', dtype=np.float64,
+                                          shape=(n_keep, n_walkers, ndim))
+    lnp_chain = np.empty((n_keep, n_walkers))
+
+    lnp = _evaluate(log_prob, p, vectorized, args)
+    if not np.all(np.isfinite(lnp)):
+        raise ValueError('initial walkers must all have finite log-probability')
+    accepted = np.zeros(n_walkers)
+
+    for step in range(n_steps):
+        for k in (0, 1):
+            active, other = halves[k], halves[1 - k]
+            partners = p[other][rng.integers(half, size=half)]
+            # z ~ g(z) proportional to 1/sqrt(z) on [1/a, a]
+            z = ((a - 1)*rng.uniform(size=half) + 1)**2/a
+            proposal = partners + z[:, None]*(p[active] - partners)
+            lnp_new = _evaluate(log_prob, proposal, vectorized, args)
+            log_accept = (ndim - 1)*np.log(z) + lnp_new - lnp[active]
+            accept = np.log(rng.uniform(size=half)) < log_accept
+
+            p[active] = np.where(accept[:, None], proposal, p[active])
+            lnp[active] = np.where(accept, lnp_new, lnp[active])
+            accepted[active] += accept
+
+        if (step + 1) % thin == 0:
+            chain[step//thin] = p
+            lnp_chain[step//thin] = lnp
+
+    if out is not None:
+        chain.flush()
+    return chain, lnp_chain, accepted/n_steps
+
+
+def _run_chain(job):
+    log_prob, p0, n_steps, kwargs, seed = job
+    start = time.perf_counter()
+    result = sample(log_prob, p0, n_steps, rng=seed, **kwargs)
+    return result + (time.perf_counter() - start,)
+
+
+def run_chains(log_prob, p0s, n_steps, n_processes=None, seed=None, out=None, **kwargs):
+    r"""Run independent ensembles in a process pool.
+
+    ``log_prob`` must be picklable, i.e. defined at module level. Each
+    ensemble gets an independent seed spawned from ``seed``.
+
+    Parameters
+    ----------
+    log_prob : callable
+        See ``sample``.
+    p0s : sequence of array-like
+        Initial positions for each ensemble.
+    n_steps : int
+        Number of steps per ensemble.
+    n_processes : int, optional
+        Pool size, defaults to the number of CPUs.
+    seed : int, optional
+        Root seed.
+    out : str, optional
+        Path prefix; ensemble ``i`` is streamed to ``f'{out}_{i}.npy'``.
+    **kwargs
+        Passed on to ``sample``.
+
+    Returns
+    -------
+    results : list of tuple
+        ``(chain, lnp, acceptance, elapsed_seconds)`` for each ensemble.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(p0s))
+    jobs = []
+    for i, (p0, s) in enumerate(zip(p0s, seeds)):
+        kw = dict(kwargs)
+        if out is not None:
+            kw['out'] = f'{out}_{i}.npy'
+        jobs.append((log_prob, p0, n_steps, kw, s))
+    with ProcessPoolExecutor(n_processes) as pool:
+        return list(pool.map(_run_chain, jobs))
+
+
+def autocorr_time(chain, c=5.0):
+    r"""Integrated autocorrelation time of each parameter.
+
+    The autocorrelation function is averaged over walkers and summed with
+    Sokal's automatic window (smallest ``M`` with ``M >= c*tau(M)``).
+
+    Parameters
+    ----------
+    chain : array-like
+        Shape ``(n_steps, n_walkers, ndim)``.
+    c : float
+        Window constant.
+
+    Returns
+    -------
+    tau : ndarray
+        Autocorrelation time in steps, one per parameter.
+    """
+    chain = np.asarray(chain)
+    n_steps, n_walkers, ndim = chain.shape
+    # all walkers and parameters at once: FFT along the step axis
+    x = chain - chain.mean(axis=0)
+    n_fft = int(2**np.ceil(np.log2(2*n_steps)))
+    f = np.fft.rfft(x, n=n_fft, axis=0)
+    acf = np.fft.irfft(f*np.conj(f), n=n_fft, axis=0)[:n_steps]
+    acf = np.mean(acf/acf[0], axis=1)           # (n_steps, ndim)
+
+    taus = 2*np.cumsum(acf, axis=0) - 1
+    window = np.arange(n_steps)[:, None] >= c*taus
+    m = np.where(window.any(axis=0), np.argmax(window, axis=0), n_steps - 1)
+    return taus[m, np.arange(ndim)]
+
+
+def diagnostics(chain, elapsed, burn=0):
+    r"""Autocorrelation time, effective sample size and its rate.
+
+    Parameters
+    ----------
+    chain : array-like
+        Shape ``(n_steps, n_walkers, ndim)``.
+    elapsed : float
+        Wall time of the run in seconds.
+    burn : int
+        Number of initial steps to discard.
+
+    Returns
+    -------
+    tau : ndarray
+        Autocorrelation time per parameter, in steps.
+    n_eff : ndarray
+        Effective number of independent samples per parameter.
+    n_eff_rate : ndarray
+        Effective samples per second.
+    """
+    chain = np.asarray(chain)[burn:]
+    tau = autocorr_time(chain)
+    n_eff = chain.shape[0]*chain.shape[1]/tau
+    return tau, n_eff, n_eff/elapsed
+
+
+def two_gauss(x, a, b, c, d, e, f, g):
+    """The ``two_Gauss`` model of ``gaussdata.py``."""
+    return a*np.exp(-(x - b)**2/(2*c**2)) + d*np.exp(-(x - e)**2/(2*f**2)) + g
+
+
+def two_gauss_log_prob(theta, x, y, noise):
+    """Gaussian-noise log-posterior of ``two_gauss`` with positive widths."""
+    theta = np.atleast_2d(theta)
+    model = two_gauss(x[None, :], *[t[:, None] for t in theta.T])
+    lnp = -0.5*np.sum((y - model)**2, axis=1)/noise**2
+    return np.where((theta[:, 2] > 0) & (theta[:, 5] > 0), lnp, -np.inf)
+
+
+if __name__ == "__main__":
+    from scipy.optimize import curve_fit
+
+    D_x, D_y = np.loadtxt('../../Computational/week 7/measured_data.dat')
+    p2, cov = curve_fit(two_gauss, D_x, D_y, p0=[1, 530, 1, 1, 525, 3, 1.5])
+    noise = np.std(D_y - two_gauss(D_x, *p2))
+
+    rng = np.random.default_rng(1)
+    n_walkers = 32
+    p0s = [p2 + 1e-4*np.abs(p2)*rng.standard_normal((n_walkers, 7)) for _ in range(4)]
+    results = run_chains(two_gauss_log_prob, p0s, 3000, seed=2, args=(D_x, D_y, noise))
+
+    for i, (chain, lnp, acc, elapsed) in enumerate(results):
+        tau, n_eff, rate = diagnostics(chain, elapsed, burn=1000)
+        print(f'ensemble {i}: acceptance {acc.mean():.2f}, max tau {tau.max():.1f} steps, '
+              f'min n_eff {n_eff.min():.0f}, {rate.min():.0f} effective samples/s')
+
+    flat = np.concatenate([chain[1000:].reshape(-1, 7) for chain, *_ in results])
+    for name, m, s, best in zip('abcdefg', flat.mean(axis=0), flat.std(axis=0), p2):
+        print(f'{name} = {m:.4f} ± {s:.4f} (curve_fit {best:.4f})')
@@ -0,0 +1,240 @@
+import numpy as np
+from scipy.special import logsumexp
+from scipy.stats import norm
+
+LOG_2PI = np.log(2*np.pi)
+
+
+def normal_log_likelihood(x, mu, sigma):
+    r"""Gaussian log-likelihood of a dataset for arrays of parameters.
+
+    Uses the sufficient statistics ``n``, ``sum(x)`` and ``sum(x**2)``, so
+    the cost is independent of the number of data points once they are
+    summed. ``mu`` and ``sigma`` broadcast against each other, e.g. the
+    ``Mu, Sigma`` meshgrid of ``5-parameter_inference.ipynb``. Unlike
+    ``np.prod(norm.pdf(...))`` this does not underflow for large samples.
+
+    Parameters
+    ----------
+    x : array-like
+        Data points.
+    mu, sigma : array-like
+        Mean and standard deviation, any broadcastable shapes.
+
+    Returns
+    -------
+    loglike : ndarray
+        Log-likelihood with the broadcast shape of ``mu`` and ``sigma``.
+        ``-inf`` where ``sigma <= 0``.
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.size
+    shift = x.mean()        # centre the data to keep the sums well conditioned
+    s1 = np.sum(x - shift)
+    s2 = np.sum((x - shift)**2)
+
+    mu = np.asarray(mu, dtype=float) - shift
+    sigma = np.asarray(sigma, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chi2 = (s2 - 2*mu*s1 + n*mu**2)/sigma**2
+        loglike = -0.5*chi2 - n*np.log(sigma) - 0.5*n*LOG_2PI
+    return np.where(sigma > 0, loglike, -np.inf)
+
+
+def log_likelihood(logpdf, x, *params, max_elements=2**22):
+    r"""Sum of ``logpdf(x, *params)`` over the data for arrays of parameters.
+
+    General version of ``normal_log_likelihood`` for any element-wise
+    log-density. The parameter arrays are broadcast together and flattened,
+    then evaluated against the data through an ``(points, data)`` broadcast
+    in chunks of at most ``max_elements`` entries to bound memory.
+
+    Parameters
+    ----------
+    logpdf : callable
+        ``logpdf(x, *params)`` returning element-wise log-densities, e.g.
+        ``scipy.stats.norm.logpdf``.
+    x : array-like
+        Data points.
+    *params : array-like
+        Parameter arrays, e.g. grids or sample columns.
+    max_elements : int
+        Maximum size of a temporary ``(points, data)`` array.
+
+    Returns
+    -------
+    loglike : ndarray
+        Log-likelihood with the broadcast shape of ``params``.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    params = np.broadcast_arrays(*[np.asarray(p, dtype=float) for p in params])
+    shape = params[0].shape
+    flat = [p.ravel() for p in params]
+    n_points = flat[0].size
+
+    data_chunk = min(x.size, max_elements)
+    point_chunk = max(1, max_elements//data_chunk)
+    loglike = np.zeros(n_points)
+    for i in range(0, n_points, point_chunk):
+        p = [f[i:i + point_chunk, None] for f in flat]
+        for j in range(0, x.size, data_chunk):
+            loglike[i:i + point_chunk] += np.sum(logpdf(x[None, j:j + data_chunk], *p), axis=1)
+    return loglike.reshape(shape)
+
+
+def normalise_log(logp, cell=1.0):
+    r"""Turn unnormalised log-probabilities into a normalised posterior.
+
+    Normalisation is done with log-sum-exp, so even log-likelihoods of
+    order ``-1e5`` give a finite posterior.
+
+    Parameters
+    ----------
+    logp : array-like
+        Unnormalised log-posterior, e.g. log-prior plus log-likelihood on a
+        grid.
+    cell : float
+        Grid cell area (``dmu*dsigma``). With the default of 1 the result
+        sums to one, otherwise it is a density that integrates to one.
+
+    Returns
+    -------
+    posterior : ndarray
+        Normalised posterior, same shape as ``logp``.
+    log_evidence : float
+        Log of the normalising constant (the evidence, on a grid with
+        ``cell`` set).
+    """
+    logp = np.asarray(logp, dtype=float)
+    log_evidence = logsumexp(logp) + np.log(cell)
+    return np.exp(logp - log_evidence), log_evidence
+
+
+def grid_posterior(x, mu, sigma, log_prior=None):
+    r"""Normal-model posterior on a ``(mu, sigma)`` grid.
+
+    Parameters
+    ----------
+    x : array-like
+        Data points.
+    mu, sigma : array-like
+        1D grids of the mean and standard deviation.
+    log_prior : callable, optional
+        ``log_prior(Mu, Sigma)``; flat if not given.
+
+    Returns
+    -------
+    posterior : ndarray
+        Posterior density, shape ``(len(sigma), len(mu))`` as with
+        ``np.meshgrid(mu, sigma)``.
+    log_evidence : float
+        Log of the evidence.
+    """
+    Mu, Sigma = np.meshgrid(mu, sigma, sparse=True)
+    logp = normal_log_likelihood(x, Mu, Sigma)
+    if log_prior is not None:
+        logp = logp + log_prior(Mu, Sigma)
+    cell = (mu[1] - mu[0])*(sigma[1] - sigma[0])
+    return normalise_log(logp, cell)
+
+
+def rejection_sample(logpdf, low, high, log_max, size, rng=None, batch=2**16):
+    r"""Vectorised rejection sampling from a box.
+
+    Replaces the scalar ``rejection_sampling`` loop: candidate points are
+    drawn uniformly in the box ``[low, high]`` in batches and accepted with
+    probability ``exp(logpdf - log_max)``, until ``size`` points are kept.
+
+    Parameters
+    ----------
+    logpdf : callable
+        ``logpdf(*columns)`` taking one array per dimension.
+    low, high : array-like
+        Box corners, one value per dimension.
+    log_max : float
+        Upper bound of ``logpdf`` in the box.
+    size : int
+        Number of samples to return.
+    rng : np.random.Generator, optional
+    batch : int
+        Number of candidates drawn per iteration.
+
+    Returns
+    -------
+    samples : ndarray
+        Accepted samples, shape ``(size, dim)``.
+    acceptance : float
+        Fraction of accepted candidates.
+    """
+    rng = np.random.default_rng(rng)
+    low = np.atleast_1d(np.asarray(low, dtype=float))
+    high = np.atleast_1d(np.asarray(high, dtype=float))
+    kept = []
+    n_kept = n_drawn = 0
+    while n_kept < size:
+        z = rng.uniform(low, high, size=(batch, low.size))
+        accept = np.log(rng.uniform(size=batch)) < logpdf(*z.T) - log_max
+        kept.append(z[accept])
+        n_kept += accept.sum()
+        n_drawn += batch
+    return np.concatenate(kept)[:size], n_kept/n_drawn
+
+
+def importance_weights(log_target, log_proposal=0.0):
+    r"""Self-normalised importance weights and their effective sample size.
+
+    For samples drawn from the prior, ``log_target - log_proposal`` is just
+    the log-likelihood, which reproduces the ``prior * likelihood / evidence``
+    step of the notebook without underflow.
+
+    Parameters
+    ----------
+    log_target : array-like
+        Unnormalised log target density at the samples.
+    log_proposal : array-like or float
+        Log density of the proposal the samples were drawn from.
+
+    Returns
+    -------
+    weights : ndarray
+        Weights summing to one.
+    ess : float
+        Kish effective sample size ``1/sum(weights**2)``.
+    """
+    logw = np.asarray(log_target, dtype=float) - log_proposal
+    weights = np.exp(logw - logsumexp(logw))
+    return weights, 1/np.sum(weights**2)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    mu_true, sigma_true = 1.1, 0.25
+    sample = rng.normal(mu_true, sigma_true, size=10**5)
+
+    def log_prior(mu, sigma):
+        return norm.logpdf(mu, 1, 0.2) + norm.logpdf(sigma, 0.3, 0.1)
+
+    # 1000 x 1000 grid
+    mu = np.linspace(1.0, 1.2, 1000)
+    sigma = np.linspace(0.2, 0.3, 1000)
+    start = time.perf_counter()
+    post, log_z = grid_posterior(sample, mu, sigma, log_prior)
+    print(f'1000x1000 grid posterior: {time.perf_counter() - start:.3f} s')
+    i, j = np.unravel_index(np.argmax(post), post.shape)
+    print(f'MAP: mu = {mu[j]:.4f}, sigma = {sigma[i]:.4f}')
+
+    # General log-density path (any model, cost grows with grid x data size)
+    start = time.perf_counter()
+    Mu, Sigma = np.meshgrid(mu[::50], sigma[::50])
+    loglike = log_likelihood(norm.logpdf, sample, Mu, Sigma)
+    print(f'20x20 grid through norm.logpdf: {time.perf_counter() - start:.3f} s')
+
+    # Prior samples by rejection, posterior by importance weights
+    start = time.perf_counter()
+    params, acc = rejection_sample(lambda m, s: log_prior(m, s), [0.5, 0], [1.5, 0.5],
+                                   log_prior(1, 0.3), 10**5, rng)
+    weights, ess = importance_weights(normal_log_likelihood(sample[:50], params[:, 0], params[:, 1]))
+    print(f'10^5 prior samples ({acc*100:.1f}% accepted), ESS = {ess:.0f}: {time.perf_counter() - start:.3f} s')
+    print(f'posterior mean: mu = {weights @ params[:, 0]:.3f}, sigma = {weights @ params[:, 1]:.3f}')
@@ -0,0 +1,172 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import chi2, norm
+
+from binned_likelihood import BinnedPoissonLikelihood
+
+
+def pseudo_datasets(expected, n_toys, rng=None):
+    r"""Poisson pseudo-experiments for all toys at once.
+
+    Parameters
+    ----------
+    expected : array-like
+        Expected counts per bin under the generating hypothesis.
+    n_toys : int
+        Number of pseudo-experiments.
+    rng : np.random.Generator or int, optional
+
+    Returns
+    -------
+    counts : ndarray
+        Shape ``(n_toys, n_bins)``.
+    """
+    rng = np.random.default_rng(rng)
+    return rng.poisson(expected, size=(n_toys, np.size(expected))).astype(float)
+
+
+def test_statistic(likelihood, theta_hat, null_index, null_value=0.0, one_sided=True):
+    r"""Profile likelihood-ratio test statistic for every dataset.
+
+    ``q = 2*(nll(null) - nll(best))``, where the null fit holds parameter
+    ``null_index`` at ``null_value`` and profiles the others. Both fits are
+    warm started from ``theta_hat`` and run batched over all datasets of
+    ``likelihood``.
+
+    Parameters
+    ----------
+    likelihood : BinnedPoissonLikelihood
+        Likelihood, possibly with a stack of pseudo-experiment counts.
+    theta_hat : array-like
+        Nominal best fit used as starting point.
+    null_index : int
+        Parameter tested, e.g. the signal strength ``B``.
+    null_value : float
+        Its value under the null hypothesis.
+    one_sided : bool
+        Set ``q = 0`` when the fitted parameter lies below ``null_value``
+        (discovery test statistic ``q0``).
+
+    Returns
+    -------
+    q : ndarray
+        Test statistic of each dataset.
+    """
+    nll_free, theta_free = likelihood.minimise(theta_hat)
+    theta_null = np.array(theta_hat, dtype=float)
+    theta_null[null_index] = null_value
+    free = np.arange(likelihood.n_params) != null_index
+    nll_null, _ = likelihood.minimise(theta_null, free)
+
+    q = np.maximum(2*(nll_null - nll_free), 0)
+    if one_sided:
+        q = np.where(theta_free[..., null_index] < null_value, 0, q)
+    return q
+
+
+def _toy_block(templates, theta_gen, theta_hat, null_index, null_value, one_sided, n_toys, seed):
+    counts = pseudo_datasets(theta_gen @ templates, n_toys, seed)
+    likelihood = BinnedPoissonLikelihood(counts, templates)
+    return test_statistic(likelihood, theta_hat, null_index, null_value, one_sided)
+
+
+def toy_distribution(likelihood, theta_gen, theta_hat, null_index, null_value=0.0,
+                     n_toys=10**5, one_sided=True, block=10**4, n_processes=1, seed=None):
+    r"""Empirical distribution of the test statistic from pseudo-experiments.
+
+    Toys are generated from ``theta_gen`` in blocks of ``block`` as
+    ``(block x n_bins)`` count matrices and fitted together; blocks can be
+    spread over a process pool with independent seeds.
+
+    Parameters
+    ----------
+    likelihood : BinnedPoissonLikelihood
+        Nominal likelihood, provides the templates.
+    theta_gen : array-like
+        Parameters generating the toys, e.g. the background-only fit.
+    theta_hat : array-like
+        Warm start for the toy fits, e.g. the nominal best fit.
+    null_index, null_value, one_sided
+        See ``test_statistic``.
+    n_toys : int
+        Number of pseudo-experiments.
+    block : int
+        Pseudo-experiments per batched fit.
+    n_processes : int
+        Number of worker processes.
+    seed : int, optional
+        Root seed.
+
+    Returns
+    -------
+    q : ndarray
+        Test statistic of each toy.
+    """
+    theta_gen = np.asarray(theta_gen, dtype=float)
+    sizes = [min(block, n_toys - i) for i in range(0, n_toys, block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(likelihood.templates, theta_gen, theta_hat, null_index, null_value, one_sided, n, s)
+            for n, s in zip(sizes, seeds)]
+
+    if n_processes > 1:
+        with ProcessPoolExecutor(n_processes) as pool:
+            blocks = list(pool.map(_toy_block, *zip(*jobs)))
+    else:
+        blocks = [_toy_block(*job) for job in jobs]
+    return np.concatenate(blocks)
+
+
+def p_value(q_obs, q_toys):
+    r"""Empirical p-value and Z-significance of an observed test statistic.
+
+    Returns
+    -------
+    p : float
+        Fraction of toys with ``q >= q_obs``. When no toy reaches ``q_obs``
+        this is the upper bound ``1/n_toys``.
+    z : float
+        One-sided Gaussian significance ``norm.isf(p)`` (a lower bound if
+        ``p`` is).
+    """
+    q_toys = np.asarray(q_toys)
+    p = np.count_nonzero(q_toys >= q_obs)/q_toys.size
+    p = max(p, 1/q_toys.size)
+    return p, norm.isf(p)
+
+
+def wilks_p_value(q_obs, dof=1, one_sided=True):
+    r"""Asymptotic p-value and significance from Wilks' theorem.
+
+    For the one-sided ``q0`` the null distribution is half a delta at zero
+    and half ``chi2(dof)``.
+    """
+    p = chi2(dof).sf(q_obs)
+    if one_sided:
+        p /= 2
+    return p, norm.isf(p)
+
+
+if __name__ == "__main__":
+    import time
+    from binned_likelihood import lhc_likelihood
+
+    lhc_data = np.genfromtxt("lhc_events_100000.csv", delimiter=",")
+    like = lhc_likelihood(lhc_data)
+    theta_hat, cov, nll_max = like.fit([160, 160], bounds=((1, None), (0, None)))
+    nll_bo, theta_bo = like.profile(1, [0.0], theta_hat)
+    q_obs = 2*(nll_bo[0] - nll_max)
+
+    start = time.perf_counter()
+    q = toy_distribution(like, theta_bo[0], theta_hat, null_index=1, n_toys=10**5, seed=0)
+    print(f"10^5 background-only toys: {time.perf_counter() - start:.2f} s")
+
+    # calibration of Wilks' theorem in the tail
+    for q_crit in (chi2(1).ppf(0.9), chi2(1).ppf(0.99), 9, 16):
+        p_toy, z_toy = p_value(q_crit, q)
+        p_wilks, z_wilks = wilks_p_value(q_crit)
+        print(f"q0 >= {q_crit:5.2f}: toys p = {p_toy:.2e} (Z = {z_toy:.2f}), "
+              f"Wilks p = {p_wilks:.2e} (Z = {z_wilks:.2f})")
+
+    p, z = p_value(q_obs, q)
+    print(f"Observed q0 = {q_obs:.1f}: p <= {p:.1e} (Z >= {z:.2f}) from toys, "
+          f"Wilks Z = {wilks_p_value(q_obs)[1]:.1f}")
@@ -0,0 +1,258 @@
+import numpy as np
+from scipy import signal
+from scipy import fft as sci
+
+# Sampling frequencies of the datasets in this folder
+BALL_FS = 44950         # BBChaos145Hz-1-2.txt (data1), x2 max audible frequency
+BALL_FS_DATA2 = 44100   # BBChaos145Hz-1-2.txt as used in data2
+TIDE_FS = 1/(60**2)     # hourly sea levels (data_exam), in Hz
+
+
+def get_window(window, nperseg):
+    r"""Build a window of length ``nperseg`` for spectral estimation.
+
+    The Welch window is written out explicitly as
+    ``1 - ((k - (N-1)/2) / ((N+1)/2))**2`` for ``k = 0 .. N-1``, so it has
+    exactly ``nperseg`` points and never reaches zero at the ends.
+    Any other name is handed on to ``scipy.signal.get_window`` (periodic
+    windows, as is standard for FFT work).
+
+    Parameters
+    ----------
+    window : str, tuple or array-like
+        Window name (``'hann'``, ``'welch'``, ``'boxcar'``, ...), a scipy
+        window tuple such as ``('kaiser', 8)``, or the window values.
+    nperseg : int
+        Length of each segment.
+
+    Returns
+    -------
+    win : ndarray
+        Window values, float64, length ``nperseg``.
+    """
+    if isinstance(window, str) and window.lower() == 'welch':
+        k = np.arange(nperseg)
+        return 1 - ((k - 0.5*(nperseg - 1))/(0.5*(nperseg + 1)))**2
+    if isinstance(window, (str, tuple)):
+        return signal.get_window(window, nperseg)
+
+    win = np.asarray(window, dtype=float)
+    if win.shape != (nperseg,):
+        raise ValueError('window array must have length nperseg')
+    return win
+
+
+def rfft_freqs(nperseg, fs):
+    r"""One-sided frequency axis, in Hz, for segments of length ``nperseg``.
+
+    Parameters
+    ----------
+    nperseg : int
+        Length of each segment.
+    fs : float
+        Sampling frequency in Hz.
+
+    Returns
+    -------
+    freq : ndarray
+        ``nperseg//2 + 1`` frequencies from 0 to the Nyquist frequency.
+    """
+    return sci.rfftfreq(nperseg, d=1/fs)
+
+
+def segment_starts(n, nperseg, noverlap):
+    r"""Start index of every full segment of a record of length ``n``."""
+    step = nperseg - noverlap
+    if step <= 0:
+        raise ValueError('noverlap must be smaller than nperseg')
+    if n < nperseg:
+        return np.zeros(0, dtype=np.int64)
+    return np.arange(0, n - nperseg + 1, step, dtype=np.int64)
+
+
+def welch_psd(y, fs, nperseg=None, noverlap=None, window='hann',
+              detrend='constant', scaling='density', block=64, workers=None):
+    r"""Windowed, overlapped and segment-averaged one-sided power spectrum.
+
+    Replaces the ``y[:2**k]`` truncation and ``y.reshape(N // Nav, Nav)``
+    averaging of the data notebooks. The record can be of any length: every
+    full segment is used and only the tail shorter than one segment is
+    dropped. Segments are read in blocks of ``block`` at a time, so ``y`` may
+    be a ``np.memmap`` (see ``open_memmap``) much larger than memory; only
+    ``block*nperseg`` samples are ever held as float64.
+
+    Parameters
+    ----------
+    y : array-like
+        1D time series (ndarray or memmap).
+    fs : float
+        Sampling frequency in Hz, e.g. ``BALL_FS`` or ``TIDE_FS``.
+    nperseg : int, optional
+        Segment length. Defaults to the full record, which gives a single
+        windowed periodogram.
+    noverlap : int, optional
+        Number of overlapping samples between segments. Defaults to
+        ``nperseg//2``.
+    window : str, tuple or array-like
+        See ``get_window``.
+    detrend : {'constant', None}
+        Remove the mean of each segment before windowing.
+    scaling : {'density', 'spectrum'}
+        ``'density'`` returns a PSD in units**2/Hz, ``'spectrum'`` the power
+        spectrum in units**2.
+    block : int
+        Number of segments transformed per ``rfft`` call.
+    workers : int, optional
+        Passed to ``scipy.fft.rfft``.
+
+    Returns
+    -------
+    freq : ndarray
+        One-sided frequency axis in Hz.
+    psd : ndarray
+        Averaged one-sided spectrum, same length as ``freq``.
+    """
+    n = len(y)
+    if nperseg is None:
+        nperseg = n
+        noverlap = 0
+    nperseg = int(nperseg)
+    if noverlap is None:
+        noverlap = nperseg//2
+
+    starts = segment_starts(n, nperseg, noverlap)
+    if starts.size == 0:
+        raise ValueError(f'record of {n} samples is shorter than nperseg = {nperseg}')
+
+    win = get_window(window, nperseg)
+    if scaling == 'density':
+        scale = 1/(fs*np.sum(win**2))
+    elif scaling == 'spectrum':
+        scale = 1/np.sum(win)**2
+    else:
+        raise ValueError("scaling must be 'density' or 'spectrum'")
+
+    psd = np.zeros(nperseg//2 + 1)
+    idx = np.arange(nperseg)
+    for b in range(0, starts.size, block):
+        s = starts[b:b + block]
+        seg = np.asarray(y[s[0]:s[-1] + nperseg], dtype=float)
+        seg = seg[(s - s[0])[:, None] + idx]            # (segments, nperseg)
+        if detrend == 'constant':
+            seg -= seg.mean(axis=1, keepdims=True)
+        elif detrend is not None:
+            raise ValueError("detrend must be 'constant' or None")
+        seg *= win
+        F = sci.rfft(seg, axis=1, workers=workers)
+        psd += np.sum(F.real**2 + F.imag**2, axis=0)
+
+    psd *= scale/starts.size
+    # fold the negative frequencies onto the positive ones, except DC and Nyquist
+    if nperseg % 2:
+        psd[1:] *= 2
+    else:
+        psd[1:-1] *= 2
+
+    return rfft_freqs(nperseg, fs), psd
+
+
+def periodogram(y, fs, window='boxcar', detrend='constant', scaling='density'):
+    r"""Single-segment one-sided spectrum over the whole record.
+
+    Equivalent to ``np.abs(fft(y))**2`` in the notebooks, but with ``rfft``,
+    the correct frequency axis and a proper scaling, and without truncating
+    to a power of two.
+    """
+    return welch_psd(y, fs, nperseg=None, window=window, detrend=detrend,
+                     scaling=scaling)
+
+
+def text_to_npy(path, out_path, usecols=None, chunk_rows=2**16, dtype=np.float64):
+    r"""Convert a whitespace separated text file to ``.npy`` in chunks.
+
+    Text cannot be memory-mapped, so long recordings such as
+    ``BBChaos145Hz-1-2.txt`` are converted once and then opened with
+    ``open_memmap``. The file is read ``chunk_rows`` lines at a time, so the
+    conversion itself never holds the whole recording in memory.
+
+    Parameters
+    ----------
+    path : str
+        Input text file.
+    out_path : str
+        Output ``.npy`` file.
+    usecols : int or sequence of int, optional
+        Columns to keep, as in ``np.loadtxt``.
+    chunk_rows : int
+        Number of lines parsed per chunk.
+    dtype : data-type
+        Output data type.
+
+    Returns
+    -------
+    shape : tuple
+        Shape of the stored array.
+    """
+    with open(path) as f:
+        n_rows = sum(1 for line in f if line.strip())
+    with open(path) as f:
+        first = np.loadtxt([next(line for line in f if line.strip())], usecols=usecols, ndmin=1)
+    shape = (n_rows,) if first.size == 1 else (n_rows, first.size)
+
+    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=shape)
+    row = 0
+    with open(path) as f:
+        lines = (line for line in f if line.strip())
+        while row < n_rows:
+            chunk = [line for _, line in zip(range(chunk_rows), lines)]
+            values = np.loadtxt(chunk, usecols=usecols, ndmin=2 if len(shape) == 2 else 1)
+            out[row:row + len(chunk)] = values
+            row += len(chunk)
+    out.flush()
+    del out
+    return shape
+
+
+def open_memmap(path, column=None, dtype=np.float64):
+    r"""Open a recording as a read-only memory map for ``welch_psd``.
+
+    Parameters
+    ----------
+    path : str
+        ``.npy`` file (e.g. from ``text_to_npy``) or a raw binary file of
+        ``dtype`` samples.
+    column : int, optional
+        Column to select from a 2D recording (no copy is made).
+    dtype : data-type
+        Sample type of a raw binary file, ignored for ``.npy``.
+
+    Returns
+    -------
+    y : np.memmap
+        Memory mapped samples.
+    """
+    if str(path).endswith('.npy'):
+        y = np.load(path, mmap_mode='r')
+    else:
+        y = np.memmap(path, dtype=dtype, mode='r')
+    if column is not None:
+        y = y[:, column]
+    return y
+
+
+if __name__ == "__main__":
+    # Bouncing ball (data1): full 70001 point record, 4 Hann segments with 50% overlap
+    data = np.loadtxt('BBChaos145Hz-1-2.txt')
+    d, y = data[:, 0], data[:, 1]
+    nperseg = len(y)//4
+    freq, Pb = welch_psd(y, BALL_FS, nperseg=nperseg, window='hann')
+    freq, Pbw = welch_psd(y, BALL_FS, nperseg=nperseg, window='welch')
+    freq, Pd = welch_psd(d, BALL_FS, nperseg=nperseg, window='hann')
+    print(f'Ball: {len(y)} samples, frequency resolution {freq[1]:.3f} Hz')
+    print(f'Driving peak at {freq[np.argmax(Pd[1:]) + 1]:.2f} Hz')
+
+    # Sea levels (data_exam): all 26304 hours, single Hann periodogram
+    tide = np.loadtxt('cleaned_data.txt', usecols=0)
+    freq, P = periodogram(tide, TIDE_FS, window='hann')
+    peak = np.argmax(P[1:]) + 1
+    print(f'Tide: {len(tide)} samples, strongest period {1/freq[peak]/3600:.2f} hours')
@@ -0,0 +1,388 @@
+## This script converts RAW/HDF5/.npy event recordings into a chunked, compressed and time-indexed archive (.evarc)
+## and reads it back through memory mapping, decompressing only the blocks of the requested time range
+## ArchiveEventsIterator can replace EventsIterator (delta_t / n_events modes) in the existing event loops
+## Date: 19 Oct 2026
+
+import json
+import zlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from event_simulator import EVENT_DTYPE, WIDTH, HEIGHT, is_simulator_file, load_events, sensor_size
+
+ARCHIVE_EXT = '.evarc'
+MAGIC = b'EVARC001'
+FOOTER_LEN = 24                 # meta offset, meta length, magic
+
+# One record per non-empty block; blocks cover [origin + block*block_us, origin + (block + 1)*block_us)
+INDEX_DTYPE = np.dtype([('block', '<i8'), ('t_first', '<i8'), ('t_last', '<i8'), ('n', '<i8'),
+                        ('offset', '<u8'), ('nbytes', '<u8'), ('dt_size', '<u8')])
+
+XY_BITS = 14                    # x, y < 16384 packed with p into one uint32
+XY_MASK = (1 << XY_BITS) - 1
+
+#%% [COMPRESSION CODECS]
+# name: (compress(data, level), decompress(data, raw_size)), zlib releases the GIL so blocks decode in parallel
+CODECS = {'none': (lambda data, level: bytes(data), lambda data, size: data),
+          'zlib': (lambda data, level: zlib.compress(data, level),
+                   lambda data, size: zlib.decompress(data, bufsize=max(size, 1)))}
+try:
+  import lz4.frame
+  CODECS['lz4'] = (lambda data, level: lz4.frame.compress(data, compression_level=level),
+                   lambda data, size: lz4.frame.decompress(data))
+except ImportError:
+  pass
+try:
+  import zstandard
+  CODECS['zstd'] = (lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+                    lambda data, size: zstandard.ZstdDecompressor().decompress(data, max_output_size=size))
+except ImportError:
+  pass
+
+
+def is_archive(path):
+  return str(path).endswith(ARCHIVE_EXT)
+
+
+class ArchiveWriter:
+  """
+  Writes time-ordered EventCD buffers into fixed-duration compressed blocks
+
+  Block layout: timestamps as deltas from the previous event (the first from
+  the block start) in uint16, or uint32 when a gap exceeds 65535 us, followed by
+  x | y << 14 | p << 28 packed in uint32. The index and a JSON header are
+  written after the blocks on close.
+
+  INPUTS:
+  - path = output file, ending in .evarc              [STR]
+  - width, height = sensor geometry                   [INT, pixel]
+  - block_us = duration of a block                    [INT, us]
+  - codec = 'zlib', 'none', or 'lz4'/'zstd' if installed  [STR]
+  - level = compression level                         [INT]
+  - origin = start time of block 0                    [INT, us]
+  """
+
+  def __init__(self, path, width=1280, height=720, block_us=10000, codec='zlib', level=1, origin=0):
+    if codec not in CODECS:
+      raise ValueError(f'codec must be one of {sorted(CODECS)}')
+    if max(width, height) > XY_MASK + 1:
+      raise ValueError(f'sensor larger than {XY_MASK + 1} pixels cannot be packed')
+    if not 0 < block_us < 2**32:
+      raise ValueError('block_us must be between 1 and 2**32 - 1 us')
+    self.meta = dict(version=1, width=width, height=height, block_us=int(block_us), origin=int(origin),
+                     codec=codec, n_events=0)
+    self.compress = CODECS[codec][0]
+    self.level = level
+    self.file = open(path, 'wb')
+    self.file.write(MAGIC)
+    self.index = []
+    self.pending, self.block = [], None
+    self.t_last = None                                               # last timestamp written
+
+  def write(self, evs):
+    """ Function appends a buffer of events, which must follow the previous ones in time """
+    if evs.size == 0:
+      return
+    t = evs['t']
+    if np.any(np.diff(t) < 0):
+      raise ValueError('events must be ordered by timestamp')
+    if evs['x'].max() >= self.meta['width'] or evs['y'].max() >= self.meta['height']:
+      raise ValueError(f"events outside the {self.meta['width']}x{self.meta['height']} sensor, give its size")
+    k = (t - self.meta['origin'])//self.meta['block_us']
+    if k[0] < 0:
+      raise ValueError('events are older than the archive origin')
+    if self.t_last is not None and t[0] < self.t_last:
+      # within a block the deltas are unsigned, going back in time would be stored wrong
+      raise ValueError(f'events start at {t[0]} us, before the last one written at {self.t_last} us')
+    self.t_last = int(t[-1])
+
+    bounds = np.flatnonzero(np.diff(k)) + 1
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, k.size]):
+      if k[start] != self.block:
+        self._flush()
+        self.block = int(k[start])
+      self.pending.append(evs[start:stop])
+
+  def _flush(self):
+    if not self.pending:
+      return
+    evs = np.concatenate(self.pending)
+    self.pending = []
+    t = evs['t']
+    start = self.meta['origin'] + self.block*self.meta['block_us']
+    dt = np.diff(t, prepend=start)
+    dt_size = 2 if dt.max() <= 0xFFFF else 4
+    packed = (evs['x'].astype(np.uint32) | evs['y'].astype(np.uint32) << XY_BITS
+              | (evs['p'] > 0).astype(np.uint32) << 2*XY_BITS)
+    raw = dt.astype(f'<u{dt_size}').tobytes() + packed.astype('<u4').tobytes()
+    data = self.compress(raw, self.level)
+
+    offset = self.file.tell()
+    self.file.write(data)
+    self.index.append((self.block, t[0], t[-1], t.size, offset, len(data), dt_size))
+    self.meta['n_events'] += int(t.size)
+
+  def close(self):
+    self._flush()
+    index = np.array(self.index, dtype=INDEX_DTYPE)
+    self.meta.update(n_blocks=len(index), index_offset=self.file.tell())
+    self.file.write(index.tobytes())
+    meta_offset = self.file.tell()
+    meta = json.dumps(self.meta).encode()
+    self.file.write(meta)
+    self.file.write(np.array([meta_offset, len(meta)], dtype='<u8').tobytes() + MAGIC)
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+class EventArchive:
+  """
+  Memory-mapped reader of an .evarc archive
+
+  read(t_start, t_end) finds the blocks from the sparse block index and only
+  decompresses those, in parallel threads, directly into the output array.
+
+  INPUTS:
+  - path = archive file                               [STR]
+  - n_threads = threads decoding blocks               [INT]
+  """
+
+  def __init__(self, path, n_threads=4):
+    self.mm = np.memmap(path, dtype=np.uint8, mode='r')
+    footer = self.mm[-FOOTER_LEN:]
+    if bytes(footer[16:]) != MAGIC or bytes(self.mm[:len(MAGIC)]) != MAGIC:
+      raise ValueError(f'{path} is not an event archive')
+    meta_offset, meta_len = np.frombuffer(footer[:16], dtype='<u8')
+    self.meta = json.loads(bytes(self.mm[meta_offset:meta_offset + meta_len]))
+    self.index = np.frombuffer(self.mm[self.meta['index_offset']:meta_offset], dtype=INDEX_DTYPE)
+    self.decompress = CODECS[self.meta['codec']][1]
+    self.n_threads = n_threads
+
+  def __len__(self):
+    return self.meta['n_events']
+
+  def get_size(self):
+    """ Camera geometry (height, width), as EventsIterator.get_size """
+    return self.meta['height'], self.meta['width']
+
+  @property
+  def t_end(self):
+    """ Time just after the last event """
+    return int(self.index['t_last'][-1]) + 1 if self.index.size else self.meta['origin']
+
+  def blocks(self, t_start=None, t_end=None):
+    """ Index positions [i0, i1) of the blocks overlapping [t_start, t_end) """
+    origin, block_us = self.meta['origin'], self.meta['block_us']
+    i0 = 0 if t_start is None else np.searchsorted(self.index['block'], (t_start - origin)//block_us)
+    i1 = self.index.size if t_end is None else np.searchsorted(self.index['block'], -((origin - t_end)//block_us))
+    return int(i0), int(i1)
+
+  def decode(self, i, out=None):
+    """
+    Function decompresses block i of the index
+
+    OUTPUTS:
+    - evs = events of the block                       [EVENT_DTYPE ARRAY]
+    """
+    rec = self.index[i]
+    n, dt_size = int(rec['n']), int(rec['dt_size'])
+    out = np.empty(n, EVENT_DTYPE) if out is None else out
+    raw = self.decompress(self.mm[rec['offset']:rec['offset'] + rec['nbytes']], n*(dt_size + 4))
+    dt = np.frombuffer(raw, dtype=f'<u{dt_size}', count=n)
+    packed = np.frombuffer(raw, dtype='<u4', count=n, offset=n*dt_size)
+
+    # straight into the fields of out, without temporaries
+    t = out['t']
+    np.cumsum(dt, dtype=np.int64, out=t)
+    t += self.meta['origin'] + int(rec['block'])*self.meta['block_us']
+    np.bitwise_and(packed, XY_MASK, out=out['x'], casting='unsafe')
+    np.right_shift(packed, XY_BITS, out=out['y'], casting='unsafe')
+    out['y'] &= XY_MASK
+    np.right_shift(packed, 2*XY_BITS, out=out['p'], casting='unsafe')
+    return out
+
+  def decode_range(self, i0, i1):
+    """ Function decodes blocks i0..i1-1 into one array, spread over the decoding threads """
+    counts = self.index['n'][i0:i1]
+    starts = np.r_[0, np.cumsum(counts)]
+    out = np.empty(starts[-1], EVENT_DTYPE)
+    jobs = [(i, out[starts[j]:starts[j + 1]]) for j, i in enumerate(range(i0, i1))]
+    if self.n_threads > 1 and len(jobs) > 1:
+      with ThreadPoolExecutor(self.n_threads) as pool:
+        list(pool.map(lambda job: self.decode(*job), jobs))
+    else:
+      for job in jobs:
+        self.decode(*job)
+    return out
+
+  def read(self, t_start=None, t_end=None):
+    """
+    Function reads all events with t_start <= t < t_end
+
+    OUTPUTS:
+    - evs = events ordered by timestamp               [EVENT_DTYPE ARRAY]
+    """
+    evs = self.decode_range(*self.blocks(t_start, t_end))
+    lo = 0 if t_start is None else np.searchsorted(evs['t'], t_start)
+    hi = evs.size if t_end is None else np.searchsorted(evs['t'], t_end)
+    return evs[lo:hi]
+
+  def stream(self, t_start=None, t_end=None, prefetch=None):
+    """
+    Generator of decoded blocks in time order, trimmed to [t_start, t_end)
+
+    The next blocks are decoded ahead in the thread pool while the caller
+    works on the current one.
+    """
+    for evs, _ in self._stream(t_start, t_end, prefetch):
+      yield evs
+
+  def _stream(self, t_start, t_end, prefetch):
+    # decoded blocks with the end time of the block, before which every event has been yielded
+    origin, block_us = self.meta['origin'], self.meta['block_us']
+    i0, i1 = self.blocks(t_start, t_end)
+    prefetch = 2*self.n_threads if prefetch is None else prefetch
+    with ThreadPoolExecutor(max(self.n_threads, 1)) as pool:
+      futures = [pool.submit(self.decode, i) for i in range(i0, min(i0 + prefetch, i1))]
+      for i in range(i0, i1):
+        evs = futures.pop(0).result()
+        if i + prefetch < i1:
+          futures.append(pool.submit(self.decode, i + prefetch))
+        # a trim can empty the block: it is still yielded, so the covered time moves on
+        if t_start is not None and evs.size and evs['t'][0] < t_start:
+          evs = evs[np.searchsorted(evs['t'], t_start):]
+        if t_end is not None and evs.size and evs['t'][-1] >= t_end:
+          evs = evs[:np.searchsorted(evs['t'], t_end)]
+        yield evs, origin + (int(self.index['block'][i]) + 1)*block_us
+
+
+class ArchiveEventsIterator:
+  """
+  Drop-in replacement of metavision_core.event_io.EventsIterator for .evarc files
+
+  INPUTS:
+  - input_path = archive file                         [STR]
+  - mode = 'delta_t' or 'n_events'                    [STR]
+  - delta_t = duration of each buffer                 [INT, us]
+  - n_events = number of events of each buffer        [INT]
+  - start_ts = time of the first buffer               [INT, us]
+  - max_duration = duration to read, default to the end  [INT, us]
+  """
+
+  def __init__(self, input_path, mode='delta_t', delta_t=10000, n_events=10000, start_ts=0, max_duration=None,
+               n_threads=4):
+    if mode not in ('delta_t', 'n_events'):
+      raise ValueError("mode must be 'delta_t' or 'n_events'")
+    self.archive = EventArchive(input_path, n_threads)
+    self.mode, self.delta_t, self.n_events = mode, int(delta_t), int(n_events)
+    self.start_ts = start_ts
+    self.end_ts = self.archive.t_end if max_duration is None else min(start_ts + max_duration, self.archive.t_end)
+
+  def get_size(self):
+    return self.archive.get_size()
+
+  def __iter__(self):
+    blocks = self.archive._stream(self.start_ts, self.end_ts, None)
+    pending = np.empty(0, EVENT_DTYPE)
+    covered = self.start_ts                 # every event before this time has been decoded
+    exhausted = False
+
+    def refill(pending):
+      nonlocal exhausted, covered
+      try:
+        evs, covered = next(blocks)
+      except StopIteration:
+        exhausted, covered = True, self.end_ts
+        return pending
+      return np.concatenate([pending, evs]) if pending.size else evs
+
+    if self.mode == 'delta_t':
+      # one buffer per window, empty ones included, as EventsIterator
+      for w_end in range(self.start_ts + self.delta_t, self.end_ts + self.delta_t, self.delta_t):
+        while covered < w_end and not exhausted:
+          pending = refill(pending)
+        k = np.searchsorted(pending['t'], w_end)
+        yield pending[:k]
+        pending = pending[k:]
+    else:
+      while True:
+        while not exhausted and pending.size < self.n_events:
+          pending = refill(pending)
+        if pending.size == 0:
+          break
+        yield pending[:self.n_events]
+        pending = pending[self.n_events:]
+
+
+def convert(input_path, output_path, block_us=10000, codec='zlib', level=1, chunk_us=1000000, width=None,
+            height=None):
+  """
+  Function converts an event recording into an .evarc archive
+
+  .npy files and HDF5 files of event_simulator are read directly, RAW and
+  Metavision HDF5 recordings through metavision_core.event_io.EventsIterator.
+  The sensor geometry comes from the recording when it is stored there, else
+  from width/height (default the event_simulator sensor).
+
+  OUTPUTS:
+  - n_events = number of events written               [INT]
+  """
+  if is_simulator_file(input_path):
+    events = load_events(input_path)
+    chunks = (events[i:i + 2**22] for i in range(0, len(events), 2**22))
+    height, width = sensor_size(input_path) or (height or HEIGHT, width or WIDTH)
+  else:
+    from metavision_core.event_io import EventsIterator
+    mv_iterator = EventsIterator(input_path=input_path, delta_t=chunk_us)
+    (height, width), chunks = mv_iterator.get_size(), mv_iterator
+
+  with ArchiveWriter(output_path, width, height, block_us, codec, level) as writer:
+    for evs in chunks:
+      writer.write(np.asarray(evs))
+  return writer.meta['n_events']
+
+
+def parse_args():
+  import argparse
+  """Parse command line arguments."""
+  parser = argparse.ArgumentParser(description='Convert an event recording into a time-indexed .evarc archive.',
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-i', '--input-event-file', dest='event_file_path', required=True,
+                      help='Path to input event file (RAW, HDF5 or .npy)')
+  parser.add_argument('-o', '--output', dest='output', default=None, help='Archive path, default input path + .evarc')
+  parser.add_argument('-b', '--block-us', dest='block_us', type=int, default=10000, help='Duration of a block, in us')
+  parser.add_argument('-c', '--codec', dest='codec', default='zlib', choices=sorted(CODECS), help='Block compression')
+  parser.add_argument('-l', '--level', dest='level', type=int, default=1, help='Compression level')
+  parser.add_argument('--width', dest='width', type=int, default=None,
+                      help='Sensor width, in pixels, when the recording does not store it (.npy)')
+  parser.add_argument('--height', dest='height', type=int, default=None,
+                      help='Sensor height, in pixels, when the recording does not store it (.npy)')
+  return parser.parse_args()
+
+
+def main():
+  import os
+  import time
+  args = parse_args()
+  output = args.output or os.path.splitext(args.event_file_path)[0] + ARCHIVE_EXT
+
+  start = time.perf_counter()
+  n = convert(args.event_file_path, output, args.block_us, args.codec, args.level, width=args.width,
+              height=args.height)
+  print(f'{n} events archived to {output} in {time.perf_counter() - start:.1f} s '
+        f'({os.path.getsize(output)/max(n, 1):.2f} bytes per event)')
+
+  #%% [READ-BACK THROUGHPUT]
+  start = time.perf_counter()
+  n_read = sum(evs.size for evs in ArchiveEventsIterator(output, delta_t=args.block_us))
+  elapsed = time.perf_counter() - start
+  print(f'Read back {n_read} events in {elapsed:.2f} s: {n_read*EVENT_DTYPE.itemsize/elapsed/1e9:.2f} GB/s decoded')
+
+
+if __name__ == "__main__":
+  main()
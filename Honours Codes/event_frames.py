@@ -0,0 +1,248 @@
+## This script renders event arrays into polarity frames, count images and exponentially decaying time surfaces offline,
+## without PeriodicFrameGenerationAlgorithm/generate_frame or a GUI window, using np.bincount/np.maximum.at on flattened
+## pixel indices, preallocated sensor-sized buffers, and worker threads rendering separate time windows in parallel
+## Date: 19 Oct 2026
+
+import bisect
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# BGR colours of the Metavision dark palette, as in generate_frame
+BG_COLOR = (52, 37, 30)
+ON_COLOR = (236, 223, 216)
+OFF_COLOR = (201, 126, 64)
+NEVER = np.iinfo(np.int64).min//2             # last timestamp of a pixel that has not fired
+
+KINDS = ('polarity', 'counts', 'time_surface')
+
+
+class EventFrameAccumulator:
+  """
+  Sensor-sized buffers reused for every frame of one rendering thread
+
+  INPUTS:
+  - width, height = sensor geometry                   [INT, pixel]
+  """
+
+  def __init__(self, width=1280, height=720):
+    self.width, self.height = width, height
+    n = width*height
+    self.last = np.empty(n, dtype=np.int64)                # index of the last event of each pixel
+    self.last_t = np.empty((2, n), dtype=np.int64)         # last timestamp per polarity (OFF, ON)
+    self.palette = np.array([BG_COLOR, OFF_COLOR, ON_COLOR], dtype=np.uint8)
+
+  def _index(self, evs):
+    return evs['y'].astype(np.intp)*self.width + evs['x']
+
+  def counts(self, evs, polarity=None):
+    """
+    Function counts the events of every pixel
+
+    INPUTS:
+    - evs = events (x, y, p, t)                       [STRUCTURED ARRAY]
+    - polarity = 0 or 1 for one polarity, None for both  [INT]
+
+    OUTPUTS:
+    - image = events per pixel, shape (height, width) [INT ARRAY]
+    """
+    if polarity is not None:
+      evs = evs[(evs['p'] > 0) == bool(polarity)]
+    return np.bincount(self._index(evs), minlength=self.width*self.height).reshape(self.height, self.width)
+
+  def polarity_frame(self, evs, out=None):
+    """
+    Function draws the polarity of the last event of every pixel, as generate_frame
+
+    OUTPUTS:
+    - frame = BGR image, shape (height, width, 3)     [UINT8 ARRAY]
+    """
+    idx = self._index(evs)
+    self.last.fill(-1)
+    np.maximum.at(self.last, idx, np.arange(idx.size))
+    fired = self.last >= 0
+    state = np.zeros(self.last.size, dtype=np.intp)        # 0 no event, 1 OFF, 2 ON
+    state[fired] = (evs['p'][self.last[fired]] > 0) + 1
+    out = np.empty((self.height, self.width, 3), dtype=np.uint8) if out is None else out
+    np.take(self.palette, state, axis=0, out=out.reshape(-1, 3))
+    return out
+
+  def time_surface(self, evs, t_ref, tau, out=None):
+    """
+    Function gives the exponentially decaying time surface exp(-(t_ref - t_last)/tau) of each polarity
+
+    INPUTS:
+    - evs = events before t_ref, at least the last ~5 tau  [STRUCTURED ARRAY]
+    - t_ref = time of the surface                     [INT, us]
+    - tau = decay time                                [FLOAT, us]
+
+    OUTPUTS:
+    - surface = shape (2, height, width), OFF and ON  [FLOAT32 ARRAY]
+    """
+    idx = self._index(evs)
+    idx += (evs['p'] > 0)*self.last.size                    # ON pixels in the second half
+    self.last_t.fill(NEVER)
+    # contiguous values keep ufunc.at on its fast path, ~20x faster than the strided field
+    np.maximum.at(self.last_t.reshape(-1), idx, np.ascontiguousarray(evs['t']))
+    out = np.empty((2, self.height, self.width), dtype=np.float32) if out is None else out
+    flat = out.reshape(2, -1)
+    np.subtract(self.last_t, t_ref, out=flat, casting='unsafe')
+    flat *= np.float32(1/tau)
+    np.exp(flat, out=flat)
+    return out
+
+  def render(self, evs, kind, t_ref=None, tau=None):
+    if kind == 'polarity':
+      return self.polarity_frame(evs)
+    if kind == 'counts':
+      return self.counts(evs)
+    return self.time_surface(evs, t_ref, tau)
+
+
+def window_events(events, t_start, t_end):
+  """ Events with t_start <= t < t_end of an array/memmap ordered in time, or of an EventArchive """
+  if hasattr(events, 'read'):
+    return events.read(t_start, t_end)
+  # bisect reads ~log2(n) timestamps, np.searchsorted would first copy the strided 't' field of a memmap
+  t = events['t']
+  lo = bisect.bisect_left(t, t_start)
+  hi = bisect.bisect_left(t, t_end, lo)
+  return np.asarray(events[lo:hi])
+
+
+def time_range(events, t_start=None, t_end=None):
+  """ Function fills in the first timestamp and the time after the last event when t_start/t_end are None """
+  if t_start is not None and t_end is not None:
+    return t_start, t_end
+  if len(events.index if hasattr(events, 'read') else events) == 0:
+    raise ValueError('no events to take the time range from, give t_start and t_end')
+  if hasattr(events, 'read'):
+    first, end = int(events.index['t_first'][0]), events.t_end
+  else:
+    first, end = int(events['t'][0]), int(events['t'][-1]) + 1
+  return (first if t_start is None else t_start), (end if t_end is None else t_end)
+
+
+def render_frames(events, accumulation_us, kind='polarity', t_start=None, t_end=None, period_us=None, tau=None,
+                  width=1280, height=720, n_workers=4, batch=64):
+  """
+  Generator of frames rendered at a fixed period, in time order
+
+  Frame i ends at t_start + (i + 1)*period_us and holds the events of the
+  previous accumulation_us (for time surfaces, the last 5 tau, so every frame
+  is independent). Batches of frames are rendered by n_workers threads, each
+  with its own EventFrameAccumulator.
+
+  INPUTS:
+  - events = events ordered in time, array/memmap or EventArchive  [STRUCTURED ARRAY]
+  - accumulation_us = accumulation time of a frame  [INT, us]
+  - kind = 'polarity', 'counts' or 'time_surface'   [STR]
+  - t_start, t_end = rendered time range            [INT, us]
+  - period_us = time between frames, default accumulation_us  [INT, us]
+  - tau = decay time of time surfaces, default accumulation_us  [FLOAT, us]
+
+  OUTPUTS:
+  - t, frame = end time and image of each frame     [INT, ARRAY]
+  """
+  if kind not in KINDS:
+    raise ValueError(f'kind must be one of {KINDS}')
+  period_us = accumulation_us if period_us is None else period_us
+  tau = accumulation_us if tau is None else tau
+  history = int(np.ceil(5*tau)) if kind == 'time_surface' else accumulation_us
+  t_start, t_end = time_range(events, t_start, t_end)
+  ends = np.arange(t_start + period_us, t_end + period_us, period_us)
+
+  local = threading.local()
+
+  def work(t):
+    if not hasattr(local, 'acc'):
+      local.acc = EventFrameAccumulator(width, height)
+    return local.acc.render(window_events(events, t - history, t), kind, t, tau)
+
+  with ThreadPoolExecutor(max(n_workers, 1)) as pool:
+    for b in range(0, ends.size, batch):
+      for t, frame in zip(ends[b:b + batch], pool.map(work, ends[b:b + batch])):
+        yield int(t), frame
+
+
+def to_image(frame, kind):
+  """ Function converts a frame into a BGR uint8 image for export """
+  if kind == 'polarity':
+    return frame
+  if kind == 'counts':
+    scale = max(np.percentile(frame[frame > 0], 99), 1) if np.any(frame) else 1
+    gray = np.clip(frame*(255/scale), 0, 255).astype(np.uint8)
+    return np.repeat(gray[..., None], 3, axis=2)
+  img = np.zeros(frame.shape[1:] + (3,), dtype=np.uint8)
+  img[..., 2] = (frame[1]*255).astype(np.uint8)                # ON in red
+  img[..., 0] = (frame[0]*255).astype(np.uint8)                # OFF in blue
+  return img
+
+
+def export(frames, path, kind, n_frames, width=1280, height=720, fps=30):
+  """
+  Function writes rendered frames to a video (.avi/.mp4, needs cv2) or to a .npy stack of BGR images
+
+  OUTPUTS:
+  - n = number of frames written                    [INT]
+  """
+  if path.endswith(('.avi', '.mp4')):
+    import cv2
+    fourcc = cv2.VideoWriter_fourcc(*('MJPG' if path.endswith('.avi') else 'mp4v'))
+    writer = cv2.VideoWriter(path, fourcc, fps, (width, height))
+    write, close = lambda i, img: writer.write(img), writer.release
+  else:
+    stack = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(n_frames, height, width, 3))
+    write, close = stack.__setitem__, stack.flush
+  n = 0
+  for n, (_, frame) in enumerate(frames, 1):
+    write(n - 1, to_image(frame, kind))
+  close()
+  return n
+
+
+def parse_args():
+  import argparse
+  """Parse command line arguments."""
+  parser = argparse.ArgumentParser(description='Headless rendering of event frames and time surfaces.',
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-i', '--input-event-file', dest='event_file_path', required=True,
+                      help='Event file ordered in time (.npy/.h5 of event_simulator or .evarc archive)')
+  parser.add_argument('-o', '--output', dest='output', default='events.avi', help='Output video (.avi/.mp4) or .npy stack')
+  parser.add_argument('-a', '--acc-time', dest='accumulation_time_us', type=int, default=10000,
+                      help='Accumulation time of each frame, in us')
+  parser.add_argument('-p', '--period', dest='period_us', type=int, default=None,
+                      help='Time between frames, in us (default: the accumulation time)')
+  parser.add_argument('-k', '--kind', dest='kind', default='polarity', choices=KINDS, help='What to render')
+  parser.add_argument('--tau', dest='tau', type=float, default=None, help='Decay time of the time surface, in us')
+  parser.add_argument('--fps', dest='fps', type=float, default=30, help='Frame rate of the exported video')
+  parser.add_argument('-j', '--workers', dest='n_workers', type=int, default=4, help='Rendering threads')
+  return parser.parse_args()
+
+
+def main():
+  import time
+  args = parse_args()
+  if args.event_file_path.endswith('.evarc'):
+    from event_archive import EventArchive
+    events = EventArchive(args.event_file_path)
+    height, width = events.get_size()
+  else:
+    from event_simulator import load_events, WIDTH, HEIGHT
+    events = load_events(args.event_file_path)
+    height, width = HEIGHT, WIDTH
+  t_start, t_end = time_range(events)
+
+  period = args.period_us or args.accumulation_time_us
+  n_frames = -(-(t_end - t_start)//period)
+  start = time.perf_counter()
+  frames = render_frames(events, args.accumulation_time_us, args.kind, t_start, t_end, period, args.tau,
+                         width, height, args.n_workers)
+  n = export(frames, args.output, args.kind, n_frames, width, height, args.fps)
+  elapsed = time.perf_counter() - start
+  print(f'{n} frames of {(t_end - t_start)*1e-6:.2f} s of events rendered to {args.output} in {elapsed:.2f} s '
+        f'({(t_end - t_start)*1e-6/elapsed:.1f}x real time)')
+
+
+if __name__ == "__main__":
+  main()
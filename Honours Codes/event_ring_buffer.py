@@ -0,0 +1,170 @@
+## This script decouples event acquisition from processing with a preallocated single-producer/single-consumer ring buffer
+## A reader thread only pulls buffers from the EventsIterator (live camera) and pushes a summary of each, optionally
+## with a copy of its events, while the consumer counts, folds and writes to disk; drops and high-water marks are kept
+## Date: 19 Oct 2026
+
+import threading
+import time
+import numpy as np
+
+from event_simulator import EVENT_DTYPE
+
+# Summary of one buffer, filled by the reader thread
+SUMMARY_DTYPE = np.dtype([('index', '<i8'), ('n', '<i8'), ('t_first', '<i8'), ('t_last', '<i8'), ('n_on', '<i8'),
+                          ('t_read_ns', '<i8')])
+
+
+class EventRingBuffer:
+  """
+  Preallocated ring of buffer summaries and, optionally, of event copies
+
+  The reader never waits: when the slots or the event storage are full the
+  buffer is dropped and counted, so the camera-side buffers keep draining.
+  The consumer takes the oldest slot with get(), works on the event view in
+  place and frees it with release().
+
+  INPUTS:
+  - n_slots = number of buffer summaries held         [INT]
+  - n_events = event storage, 0 for summaries only    [INT]
+  - block = wait for space instead of dropping (file replay)  [BOOL]
+  """
+
+  def __init__(self, n_slots=1024, n_events=0, block=False):
+    self.meta = np.zeros(n_slots, SUMMARY_DTYPE)
+    self.offset = np.zeros(n_slots, dtype=np.int64)                  # start of the events of each slot
+    self.events = np.empty(n_events, EVENT_DTYPE) if n_events else None
+    self.block = block
+    self.head = self.tail = self.used = 0                            # slots
+    self.ev_head = self.ev_used = 0                                  # events
+    self.n_put = self.dropped = self.dropped_events = 0
+    self.high_water = self.high_water_events = 0
+    self.closed = False
+    self.lock = threading.Lock()
+    self.not_empty = threading.Condition(self.lock)
+    self.not_full = threading.Condition(self.lock)
+
+  def _event_offset(self, n):
+    # where n events fit in the storage, -1 if they do not (single producer: only the tail moves meanwhile)
+    cap = self.events.size
+    if n > cap:
+      return -1
+    if self.ev_used == 0:                                          # no events held, even if empty buffers are queued
+      return 0
+    w, tail = self.ev_head, self.offset[self.tail]
+    if w > tail:
+      if w + n <= cap:
+        return w
+      return 0 if n <= tail else -1
+    if w < tail and w + n <= tail:
+      return w
+    return -1
+
+  def put(self, evs):
+    """
+    Function pushes one buffer from the reader thread
+
+    OUTPUTS:
+    - stored = False if the buffer was dropped        [BOOL]
+    """
+    n = evs.size
+    t_read = time.perf_counter_ns()
+    index = self.n_put
+    self.n_put += 1
+
+    with self.lock:
+      while True:
+        slot_free = self.used < self.meta.size
+        offset = self._event_offset(n) if self.events is not None else 0
+        if slot_free and offset >= 0:
+          break
+        if not self.block or self.closed:
+          self.dropped += 1
+          self.dropped_events += n
+          return False
+        self.not_full.wait()
+      slot = self.head
+
+    # copy outside the lock, the consumer only sees the slot once it is published
+    if self.events is not None:
+      self.events[offset:offset + n] = evs
+    t = evs['t']
+    self.meta[slot] = (index, n, t[0] if n else -1, t[-1] if n else -1,
+                       np.count_nonzero(evs['p']) if n else 0, t_read)
+    self.offset[slot] = offset
+
+    with self.lock:
+      self.head = (slot + 1) % self.meta.size
+      self.ev_head = offset + n if self.events is not None else 0
+      self.used += 1
+      self.ev_used += n if self.events is not None else 0
+      self.high_water = max(self.high_water, self.used)
+      self.high_water_events = max(self.high_water_events, self.ev_used)
+      self.not_empty.notify()
+    return True
+
+  def get(self, timeout=None):
+    """
+    Function takes the oldest buffer, to be freed with release() once processed
+
+    OUTPUTS:
+    - summary = record of SUMMARY_DTYPE, None when closed and empty, or on timeout
+    - evs = view of the copied events, None for summaries only
+    """
+    with self.lock:
+      if not self.not_empty.wait_for(lambda: self.used > 0 or self.closed, timeout) or self.used == 0:
+        return None, None
+      slot = self.tail
+    summary = self.meta[slot].copy()
+    evs = None
+    if self.events is not None:
+      evs = self.events[self.offset[slot]:self.offset[slot] + summary['n']]
+    return summary, evs
+
+  def release(self):
+    """ Function frees the buffer returned by the last get() """
+    with self.lock:
+      if self.events is not None:
+        self.ev_used -= int(self.meta[self.tail]['n'])
+      self.tail = (self.tail + 1) % self.meta.size
+      self.used -= 1
+      self.not_full.notify()
+
+  def close(self):
+    """ Function marks the end of the stream, get() returns None once the ring is empty """
+    with self.lock:
+      self.closed = True
+      self.not_empty.notify_all()
+      self.not_full.notify_all()
+
+  def stats(self):
+    """ Buffers read and dropped, and high-water marks of slots and events """
+    return dict(buffers=self.n_put, dropped=self.dropped, dropped_events=self.dropped_events,
+                high_water=self.high_water, slots=self.meta.size, high_water_events=self.high_water_events,
+                event_capacity=0 if self.events is None else self.events.size)
+
+
+def start_reader(iterator, ring, ingest=None):
+  """
+  Function starts the reader thread, which only moves buffers from iterator into ring
+
+  INPUTS:
+  - ingest = applied to every buffer before it is pushed, e.g. HotPixelMask.filter  [CALLABLE]
+
+  OUTPUTS:
+  - thread = reader thread                            [threading.Thread]
+  - stop = set it to stop the reader                  [threading.Event]
+  """
+  stop = threading.Event()
+
+  def read():
+    try:
+      for evs in iterator:
+        ring.put(evs if ingest is None else ingest(evs))
+        if stop.is_set():
+          break
+    finally:
+      ring.close()
+
+  thread = threading.Thread(target=read, name='event-reader', daemon=True)
+  thread.start()
+  return thread, stop
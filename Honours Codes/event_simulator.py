@@ -0,0 +1,347 @@
+## This script generates a synthetic event-camera stream of a galvo-scanned LG01 (or TEM00) laser spot
+## The spot is rendered into a log-intensity video, converted into (x, y, p, t) events with a contrast-threshold
+## pixel model plus background noise, and streamed in chunks to .npy or HDF5 for load-testing the event scripts
+## Date: 19 Oct 2026
+
+import numpy as np
+import time
+
+try:
+  import h5py
+except ImportError:     # HDF5 output is optional
+  h5py = None
+
+# Same layout as the Prophesee EventCD buffers returned by EventsIterator
+EVENT_DTYPE = np.dtype([('x', '<u2'), ('y', '<u2'), ('p', '<i2'), ('t', '<i8')])
+
+WIDTH, HEIGHT = 1280, 720     # EB sensor geometry, [pixel]
+EB_s = 4.86e-3                # pix -> mm conversion, EBC
+
+
+def beam_intensity(X, Y, x0, y0, w0, doughnut=True):
+  """
+  Function evaluates the normalised intensity of the GaussBeam(doughnut=True, m=1) LG01 beam,
+  I = (2r^2/w0^2) exp(-2r^2/w0^2) / e^-1, or of the TEM00 beam, I = exp(-2r^2/w0^2)
+
+  INPUTS:
+  - X, Y = pixel coordinates                          [ARRAY]
+  - x0, y0 = beam centre, broadcast against X, Y      [FLOAT or ARRAY]
+  - w0 = beam waist                                   [FLOAT, pixel]
+  - doughnut = LG01 if True, TEM00 otherwise          [BOOL]
+
+  OUTPUTS:
+  - I = intensity, peak value 1                       [ARRAY]
+  """
+  rho = 2*((X - x0)**2 + (Y - y0)**2)/w0**2
+  if doughnut:
+    return rho*np.exp(1 - rho)
+  return np.exp(-rho)
+
+
+def galvo_trajectory(t, freq, amplitude, centre=(WIDTH/2, HEIGHT/2), angle=0.0):
+  """
+  Function gives the sinusoidal scan of the galvo mirror
+
+  INPUTS:
+  - t = times                                         [ARRAY, us]
+  - freq = galvo frequency                            [FLOAT, Hz]
+  - amplitude = scan amplitude                        [FLOAT, pixel]
+  - centre = centre of the scan                       [TUPLE, pixel]
+  - angle = scan direction from the x-axis            [FLOAT, rad]
+
+  OUTPUTS:
+  - x0, y0 = beam centre at each time                 [ARRAY, pixel]
+  """
+  s = amplitude*np.sin(2*np.pi*freq*np.asarray(t)*1e-6)
+  return centre[0] + s*np.cos(angle), centre[1] + s*np.sin(angle)
+
+
+class EventSimulator:
+  """
+  Contrast-threshold pixel model of an event camera looking at a galvo-scanned spot
+
+  Each pixel fires an event whenever its log-intensity crosses one of its levels
+  offset + k*C, with a per-pixel contrast threshold C ~ N(C_mean, C_sigma). The
+  log-intensity is sampled in frames and interpolated linearly in between, so
+  the crossings of a whole block of frames are found at once from the change of
+  floor((log I - offset)/C) between consecutive frames. Only the bounding box
+  swept by the spot during a block is rendered, the rest of the sensor is static.
+
+  INPUTS:
+  - freq = galvo frequency                            [FLOAT, Hz]
+  - amplitude = scan amplitude                        [FLOAT, pixel]
+  - w0 = beam waist                                   [FLOAT, pixel]
+  - doughnut = LG01 if True, TEM00 otherwise          [BOOL]
+  - fps = frame rate of the rendered video            [FLOAT, Hz]
+  - C_mean, C_sigma = contrast threshold statistics   [FLOAT]
+  - background = ambient level relative to the peak   [FLOAT]
+  - noise_rate = background events per pixel          [FLOAT, Hz]
+  - seed = random seed                                [INT]
+  """
+
+  def __init__(self, freq=10.0, amplitude=300.0, w0=20.0, doughnut=True, fps=20000.0, C_mean=0.25,
+               C_sigma=0.03, background=1e-3, noise_rate=0.1, width=WIDTH, height=HEIGHT,
+               centre=None, angle=0.0, seed=None):
+    self.freq, self.amplitude, self.w0, self.doughnut = freq, amplitude, w0, doughnut
+    self.dt = 1e6/fps                                                 # frame period in us
+    self.background, self.noise_rate = background, noise_rate
+    self.width, self.height = width, height
+    self.centre = (width/2, height/2) if centre is None else centre
+    self.angle = angle
+    self.rng = np.random.default_rng(seed)
+
+    #%% [PER PIXEL THRESHOLDS & LEVEL OFFSETS]
+    self.C = np.clip(self.rng.normal(C_mean, C_sigma, (height, width)), 0.2*C_mean, None).astype(np.float32)
+    self.offset = self.rng.uniform(0, 1, (height, width)).astype(np.float32)*self.C
+    self.reach = 3*w0                                                 # spot radius rendered
+
+  def log_frames(self, t, x_slice, y_slice):
+    """
+    Function renders the log-intensity of the sensor window for every frame time
+
+    INPUTS:
+    - t = frame times                                 [ARRAY, us]
+    - x_slice, y_slice = sensor window                [SLICE]
+
+    OUTPUTS:
+    - L = log-intensity, shape (len(t), h, w)         [FLOAT32 ARRAY]
+    """
+    x0, y0 = galvo_trajectory(t, self.freq, self.amplitude, self.centre, self.angle)
+    X = np.arange(x_slice.start, x_slice.stop, dtype=np.float32)[None, None, :]
+    Y = np.arange(y_slice.start, y_slice.stop, dtype=np.float32)[None, :, None]
+    x0, y0 = x0.astype(np.float32)[:, None, None], y0.astype(np.float32)[:, None, None]
+    I = beam_intensity(X, Y, x0, y0, np.float32(self.w0), self.doughnut)
+    return np.log(I + np.float32(self.background))
+
+  def window(self, t):
+    """ Sensor window containing the spot for all times t """
+    x0, y0 = galvo_trajectory(t, self.freq, self.amplitude, self.centre, self.angle)
+    x_lo = int(np.clip(np.floor(x0.min() - self.reach), 0, self.width))
+    x_hi = int(np.clip(np.ceil(x0.max() + self.reach) + 1, 0, self.width))
+    y_lo = int(np.clip(np.floor(y0.min() - self.reach), 0, self.height))
+    y_hi = int(np.clip(np.ceil(y0.max() + self.reach) + 1, 0, self.height))
+    return slice(x_lo, x_hi), slice(y_lo, y_hi)
+
+  def signal_events(self, t0, n_frames):
+    """
+    Function converts n_frames frames after t0 into threshold-crossing events
+
+    INPUTS:
+    - t0 = time of the frame preceding the block      [FLOAT, us]
+    - n_frames = number of frames in the block        [INT]
+
+    OUTPUTS:
+    - evs = events of the block, unsorted             [EVENT_DTYPE ARRAY]
+    """
+    t = t0 + self.dt*np.arange(n_frames + 1)
+    xs, ys = self.window(t)
+    if xs.start >= xs.stop or ys.start >= ys.stop:
+      return np.empty(0, EVENT_DTYPE)
+
+    L = self.log_frames(t, xs, ys)
+    C = self.C[ys, xs]
+    q = np.floor((L - self.offset[ys, xs])/C)                         # level index of every frame
+    n = np.diff(q, axis=0).astype(np.int64)                           # signed crossings between frames
+
+    #%% [ONE EVENT PER LEVEL CROSSED]
+    f, iy, ix = np.nonzero(n)
+    counts = n[f, iy, ix]
+    reps = np.abs(counts)
+    first = np.repeat(np.cumsum(reps) - reps, reps)
+    k = np.arange(reps.sum()) - first                                 # 0..|n|-1 within each crossing group
+    f, iy, ix, sign = np.repeat(f, reps), np.repeat(iy, reps), np.repeat(ix, reps), np.repeat(np.sign(counts), reps)
+
+    # level crossed: q+1, q+2, ... going up, q, q-1, ... going down
+    q0 = q[f, iy, ix]
+    level = np.where(sign > 0, q0 + 1 + k, q0 - k)*C[iy, ix] + self.offset[ys, xs][iy, ix]
+    L_a, L_b = L[f, iy, ix], L[f + 1, iy, ix]
+    frac = (level - L_a)/(L_b - L_a)                                  # linear interpolation in time
+
+    evs = np.empty(f.size, EVENT_DTYPE)
+    evs['x'] = ix + xs.start
+    evs['y'] = iy + ys.start
+    evs['p'] = sign > 0                                               # 1 = ON, 0 = OFF
+    evs['t'] = np.round(t[f] + frac*self.dt)
+    return evs
+
+  def noise_events(self, t_start, t_end):
+    """ Function draws uniform background events between t_start and t_end [us] """
+    n = self.rng.poisson(self.noise_rate*self.width*self.height*(t_end - t_start)*1e-6)
+    evs = np.empty(n, EVENT_DTYPE)
+    evs['x'] = self.rng.integers(0, self.width, n)
+    evs['y'] = self.rng.integers(0, self.height, n)
+    evs['p'] = self.rng.integers(0, 2, n)
+    evs['t'] = self.rng.integers(int(t_start), int(t_end), n) if t_end > t_start else 0
+    return evs
+
+  def stream(self, duration, frames_per_block=64):
+    """
+    Generator of time-ordered event chunks
+
+    INPUTS:
+    - duration = length of the stream                 [FLOAT, us]
+    - frames_per_block = frames rendered per chunk    [INT]
+
+    OUTPUTS:
+    - evs = chunk of events sorted by timestamp       [EVENT_DTYPE ARRAY]
+    """
+    n_total = int(np.ceil(duration/self.dt))
+    for start in range(0, n_total, frames_per_block):
+      n_frames = min(frames_per_block, n_total - start)
+      t0 = start*self.dt
+      t1 = (start + n_frames)*self.dt
+      evs = np.concatenate([self.signal_events(t0, n_frames), self.noise_events(t0, t1)])
+      yield evs[np.argsort(evs['t'], kind='stable')]
+
+
+class NpyEventWriter:
+  """
+  Streams event chunks into a single .npy file without knowing the total count in advance
+
+  The header is written with room for any length and rewritten with the final
+  shape on close, so the file opens with np.load(path, mmap_mode='r').
+  """
+  HEADER_LEN = 128
+
+  def __init__(self, path, dtype=EVENT_DTYPE):
+    self.path, self.dtype, self.count = path, np.dtype(dtype), 0
+    self.file = open(path, 'wb')
+    self.file.write(self._header(0))
+
+  def _header(self, n):
+    d = {'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False, 'shape': (n,)}
+    body = repr(d).encode('latin1')
+    magic = np.lib.format.magic(1, 0)
+    pad = self.HEADER_LEN - len(magic) - 2 - len(body) - 1
+    if pad < 0:
+      raise ValueError('dtype description too long for the reserved .npy header')
+    return magic + np.uint16(self.HEADER_LEN - len(magic) - 2).tobytes() + body + b' '*pad + b'\n'
+
+  def write(self, evs):
+    self.file.write(np.ascontiguousarray(evs, dtype=self.dtype).tobytes())
+    self.count += len(evs)
+
+  def close(self):
+    self.file.seek(0)
+    self.file.write(self._header(self.count))
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+class Hdf5EventWriter:
+  """
+  Streams event chunks into a resizable, chunked and compressed 'CD/events' dataset (needs h5py)
+
+  The dataset is tagged with generator='event_simulator' and the sensor
+  width/height, to tell it apart from Metavision HDF5 recordings.
+  """
+
+  def __init__(self, path, chunk=2**18, compression='lzf', width=WIDTH, height=HEIGHT):
+    if h5py is None:
+      raise ImportError('h5py is required for HDF5 output, use a .npy path instead')
+    self.file = h5py.File(path, 'w')
+    self.dset = self.file.create_dataset('CD/events', shape=(0,), maxshape=(None,), dtype=EVENT_DTYPE,
+                                         chunks=(chunk,), compression=compression)
+    self.dset.attrs.update(generator='event_simulator', width=width, height=height)
+    self.count = 0
+
+  def write(self, evs):
+    n = len(evs)
+    self.dset.resize((self.count + n,))
+    self.dset[self.count:self.count + n] = evs
+    self.count += n
+
+  def close(self):
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def event_writer(path, **kwargs):
+  """ Writer for the file type given by the extension of path (.npy, .h5 or .hdf5) """
+  if path.endswith(('.h5', '.hdf5')):
+    return Hdf5EventWriter(path, **kwargs)
+  return NpyEventWriter(path)
+
+
+def load_events(path):
+  """
+  Function opens a generated event file without reading it into memory
+
+  OUTPUTS:
+  - evs = events, memory-mapped (.npy) or an h5py dataset  [EVENT_DTYPE ARRAY]
+  """
+  if path.endswith(('.h5', '.hdf5')):
+    if h5py is None:
+      raise ImportError('h5py is required to read HDF5 event files')
+    return h5py.File(path, 'r')['CD/events']
+  return np.load(path, mmap_mode='r')
+
+
+def is_simulator_file(path):
+  """ True for .npy files and for HDF5 files written by Hdf5EventWriter """
+  if path.endswith('.npy'):
+    return True
+  if not path.endswith(('.h5', '.hdf5')) or h5py is None:
+    return False
+  with h5py.File(path, 'r') as f:
+    return 'CD/events' in f and f['CD/events'].attrs.get('generator') == 'event_simulator'
+
+
+def sensor_size(path):
+  """ Sensor geometry (height, width) stored in a generated HDF5 file, None when it is not recorded (.npy) """
+  if not path.endswith(('.h5', '.hdf5')) or h5py is None:
+    return None
+  with h5py.File(path, 'r') as f:
+    attrs = f['CD/events'].attrs if 'CD/events' in f else {}
+    return (int(attrs['height']), int(attrs['width'])) if 'width' in attrs and 'height' in attrs else None
+
+
+def parse_args():
+  import argparse
+  """Parse command line arguments."""
+  parser = argparse.ArgumentParser(description='Synthetic event stream of a galvo-scanned LG01/TEM00 spot.',
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-o', '--output', dest='output', default='synthetic_events.npy',
+                      help='Output file, .npy or .h5/.hdf5 (needs h5py)')
+  parser.add_argument('-d', '--duration', dest='duration', type=float, default=1.0, help='Stream length, in seconds')
+  parser.add_argument('-f', '--frequency', dest='freq', type=float, default=10.0, help='Frequency of Galvo, in Hz')
+  parser.add_argument('-A', '--amplitude', dest='amplitude', type=float, default=300.0, help='Scan amplitude, in pixels')
+  parser.add_argument('-w', '--waist', dest='w0', type=float, default=20.0, help='Beam waist on the sensor, in pixels')
+  parser.add_argument('--tem00', dest='doughnut', action='store_false', help='Use a TEM00 spot instead of LG01')
+  parser.add_argument('--fps', dest='fps', type=float, default=20000.0, help='Frame rate of the rendered video, in Hz')
+  parser.add_argument('-C', '--contrast', dest='C', type=float, default=0.25, help='Mean contrast threshold')
+  parser.add_argument('--noise-rate', dest='noise_rate', type=float, default=0.1,
+                      help='Background events per pixel per second')
+  parser.add_argument('--seed', dest='seed', type=int, default=0, help='Random seed')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  sim = EventSimulator(freq=args.freq, amplitude=args.amplitude, w0=args.w0, doughnut=args.doughnut,
+                       fps=args.fps, C_mean=args.C, noise_rate=args.noise_rate, seed=args.seed)
+
+  #%% [GENERATE & STREAM TO DISK]
+  start = time.perf_counter()
+  with event_writer(args.output) as writer:
+    for evs in sim.stream(args.duration*1e6):
+      writer.write(evs)
+      print(f'Events written: {writer.count}', end='\r')
+  elapsed = time.perf_counter() - start
+
+  print(f'\n{writer.count} events over {args.duration:.2f} s of sensor time written to {args.output}')
+  print(f'Generated in {elapsed:.2f} s: {writer.count/elapsed*60:.3g} events per minute of wall time')
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,166 @@
+## This script calibrates a hot-pixel mask from a dark/ambient event recording and applies it to event buffers at ingest
+## The per-pixel event rate is thresholded robustly (median + n MAD, and above the Poisson tail of the median rate),
+## saved as a packed bitmap, and removed from every buffer with one lookup on y*width + x before counting or tracking
+## Date: 19 Oct 2026
+
+import numpy as np
+from scipy.stats import poisson
+
+
+def event_chunks(path, delta_t=1000000):
+  """
+  Generator of event buffers of a recording: .evarc archive, .npy/.h5 of event_simulator, or RAW/HDF5 with Metavision
+  """
+  if path.endswith('.evarc'):
+    from event_archive import ArchiveEventsIterator
+    yield from ArchiveEventsIterator(path, delta_t=delta_t)
+  elif path.endswith(('.npy', '.h5')):
+    from event_simulator import load_events
+    events = load_events(path)
+    for start in range(0, len(events), 2**22):
+      yield np.asarray(events[start:start + 2**22])
+  else:
+    from metavision_core.event_io import EventsIterator
+    yield from EventsIterator(input_path=path, delta_t=delta_t)
+
+
+def rate_map(chunks, width=1280, height=720):
+  """
+  Function accumulates the per-pixel event counts of a recording
+
+  INPUTS:
+  - chunks = iterable of event buffers (x, y, p, t)   [STRUCTURED ARRAYS]
+  - width, height = sensor geometry                   [INT, pixel]
+
+  OUTPUTS:
+  - counts = events per pixel, shape (height, width)  [ARRAY]
+  - duration = time covered by the events             [FLOAT, s]
+  """
+  counts = np.zeros(width*height, dtype=np.int64)
+  t_first = t_last = None
+  for evs in chunks:
+    if evs.size == 0:
+      continue
+    counts += np.bincount(evs['y'].astype(np.intp)*width + evs['x'], minlength=width*height)
+    t_first = evs['t'][0] if t_first is None else t_first
+    t_last = evs['t'][-1]
+  duration = 0.0 if t_first is None else (t_last - t_first + 1)*1e-6
+  return counts.reshape(height, width), duration
+
+
+def hot_pixel_threshold(counts, n_mad=5.0, false_rate=1e-3):
+  """
+  Function gives the count above which a pixel is hot
+
+  The robust threshold median + n_mad*1.4826*MAD ignores the hot pixels
+  themselves. In a dark recording most pixels fire a few times at most and
+  the MAD is 0, so the count must also exceed the Poisson tail of the median
+  count, where on average false_rate pixels of the whole sensor are flagged
+  by chance.
+
+  INPUTS:
+  - counts = events per pixel                         [ARRAY]
+  - n_mad = number of scaled MADs above the median    [FLOAT]
+  - false_rate = expected normal pixels flagged       [FLOAT]
+
+  OUTPUTS:
+  - threshold = hot if counts > threshold             [FLOAT]
+  """
+  c = counts.ravel()
+  median = np.median(c)
+  mad = 1.4826*np.median(np.abs(c - median))
+  return max(median + n_mad*mad, poisson.isf(false_rate/c.size, max(median, 1)))
+
+
+class HotPixelMask:
+  """
+  Hot-pixel mask kept as a packed bitmap on disk and as a flat boolean lookup table in memory
+
+  INPUTS:
+  - mask = True for hot pixels, shape (height, width) [BOOL ARRAY]
+  """
+
+  def __init__(self, mask):
+    mask = np.asarray(mask, dtype=bool)
+    self.height, self.width = mask.shape
+    self.hot = np.ascontiguousarray(mask).ravel()
+
+  @classmethod
+  def calibrate(cls, chunks, width=1280, height=720, n_mad=5.0, false_rate=1e-3):
+    """
+    Function builds the mask from the events of a dark/ambient recording
+
+    OUTPUTS:
+    - mask = hot-pixel mask                           [HotPixelMask]
+    - counts, duration, threshold = calibration data  [ARRAY, FLOAT s, FLOAT]
+    """
+    counts, duration = rate_map(chunks, width, height)
+    threshold = hot_pixel_threshold(counts, n_mad, false_rate)
+    return cls(counts > threshold), counts, duration, threshold
+
+  @property
+  def mask(self):
+    return self.hot.reshape(self.height, self.width)
+
+  @property
+  def n_hot(self):
+    return int(np.count_nonzero(self.hot))
+
+  def keep(self, evs):
+    """ Boolean array, True for the events of normal pixels """
+    return ~self.hot[evs['y'].astype(np.intp)*self.width + evs['x']]
+
+  def filter(self, evs):
+    """ Function removes the events of hot pixels from a buffer """
+    if evs.size == 0 or not self.n_hot:
+      return evs
+    return evs[self.keep(evs)]
+
+  def check_size(self, height, width):
+    """ Function raises ValueError when the mask was made for another sensor geometry """
+    if (height, width) != (self.height, self.width):
+      raise ValueError(f'hot-pixel mask is {self.width}x{self.height}, the sensor is {width}x{height}')
+
+  def save(self, path, **calibration):
+    """ Function saves the packed bitmap (1 bit per pixel) with optional calibration data """
+    np.savez_compressed(path, bits=np.packbits(self.hot), width=self.width, height=self.height, **calibration)
+
+  @classmethod
+  def load(cls, path):
+    with np.load(path) as data:
+      width, height = int(data['width']), int(data['height'])
+      hot = np.unpackbits(data['bits'], count=width*height).astype(bool)
+    return cls(hot.reshape(height, width))
+
+
+def parse_args():
+  import argparse
+  """Parse command line arguments."""
+  parser = argparse.ArgumentParser(description='Hot-pixel mask calibration from a dark/ambient event recording.',
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-i', '--input-event-file', dest='event_file_path', required=True,
+                      help='Dark/ambient recording (RAW, HDF5, .evarc or .npy)')
+  parser.add_argument('-o', '--output', dest='output', default='hot_pixels.npz', help='Path of the mask file')
+  parser.add_argument('--width', dest='width', type=int, default=1280, help='Sensor width, in pixels')
+  parser.add_argument('--height', dest='height', type=int, default=720, help='Sensor height, in pixels')
+  parser.add_argument('--n-mad', dest='n_mad', type=float, default=5.0, help='Threshold in scaled MADs above the median')
+  parser.add_argument('--false-rate', dest='false_rate', type=float, default=1e-3,
+                      help='Expected number of normal pixels flagged by the Poisson threshold')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  hot, counts, duration, threshold = HotPixelMask.calibrate(event_chunks(args.event_file_path), args.width,
+                                                            args.height, args.n_mad, args.false_rate)
+  n_events = counts.sum()
+  hot_events = counts[hot.mask].sum()
+  print(f'{n_events} events over {duration:.2f} s, threshold {threshold:.0f} events per pixel')
+  print(f'{hot.n_hot} hot pixels ({hot.n_hot/hot.hot.size:.3%} of the sensor) '
+        f'produce {hot_events/max(n_events, 1):.1%} of the events')
+  hot.save(args.output, duration=duration, threshold=threshold)
+  print(f'Mask saved to {args.output}')
+
+
+if __name__ == "__main__":
+  main()
@@ -19,6 +19,9 @@ from metavision_sdk_analytics import TrackingAlgorithm, TrackingConfig, draw_tra
 from metavision_sdk_core import BaseFrameGenerationAlgorithm, RollingEventBufferConfig, RollingEventCDBuffer
 from metavision_sdk_cv import ActivityNoiseFilterAlgorithm, TrailFilterAlgorithm
 from metavision_sdk_ui import EventLoop, BaseWindow, MTWindow, UIAction, UIKeyEvent
+from event_archive import ArchiveEventsIterator, is_archive
+from pipeline_profiler import make_profiler
+from hot_pixels import HotPixelMask
 
 
 def parse_args():
@@ -31,8 +34,8 @@ def parse_args():
     base_options = parser.add_argument_group('Base options')
     base_options.add_argument(
         '-i', '--input-event-file', dest='event_file_path', default="",
-        help="Path to input event file (RAW or HDF5). If not specified, the camera live stream is used. "
-             "If it's a camera serial number, it will try to open that camera instead.")
+        help="Path to input event file (RAW, HDF5 or .evarc archive of event_archive.py). If not specified, the camera "
+             "live stream is used. If it's a camera serial number, it will try to open that camera instead.")
     base_options.add_argument('--process-from', dest='process_from', type=int, default=0,
                               help='Start time to process events (in us).')
     base_options.add_argument('--process-to', dest='process_to', type=int, default=None,
@@ -57,6 +60,8 @@ def parse_args():
         help='Length of the time window for activity filtering (in us, disabled if equal to 0).')
     filter_options.add_argument('--activity-trail-ths', dest='activity_trail_ths', type=int, default=1000,
                                 help='Length of the time window for trail filtering (in us, disabled if equal to 0).')
+    filter_options.add_argument('--hot-pixels', dest='hot_pixels', type=str, default="",
+                                help='Path to a hot-pixel mask from hot_pixels.py, applied before any other filter.')
 
     # Outcome Options
     outcome_options = parser.add_argument_group('Outcome options')
@@ -70,6 +75,16 @@ def parse_args():
         '-f', '--replay_factor', type=float, default=1,
         help="Replay Factor. If greater than 1.0 we replay with slow-motion, otherwise this is a speed-up over real-time.")
 
+    # Profiling Options
+    profiling_options = parser.add_argument_group('Profiling options')
+    profiling_options.add_argument(
+        '--profile', dest='profile', action='store_true',
+        help="Time every processing stage and report p50/p99 latencies and events/s, periodically and at exit.")
+    profiling_options.add_argument('--profile-interval', dest='profile_interval', type=float, default=5.,
+                                   help='Seconds between periodic profiling reports (0 for the final report only).')
+    profiling_options.add_argument('--profile-json', dest='profile_json', type=str, default="",
+                                   help='Path to a JSON file to save the final profiling report and histograms.')
+
     args = parser.parse_args()
 
     if args.process_to and args.process_from > args.process_to:
@@ -92,12 +107,14 @@ def main():
     # [GENERIC_TRACKING_CREATE_ITERATOR_BEGIN]
     # Events iterator on Camera or event file
     delta_t = int(1000000 / args.update_frequency)
-    mv_iterator = EventsIterator(input_path=args.event_file_path, start_ts=args.process_from,
+    # Archives seek straight to --process-from through their time index instead of decoding from the start
+    iterator_class = ArchiveEventsIterator if is_archive(args.event_file_path) else EventsIterator
+    mv_iterator = iterator_class(input_path=args.event_file_path, start_ts=args.process_from,
                                  max_duration=args.process_to - args.process_from if args.process_to else None,
                                  delta_t=delta_t, mode="delta_t")
     # [GENERIC_TRACKING_CREATE_ITERATOR_END]
 
-    if args.replay_factor > 0 and not is_live_camera(args.event_file_path):
+    if args.replay_factor > 0 and not is_live_camera(args.event_file_path) and not is_archive(args.event_file_path):
         mv_iterator = LiveReplayEventsIterator(mv_iterator, replay_factor=args.replay_factor)
     height, width = mv_iterator.get_size()  # Camera Geometry
 
@@ -105,6 +122,12 @@ def main():
     activity_noise_filter = ActivityNoiseFilterAlgorithm(width, height, args.activity_time_ths)
     trail_filter = TrailFilterAlgorithm(width, height, args.activity_trail_ths)
 
+    # Hot-pixel mask, removes persistently firing pixels before the filters spend time on them
+    hot_pixels = None
+    if args.hot_pixels:
+        hot_pixels = HotPixelMask.load(args.hot_pixels)
+        hot_pixels.check_size(height, width)
+
     # Tracking Algorithm
     tracking_config = TrackingConfig()  # Default configuration
     tracking_config.motion_model = TrackingConfig.MotionModel.Smooth
@@ -122,17 +145,28 @@ def main():
 
     events_buf = ActivityNoiseFilterAlgorithm.get_empty_output_buffer()
     tracking_results = tracking_algo.get_empty_output_buffer()                  # initialized, yet to be filled with info
+
+    # Per-stage latency profiler, a no-op unless --profile is given
+    profiler = make_profiler(args.profile, stages=['read_events', 'poll_and_dispatch', 'hot_pixel_mask',
+                                                   'noise_filter', 'trail_filter',
+                                                   'tracking', 'print', 'generate_frame', 'draw_tracking_results',
+                                                   'show_async', 'video_writer'],
+                             interval=args.profile_interval, json_path=args.profile_json or None, budget_us=delta_t)
                                                                                 
     # [GENERIC_TRACKING_MAIN_PROCESSING_BEGIN]
-    def process_tracking(evs):
+    def process_tracking(evs, t):
         if len(evs) != 0:
             rolling_buffer.insert_events(evs)
             tracking_algo.process_events(rolling_buffer, tracking_results)   #tracking_results fed through here
+            t = profiler.lap('tracking', t, n_in=len(evs), n_out=tracking_results)
             print(tracking_results.max_size())
+            t = profiler.lap('print', t)
             BaseFrameGenerationAlgorithm.generate_frame(rolling_buffer, output_img)
+            t = profiler.lap('generate_frame', t)
 
             # for drawing the results onto each frame
             draw_tracking_results(evs['t'][-1], tracking_results, output_img)
+            t = profiler.lap('draw_tracking_results', t)
             
             # for drawing the dot of each centre of box each frame
             # producing a trackpath
@@ -140,10 +174,13 @@ def main():
             #draw_tracking_results(evs['t'][-1], tracking_results, track_img)
         
         window.show_async(output_img)
+        t = profiler.lap('show_async', t)
         #window.show_async(track_img)
         if args.out_video:
             video_writer.write(output_img)
+            t = profiler.lap('video_writer', t)
             #video_writer.write(track_img)
+        return t
     # [GENERIC_TRACKING_MAIN_PROCESSING_END]
 
     # Window - Graphical User Interface (Display tracking results and process keyboard events)
@@ -195,33 +232,47 @@ def main():
 
         # [GENERIC_TRACKING_MAIN_LOOP_BEGIN]
         # Process events
+        t = profiler.now()
         for evs in mv_iterator:
+            t = profiler.lap('read_events', t, n_in=0, n_out=evs)
             # Dispatch system events to the window
             EventLoop.poll_and_dispatch()
+            t = profiler.lap('poll_and_dispatch', t)
+            n_read = evs.size
+            if hot_pixels is not None:
+                evs = hot_pixels.filter(evs)
+                t = profiler.lap('hot_pixel_mask', t, n_in=n_read, n_out=evs)
 
             # Process events
             if args.activity_time_ths > 0:
                 activity_noise_filter.process_events(evs, events_buf)
+                t = profiler.lap('noise_filter', t, n_out=events_buf)
                 if args.activity_trail_ths > 0:
                     trail_filter.process_events_(events_buf)
+                    t = profiler.lap('trail_filter', t, n_out=events_buf)
 
-                process_tracking(events_buf.numpy())
+                t = process_tracking(events_buf.numpy(), t)
 
             elif args.activity_trail_ths > 0:
                 trail_filter.process_events(evs, events_buf)
+                t = profiler.lap('trail_filter', t, n_out=events_buf)
 
-                process_tracking(events_buf.numpy())
+                t = process_tracking(events_buf.numpy(), t)
             else:
-                process_tracking(evs)
+                t = process_tracking(evs, t)
 
+            profiler.tick(n_read)
             if window.should_close():
                 break
+            t = profiler.now()
         # [GENERIC_TRACKING_MAIN_LOOP_END]
 
         if args.out_video:
             video_writer.release()
             print("Video has been saved in " + video_name)
 
+    profiler.close()
+
 
 if __name__ == "__main__":
     main()
@@ -12,9 +12,12 @@ Metavision SDK Get Started.
 """
 
 
-from metavision_core.event_io import EventsIterator
+from metavision_core.event_io import EventsIterator, is_live_camera
 from metavision_sdk_core import PeriodicFrameGenerationAlgorithm
 from metavision_sdk_ui import EventLoop, BaseWindow, Window, UIAction, UIKeyEvent
+from phase_folding import PhaseFolder
+from event_ring_buffer import EventRingBuffer, start_reader
+from hot_pixels import HotPixelMask
 
 def parse_args():
     import argparse
@@ -38,6 +41,31 @@ def parse_args():
     parser.add_argument(
         '-N', '--datapoints', dest='N', type=int, default=1000,
         help='Number of datapoints to obtain before shutting down script')
+
+    parser.add_argument(
+        '-P', '--phase-bins', dest='phase_bins', type=int, default=0,
+        help='Number of phase bins to fold the events into at the Galvo period (0 disables phase folding)')
+
+    parser.add_argument(
+        '--cube', dest='cube', action='store_true',
+        help='When phase folding, also accumulate the (phase bin, y, x) event cube')
+
+    parser.add_argument(
+        '-t', '--threaded', dest='threaded', action='store_true',
+        help='Pull the event buffers in a dedicated reader thread through a ring buffer, '
+        'so printing and disk writes cannot stall the acquisition')
+
+    parser.add_argument(
+        '--ring-slots', dest='ring_slots', type=int, default=4096,
+        help='Number of buffers the ring can hold in threaded mode')
+
+    parser.add_argument(
+        '--ring-events', dest='ring_events', type=int, default=2**24,
+        help='Number of events the ring can hold in threaded mode when they are copied (phase folding)')
+
+    parser.add_argument(
+        '--hot-pixels', dest='hot_pixels', default="",
+        help='Path to a hot-pixel mask from hot_pixels.py, whose events are removed before counting')
     
     args = parser.parse_args()
     return args
@@ -55,29 +83,49 @@ def main():
     filename = f'{(args.freq)}Hz-data'
     lim = args.N
 
-    # Process events
-    with open(filename, 'w') as f:                  # implement writing loops
-        for i, evs in enumerate(mv_iterator):       # track the number of iteration & elements evs 
+    # Phase folding at the Galvo period, the events of every slice are kept in phase-resolved histograms
+    folder = None
+    if args.phase_bins > 0:
+        height, width = mv_iterator.get_size()
+        folder = PhaseFolder(args.freq, args.phase_bins, width=width, height=height, cube=args.cube)
 
-            if evs.size == 0:
-                print("The current event buffer is empty.")
-            else:
-                min_t = evs['t'][0]   # Get the timestamp of the first event of this callback
-                max_t = evs['t'][-1]  # Get the timestamp of the last event of this callback
-                global_max_t = max_t  # Events are ordered by timestamp, so the current last event has the highest timestamp
+    # Hot pixels calibrated on a dark recording are dropped as the buffers come in
+    hot_pixels = None
+    if args.hot_pixels:
+        hot_pixels = HotPixelMask.load(args.hot_pixels)
+        hot_pixels.check_size(*mv_iterator.get_size())
 
-                counter = evs.size         # Local counter
-                global_counter += counter  # Increase global counter
+    # Process events
+    with open(filename, 'w') as f:                  # implement writing loops
+        if args.threaded:
+            global_counter, global_max_t = acquire_threaded(mv_iterator, f, args, folder, hot_pixels)
+        else:
+            for i, evs in enumerate(mv_iterator):       # track the number of iteration & elements evs 
+                if hot_pixels is not None:
+                    evs = hot_pixels.filter(evs)
+
+                if evs.size == 0:
+                    print("The current event buffer is empty.")
+                else:
+                    min_t = evs['t'][0]   # Get the timestamp of the first event of this callback
+                    max_t = evs['t'][-1]  # Get the timestamp of the last event of this callback
+                    global_max_t = max_t  # Events are ordered by timestamp, so the current last event has the highest timestamp
+
+                    counter = evs.size         # Local counter
+                    global_counter += counter  # Increase global counter
                     
-                print(f"Datapoints collected: {int(i/lim*100)}%",  end = '\r')	#recussive line update
+                    print(f"Datapoints collected: {int(i/lim*100)}%",  end = '\r')	#recussive line update
 
-                # write counter in a .txt file
-                f.write(f'{counter} \n')
+                    # write counter in a .txt file
+                    f.write(f'{counter} \n')
 
-                # check if past or within limit to keep iteration going
-                if i >= lim:
-                    print(f'{lim} Datapoints obtained')
-                    break
+                    if folder is not None:
+                        folder.add(evs)
+
+                    # check if past or within limit to keep iteration going
+                    if i >= lim:
+                        print(f'{lim} Datapoints obtained')
+                        break
 
     # Print the global statistics
     duration_seconds = global_max_t / 1.0e6
@@ -86,6 +134,58 @@ def main():
     if duration_seconds >= 1:  # No need to print this statistics if the total duration was too short
         print(f"There were {global_counter / duration_seconds :.2f} events per second on average.")
 
+    if folder is not None:
+        period = folder.refine_period()
+        print(f"Refined Galvo frequency: {1e6/period:.6f} Hz (nominal {args.freq} Hz)")
+        folder.save(f'{(args.freq)}Hz-phase.npz', period)
+
+def acquire_threaded(mv_iterator, f, args, folder=None, hot_pixels=None):
+    """ Reader thread fills a ring buffer, this thread counts, prints and writes; returns the event count and last timestamp """
+    # Events are only copied when the consumer needs them, otherwise the ring holds per-buffer summaries
+    ring = EventRingBuffer(n_slots=args.ring_slots, n_events=args.ring_events if folder is not None else 0,
+                           block=not is_live_camera(args.event_file_path))   # a file can wait, a camera cannot
+    reader, stop = start_reader(mv_iterator, ring, ingest=hot_pixels.filter if hot_pixels is not None else None)
+
+    global_counter = 0
+    global_max_t = 0
+    expected = 0            # index of the next buffer, dropped buffers leave a gap
+    lim = args.N
+    while True:
+        summary, evs = ring.get()
+        if summary is None:
+            break
+        i = int(summary['index'])
+
+        # keep one line per slice in the data file, nan for the slices the reader had to drop
+        for _ in range(expected, min(i, lim + 1)):
+            f.write('nan \n')
+        expected = i + 1
+
+        if summary['n'] == 0:
+            print("The current event buffer is empty.")
+        else:
+            global_max_t = summary['t_last']
+            global_counter += int(summary['n'])
+            print(f"Datapoints collected: {int(i/lim*100)}%",  end = '\r')
+            f.write(f"{summary['n']} \n")
+            if folder is not None:
+                folder.add(evs)
+        ring.release()
+
+        if i >= lim:
+            print(f'{lim} Datapoints obtained')
+            break
+
+    stop.set()
+    ring.close()
+    reader.join(timeout=1)
+
+    stats = ring.stats()
+    print(f"Reader thread: {stats['buffers']} buffers, {stats['dropped']} dropped ({stats['dropped_events']} events), "
+          f"queue high-water mark {stats['high_water']}/{stats['slots']} buffers"
+          + (f", {stats['high_water_events']}/{stats['event_capacity']} events" if stats['event_capacity'] else ""))
+    return global_counter, global_max_t
+
 def window():
     """ Window display to check the code before acquiring data """
     args = parse_args()
@@ -0,0 +1,206 @@
+## This script folds an event stream at the galvo period (epoch folding), in a single pass over the recording
+## Every event is mapped to phase = (t mod period)/period and accumulated into a (phase-bin x polarity) histogram,
+## optionally into a (phase-bin x y x x) cube, while the binned event rate is kept to refine the period by FFT, in at
+## most max_rate_bins bins (merged in pairs when the recording outgrows them)
+## Date: 19 Oct 2026
+
+import numpy as np
+from scipy.fft import rfft, rfftfreq, next_fast_len
+
+
+class PhaseFolder:
+  """
+  Streaming phase-folding accumulator for EventCD buffers (fields x, y, p, t)
+
+  The histograms are preallocated and every buffer is added with np.bincount on
+  flattened indices. The event rate is also binned in time, with bins of
+  period/n_bins by default, so that refine_period() can estimate the true galvo
+  frequency from its spectrum and refold() can redo the (phase x polarity)
+  histogram at the refined period without a second pass. The cube can only be
+  rebuilt by folding the events again. The rate is held in at most
+  max_rate_bins bins (16 bytes each): once a recording outgrows them,
+  neighbouring bins are merged in pairs and rate_bin doubles.
+
+  INPUTS:
+  - freq = nominal galvo frequency                    [FLOAT, Hz]
+  - n_bins = number of phase bins                     [INT]
+  - width, height = sensor geometry, for the cube     [INT, pixel]
+  - cube = also accumulate the (n_bins, y, x) cube    [BOOL]
+  - rate_bin = width of the time bins of the rate     [FLOAT, us]
+  - t0 = time of phase zero                           [FLOAT, us]
+  - max_rate_bins = largest number of rate bins       [INT]
+  """
+
+  def __init__(self, freq, n_bins=64, width=1280, height=720, cube=False, rate_bin=None, t0=0, max_rate_bins=2**21):
+    self.period = 1e6/freq                                            # us
+    self.n_bins, self.width, self.height, self.t0 = n_bins, width, height, t0
+    self.hist = np.zeros((n_bins, 2), dtype=np.int64)                # columns: OFF, ON
+    self.cube = np.zeros((n_bins, height, width), dtype=np.uint32) if cube else None
+    self.rate_bin = self.period/n_bins if rate_bin is None else rate_bin
+    self.max_rate_bins = max_rate_bins
+    self.rate = np.zeros((min(1024, max_rate_bins), 2), dtype=np.int64)  # grows as the recording goes on
+    self.n_rate = 0                                                   # rate bins filled
+    self.count = 0
+
+  def phase_bin(self, t, period=None):
+    """ Phase bin 0..n_bins-1 of timestamps t [us] """
+    period = self.period if period is None else period
+    b = (np.mod(t - self.t0, period)*(self.n_bins/period)).astype(np.intp)
+    return np.minimum(b, self.n_bins - 1)                             # phase rounding up to 1.0
+
+  def add(self, evs):
+    """
+    Function folds one buffer of events into the histograms
+
+    INPUTS:
+    - evs = events with fields x, y, p, t              [STRUCTURED ARRAY]
+    """
+    if evs.size == 0:
+      return
+    t = evs['t']
+    p = (evs['p'] > 0).astype(np.intp)
+    b = self.phase_bin(t)
+    self.hist += np.bincount(2*b + p, minlength=2*self.n_bins).reshape(self.n_bins, 2)
+
+    if self.cube is not None:
+      idx = (b*self.height + evs['y'])*self.width + evs['x']
+      flat = self.cube.reshape(-1)
+      if 8*idx.size < flat.size:
+        # sparse buffer, a full-length bincount would cost more than the events
+        u, c = np.unique(idx, return_counts=True)
+        flat[u] += c.astype(np.uint32)
+      else:
+        flat += np.bincount(idx, minlength=flat.size).astype(np.uint32)
+
+    #%% [BINNED RATE FOR THE PERIOD REFINEMENT]
+    k = np.floor((t - self.t0)/self.rate_bin).astype(np.intp)
+    k_max = int(k.max()) + 1
+    while k_max > self.max_rate_bins:
+      self._merge_rate()
+      k //= 2                                                         # floor(x/2b) = floor(floor(x/b)/2)
+      k_max = int(k.max()) + 1
+    if k_max > self.rate.shape[0]:
+      grown = np.zeros((min(max(2*self.rate.shape[0], k_max), self.max_rate_bins), 2), dtype=np.int64)
+      grown[:self.n_rate] = self.rate[:self.n_rate]
+      self.rate = grown
+    k_min = max(int(k.min()), 0)
+    self.rate[k_min:k_max] += np.bincount(2*(k - k_min) + p, minlength=2*(k_max - k_min)).reshape(-1, 2)
+    self.n_rate = max(self.n_rate, k_max)
+    self.count += evs.size
+
+  def _merge_rate(self):
+    # sums neighbouring rate bins in place, doubling rate_bin, so the whole recording fits in max_rate_bins
+    n = self.n_rate + self.n_rate % 2
+    merged = self.rate[:n].reshape(-1, 2, 2).sum(axis=1)
+    self.rate[:n] = 0
+    self.rate[:n//2] = merged
+    self.n_rate = n//2
+    self.rate_bin *= 2
+
+  def refine_period(self, n_harmonics=4, tolerance=0.05, pad=4):
+    """
+    Function estimates the galvo period from the FFT of the binned event rate
+
+    The scanned spot fires on both sweeps, so the rate is often strongest at
+    twice the galvo frequency. The peak is searched around each of the first
+    n_harmonics multiples of the nominal frequency, located to a fraction of
+    a bin by a parabola through the log-magnitude, and the strongest
+    harmonic h gives f = f_h/h.
+
+    INPUTS:
+    - n_harmonics = harmonics searched                 [INT]
+    - tolerance = relative search window               [FLOAT]
+    - pad = zero padding factor of the FFT             [INT]
+
+    OUTPUTS:
+    - period = refined period                          [FLOAT, us]
+    """
+    r = self.rate[:self.n_rate].sum(axis=1).astype(float)
+    r -= r.mean()
+    n = next_fast_len(pad*r.size)
+    A = np.abs(rfft(r, n))
+    f = rfftfreq(n, self.rate_bin*1e-6)
+    f_nom = 1e6/self.period
+
+    best = (0, f_nom)
+    for h in range(1, n_harmonics + 1):
+      lo, hi = np.searchsorted(f, [h*f_nom*(1 - tolerance), h*f_nom*(1 + tolerance)])
+      if hi - lo < 3 or hi >= f.size:
+        continue
+      i = lo + np.argmax(A[lo:hi])
+      a, b, c = np.log(A[i - 1:i + 2] + 1e-300)
+      delta = 0.5*(a - c)/(a - 2*b + c) if a - 2*b + c < 0 else 0
+      if A[i] > best[0]:
+        best = (A[i], (f[i] + delta*(f[1] - f[0]))/h)
+    return 1e6/best[1]
+
+  def refold(self, period):
+    """
+    Function rebuilds the (phase-bin x polarity) histogram at a new period from the binned rate
+
+    The phase of each rate bin is taken at its centre, so the resolution is
+    limited to rate_bin. The cube is left at the folding period.
+
+    OUTPUTS:
+    - hist = refolded histogram, shape (n_bins, 2)      [ARRAY]
+    """
+    t = self.t0 + (np.arange(self.n_rate) + 0.5)*self.rate_bin
+    b = self.phase_bin(t, period)
+    hist = np.zeros((self.n_bins, 2), dtype=np.int64)
+    for p in range(2):
+      hist[:, p] = np.bincount(b, weights=self.rate[:self.n_rate, p], minlength=self.n_bins)
+    return hist
+
+  def profile(self, hist=None):
+    """
+    Phase-resolved rate: bin centres in [0, 1) and events per second in each
+    phase bin for OFF and ON, averaged over the folded cycles
+    """
+    hist = self.hist if hist is None else hist
+    duration = self.n_rate*self.rate_bin*1e-6                         # s
+    phase = (np.arange(self.n_bins) + 0.5)/self.n_bins
+    return phase, hist*self.n_bins/max(duration, 1e-300)
+
+  def save(self, path, period=None):
+    """ Function saves the histograms, and the refolded histogram if a refined period is given, to .npz """
+    out = dict(period=self.period, n_bins=self.n_bins, t0=self.t0, hist=self.hist, count=self.count,
+               rate=self.rate[:self.n_rate], rate_bin=self.rate_bin)
+    if period is not None:
+      out.update(refined_period=period, refolded_hist=self.refold(period))
+    if self.cube is not None:
+      out['cube'] = self.cube
+    np.savez_compressed(path, **out)
+
+
+def fold(events, freq, n_bins=64, chunk=10**6, refine=True, **kwargs):
+  """
+  Function folds an array of events (e.g. event_simulator.load_events) chunk by chunk
+
+  OUTPUTS:
+  - folder = filled PhaseFolder                      [PhaseFolder]
+  - period = refined period, or the nominal one      [FLOAT, us]
+  """
+  folder = PhaseFolder(freq, n_bins, **kwargs)
+  for start in range(0, len(events), chunk):
+    folder.add(np.asarray(events[start:start + chunk]))
+  return folder, folder.refine_period() if refine else folder.period
+
+
+def main():
+  import argparse
+  from event_simulator import load_events
+  parser = argparse.ArgumentParser(description='Phase folding of an event file (.npy/.h5) at the galvo frequency.',
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-i', '--input-event-file', dest='event_file_path', required=True, help='Path to input event file')
+  parser.add_argument('-f', '--frequency', dest='freq', type=float, default=10.0, help='Nominal frequency of Galvo, in Hz')
+  parser.add_argument('-P', '--phase-bins', dest='n_bins', type=int, default=64, help='Number of phase bins')
+  parser.add_argument('--cube', dest='cube', action='store_true', help='Also accumulate the (phase, y, x) cube')
+  args = parser.parse_args()
+
+  folder, period = fold(load_events(args.event_file_path), args.freq, args.n_bins, cube=args.cube)
+  print(f'{folder.count} events folded, refined frequency {1e6/period:.6f} Hz (nominal {args.freq} Hz)')
+  folder.save(f'{args.freq}Hz-phase.npz', period)
+
+
+if __name__ == "__main__":
+  main()
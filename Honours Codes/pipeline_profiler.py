@@ -0,0 +1,248 @@
+## This script provides per-stage latency instrumentation for the event processing loops (metavision_generic_tracking)
+## Each stage is timed with perf_counter_ns into a preallocated HDR-style (log-linear) histogram, together with the
+## events in/out of the stage, and p50/p99 per stage plus events/s are reported periodically and at exit (and to JSON)
+## Date: 19 Oct 2026
+
+import json
+import numpy as np
+from time import perf_counter_ns
+
+SUB_BITS = 7                      # 64 sub-buckets per power of two, values within 1.6%
+HALF = 1 << (SUB_BITS - 1)
+MAX_EXP = 40                      # up to 2^40 ns, ~18 minutes
+N_BUCKETS = (MAX_EXP + 2)*HALF
+MAX_VALUE = (1 << MAX_EXP) - 1
+
+
+def bucket_index(v):
+  """ Histogram bucket of a latency v [ns], exact below 2^SUB_BITS ns, then 2^(SUB_BITS-1) buckets per octave """
+  v = min(v, MAX_VALUE)
+  e = v.bit_length() - SUB_BITS
+  if e <= 0:
+    return v
+  return e*HALF + (v >> e)
+
+
+def bucket_values(index):
+  """
+  Function gives the range of latencies of histogram buckets
+
+  INPUTS:
+  - index = bucket indices                            [INT ARRAY]
+
+  OUTPUTS:
+  - low, high = bucket holds low <= v < high          [INT ARRAY, ns]
+  """
+  index = np.asarray(index, dtype=np.int64)
+  e = np.maximum(index//HALF - 1, 0)
+  low = (index - e*HALF) << e
+  return low, low + (np.int64(1) << e)
+
+
+def percentiles(counts, q):
+  """ Latency percentiles q (0-100) from histogram counts, at the middle of the bucket [ns] """
+  total = counts.sum()
+  if total == 0:
+    return np.full(np.shape(q), np.nan)
+  index = np.searchsorted(np.cumsum(counts), np.asarray(q)/100*total, side='left')
+  low, high = bucket_values(np.minimum(index, counts.size - 1))
+  return (low + high - 1)/2
+
+
+class StageProfiler:
+  """
+  Latency and throughput recorder of a pipeline of stages
+
+  Usage, in a loop over event buffers:
+    t = profiler.now()
+    ... stage ...
+    t = profiler.lap('stage', t, n_out=evs_out)
+    profiler.tick(evs.size)             # end of the iteration
+
+  n_in of a stage defaults to n_out of the previous one, n_out to n_in, and
+  both can be an int, an array or a Metavision event buffer (counted only
+  when profiling is on). Use NullProfiler, same methods, when disabled.
+
+  INPUTS:
+  - stages = stage names, in pipeline order           [LIST of STR]
+  - interval = seconds between periodic reports, 0 for none  [FLOAT, s]
+  - json_path = file for the final report             [STR]
+  - budget_us = time available per iteration          [FLOAT, us]
+  """
+
+  def __init__(self, stages=(), interval=5.0, json_path=None, budget_us=None):
+    self.rows = {}
+    self.counts = np.zeros((0, N_BUCKETS), dtype=np.int64)
+    self.stats = np.zeros((0, 4), dtype=np.int64)                 # calls, total ns, events in, events out
+    self.max_ns = np.zeros(0, dtype=np.int64)
+    self._live = {}                                                 # stage: (histogram row, stats list), hot path
+    for stage in ('iteration',) + tuple(stages):
+      self._row(stage)
+    self.interval_ns = int(interval*1e9)
+    self.json_path = json_path
+    self.budget_us = budget_us
+    self.n_iterations = self.n_events = 0
+    self.last_out = 0
+    self.t_start = self.t_tick = self.t_report = perf_counter_ns()
+    self._snapshot = (self.counts.copy(), self._sync().copy(), 0, self.t_start)
+
+  def __bool__(self):
+    return True
+
+  def _row(self, stage):
+    # rows are preallocated for the stages given up front, others are added on first use
+    if stage not in self.rows:
+      self.rows[stage] = len(self.rows)
+      self.counts = np.vstack([self.counts, np.zeros((1, N_BUCKETS), dtype=np.int64)])
+      self.stats = np.vstack([self.stats, np.zeros((1, 4), dtype=np.int64)])
+      self.max_ns = np.append(self.max_ns, 0)
+      old = self._live
+      self._live = {name: (self.counts[i], old[name][1] if name in old else [0, 0, 0, 0, 0])
+                    for name, i in self.rows.items()}
+    return self.rows[stage]
+
+  def _sync(self):
+    # copy the running python counters into the stats and max_ns arrays
+    for stage, (_, s) in self._live.items():
+      i = self.rows[stage]
+      self.stats[i] = s[:4]
+      self.max_ns[i] = s[4]
+    return self.stats
+
+  @staticmethod
+  def _count(n):
+    if isinstance(n, (int, np.integer)):
+      return int(n)
+    if hasattr(n, 'numpy'):                                          # Metavision event buffers
+      return n.numpy().size
+    return len(n)
+
+  def now(self):
+    return perf_counter_ns()
+
+  def record(self, stage, dt_ns, n_in=0, n_out=0):
+    """ Function adds one latency dt_ns [ns] with its event counts to a stage """
+    if stage not in self._live:
+      self._row(stage)
+    hist, s = self._live[stage]
+    hist[bucket_index(dt_ns)] += 1
+    s[0] += 1
+    s[1] += dt_ns
+    s[2] += n_in
+    s[3] += n_out
+    if dt_ns > s[4]:
+      s[4] = dt_ns
+
+  def lap(self, stage, t, n_in=None, n_out=None):
+    """
+    Function records the time since t as the latency of stage
+
+    OUTPUTS:
+    - now = perf_counter_ns(), the start of the next stage  [INT, ns]
+    """
+    now = perf_counter_ns()
+    n_in = self.last_out if n_in is None else self._count(n_in)
+    n_out = n_in if n_out is None else self._count(n_out)
+    self.last_out = n_out
+    self.record(stage, now - t, n_in, n_out)
+    return now
+
+  def tick(self, n_events=0):
+    """ Function closes one iteration of n_events input events, and prints the periodic report when due """
+    now = perf_counter_ns()
+    self.record('iteration', now - self.t_tick, n_events, self.last_out)
+    self.t_tick = now
+    self.n_iterations += 1
+    self.n_events += n_events
+    if self.interval_ns and now - self.t_report >= self.interval_ns:
+      print(self.format(self.summary(since_last=True)))
+      self.t_report = now
+
+  def summary(self, since_last=False):
+    """
+    Function summarises the stages, over the whole run or since the last periodic report
+
+    OUTPUTS:
+    - summary = wall time, events/s and per stage calls, events, mean/p50/p90/p99/max latency  [DICT]
+    """
+    counts, stats, n_events, t0 = self.counts, self._sync(), self.n_events, self.t_start
+    if since_last:
+      c0, s0, e0, t0 = self._snapshot
+      counts = counts - np.pad(c0, ((0, len(counts) - len(c0)), (0, 0)))
+      stats = stats - np.pad(s0, ((0, len(stats) - len(s0)), (0, 0)))
+      n_events -= e0
+      self._snapshot = (self.counts.copy(), self.stats.copy(), self.n_events, perf_counter_ns())
+    wall = (perf_counter_ns() - t0)*1e-9
+
+    out = dict(wall_s=wall, events=int(n_events), events_per_s=n_events/wall if wall > 0 else 0.0, stages={})
+    for stage, i in self.rows.items():
+      calls = int(stats[i, 0])
+      if calls == 0:
+        continue
+      p50, p90, p99 = percentiles(counts[i], [50, 90, 99])*1e-3
+      # the exact maximum is only kept for the whole run, the interval one is the top of its highest bucket
+      max_ns = bucket_values(np.flatnonzero(counts[i])[-1])[1] if since_last else self.max_ns[i]
+      out['stages'][stage] = dict(calls=calls, events_in=int(stats[i, 2]), events_out=int(stats[i, 3]),
+                                  mean_us=stats[i, 1]/calls*1e-3, p50_us=p50, p90_us=p90, p99_us=p99,
+                                  max_us=max_ns*1e-3, share=stats[i, 1]*1e-9/wall if wall > 0 else 0.0)
+    if self.budget_us and 'iteration' in out['stages']:
+      low, _ = bucket_values(np.arange(N_BUCKETS))
+      over = counts[self.rows['iteration'], low >= self.budget_us*1e3].sum()
+      out['budget_us'] = self.budget_us
+      out['over_budget'] = int(over)
+    return out
+
+  def format(self, summary):
+    """ Table of a summary, one line per stage """
+    lines = [f"{summary['wall_s']:.1f} s, {summary['events_per_s']:.4g} events/s"
+             + (f", {summary['over_budget']} iterations over the {summary['budget_us']:.0f} us budget"
+                if 'budget_us' in summary else '')]
+    lines.append(f"  {'stage':<24}{'calls':>8}{'ev in':>12}{'ev out':>12}{'p50 us':>10}{'p99 us':>10}"
+                 f"{'max us':>10}{'share':>8}")
+    for stage, s in summary['stages'].items():
+      lines.append(f"  {stage:<24}{s['calls']:>8}{s['events_in']:>12}{s['events_out']:>12}{s['p50_us']:>10.1f}"
+                   f"{s['p99_us']:>10.1f}{s['max_us']:>10.1f}{s['share']:>8.1%}")
+    return '\n'.join(lines)
+
+  def close(self):
+    """ Function prints the final report and writes it, with the non-empty histogram buckets, to json_path """
+    summary = self.summary()
+    print(self.format(summary))
+    if self.json_path:
+      for stage, i in self.rows.items():
+        if stage in summary['stages']:
+          nz = np.flatnonzero(self.counts[i])
+          summary['stages'][stage]['histogram'] = dict(low_ns=bucket_values(nz)[0].tolist(),
+                                                       count=self.counts[i, nz].tolist())
+      with open(self.json_path, 'w') as f:
+        json.dump(summary, f, indent=1)
+    return summary
+
+
+class NullProfiler:
+  """ Disabled StageProfiler, every call is a no-op """
+
+  def __bool__(self):
+    return False
+
+  def now(self):
+    return 0
+
+  def record(self, stage, dt_ns, n_in=0, n_out=0):
+    pass
+
+  def lap(self, stage, t, n_in=None, n_out=None):
+    return 0
+
+  def tick(self, n_events=0):
+    pass
+
+  def close(self):
+    return None
+
+
+def make_profiler(enabled, stages=(), interval=5.0, json_path=None, budget_us=None):
+  """ StageProfiler when enabled, NullProfiler otherwise """
+  if enabled:
+    return StageProfiler(stages, interval, json_path, budget_us)
+  return NullProfiler()
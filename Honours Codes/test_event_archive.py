@@ -0,0 +1,41 @@
+## This script tests the seeking and conversion of event_archive (python -m pytest)
+## Date: 19 Oct 2026
+
+import numpy as np
+import pytest
+
+from event_archive import ArchiveWriter, ArchiveEventsIterator, EventArchive, convert
+from event_simulator import EVENT_DTYPE
+
+
+def make_events(t):
+  evs = np.zeros(len(t), EVENT_DTYPE)
+  evs['t'] = t
+  return evs
+
+
+def test_seek_into_block_before_start(tmp_path):
+  # block 0 [0, 10000) only holds events before start_ts, so it is empty once trimmed
+  path = str(tmp_path/'seek.evarc')
+  with ArchiveWriter(path, block_us=10000) as writer:
+    writer.write(make_events([100, 200, 300, 25000, 25100, 40000]))
+
+  buffers = list(ArchiveEventsIterator(path, delta_t=5000, start_ts=5000))
+  assert [b['t'].tolist() for b in buffers] == [[], [], [], [], [25000, 25100], [], [], [40000]]
+  assert EventArchive(path).read(5000, 30000)['t'].tolist() == [25000, 25100]
+
+
+def test_write_back_in_time(tmp_path):
+  # t = 150 is in the current block, but before the last event written
+  with ArchiveWriter(str(tmp_path/'order.evarc'), block_us=10000) as writer:
+    writer.write(make_events([100, 200]))
+    with pytest.raises(ValueError):
+      writer.write(make_events([150]))
+    writer.write(make_events([200, 300]))
+  assert EventArchive(str(tmp_path/'order.evarc')).read(0, 1000)['t'].tolist() == [100, 200, 200, 300]
+
+
+def test_convert_npy_sensor_size(tmp_path):
+  np.save(tmp_path/'events.npy', make_events([10, 20, 30]))
+  assert convert(str(tmp_path/'events.npy'), str(tmp_path/'events.evarc'), width=640, height=480) == 3
+  assert EventArchive(str(tmp_path/'events.evarc')).get_size() == (480, 640)
@@ -0,0 +1,30 @@
+## This script tests the event storage of event_ring_buffer (python -m pytest)
+## Date: 19 Oct 2026
+
+import numpy as np
+
+from event_ring_buffer import EventRingBuffer
+from event_simulator import EVENT_DTYPE
+
+
+def make_events(t):
+  evs = np.zeros(len(t), EVENT_DTYPE)
+  evs['t'] = t
+  return evs
+
+
+def test_empty_buffer_after_release():
+  # the queued empty buffer holds no events, so the next one fits even where it points
+  ring = EventRingBuffer(n_slots=4, n_events=8)
+  assert ring.put(make_events(range(5)))
+  ring.get()
+  ring.release()
+  assert ring.put(make_events([]))
+  assert ring.put(make_events(range(5, 10)))
+  assert ring.stats()['dropped'] == 0
+
+  summary, evs = ring.get()
+  assert summary['n'] == 0 and evs.size == 0
+  ring.release()
+  summary, evs = ring.get()
+  assert evs['t'].tolist() == [5, 6, 7, 8, 9]
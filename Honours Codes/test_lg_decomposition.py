@@ -0,0 +1,58 @@
+## This script tests the purities of lg_decomposition on LG beams, noise-free and in a noisy stack (python -m pytest)
+## Date: 19 Oct 2026
+
+import numpy as np
+import pytest
+
+from lg_decomposition import LGBasis, fit_waist, lg_mode
+
+SHAPE, CENTRE, W0 = (240, 320), (160.3, 120.8), 24.
+
+
+def beam(terms, w0=W0):
+  """ Intensity of sum sqrt(a) exp(i phase) LG_pl, for terms (a, p, l, phase), peak 200 counts """
+  X, Y = np.meshgrid(np.arange(SHAPE[1]) - CENTRE[0], np.arange(SHAPE[0]) - CENTRE[1])
+  E = sum(np.sqrt(a)*np.exp(1j*phase)*lg_mode(X, Y, p, l, w0) for a, p, l, phase in terms)
+  I = np.abs(E)**2
+  return 200*I/I.max()
+
+
+def purities(basis, image):
+  orders, purity = basis.purity(basis.decompose(image)[0])
+  return dict(zip(orders, purity[0]))
+
+
+@pytest.mark.parametrize('p, l', [(0, 1), (2, 1)])
+def test_pure_mode(p, l):
+  assert purities(LGBasis(SHAPE, CENTRE, W0), beam([(1, p, l, 0)]))[(p, l)] > 0.995
+
+
+def test_coherent_same_l():
+  # LG00 and LG10 only interfere through the radial cross term
+  purity = purities(LGBasis(SHAPE, CENTRE, W0), beam([(0.7, 0, 0, 0), (0.3, 1, 0, 0.7)]))
+  assert purity[(0, 0)] == pytest.approx(0.7, abs=0.01)
+  assert purity[(1, 0)] == pytest.approx(0.3, abs=0.01)
+
+
+def test_fit_waist():
+  # a basis 5 % off gives the overlap of the two LG01, (2 w w'/(w^2 + w'^2))^4, the refitted one the pure mode
+  image = beam([(1, 0, 1, 0)], 1.05*W0)
+  assert purities(LGBasis(SHAPE, CENTRE, W0), image)[(0, 1)] == pytest.approx((2*1.05/(1 + 1.05**2))**4, abs=0.002)
+  w0 = fit_waist(image, CENTRE, W0)
+  assert w0 == pytest.approx(1.05*W0, rel=0.01)               # the purity is flat, quadratic, at its peak
+  assert purities(LGBasis(SHAPE, CENTRE, w0), image)[(0, 1)] > 0.995
+
+
+def test_noisy_stack():
+  # 90 % LG01 with LG11 at a jittered phase, 3 counts of noise: the intensity-only fit loses the LG11 in the
+  # noise, the coherent one (warm-started across the stack) finds both, within the spread of the noise
+  rng = np.random.default_rng(1)
+  images = np.array([beam([(0.9, 0, 1, 0), (0.1, 1, 1, 0.5 + 0.1*rng.standard_normal())]) + rng.normal(5, 3, SHAPE)
+                     for _ in range(32)])
+  basis = LGBasis(SHAPE, CENTRE, W0)
+  orders, purity = basis.purity(basis.decompose(images)[0])
+  purity = dict(zip(orders, purity.T))
+  assert purity[(0, 1)].mean() == pytest.approx(0.9, abs=0.02)
+  assert purity[(1, 1)].mean() == pytest.approx(0.1, abs=0.04)
+  orders, linear = basis.purity(basis.decompose(images, coherent=False)[0])
+  assert dict(zip(orders, linear.T))[(0, 1)].mean() < 0.8
@@ -0,0 +1,236 @@
+## This script compares EB tracked objects with the FLIR tracked beam quantitatively, instead of the GIF overlay
+## Both tracks are converted to mm (EB_s, FLIR_s), aligned in time by cross-correlation and in space by the median
+## offset, and every EB point is matched to the FLIR track with cKDTree queries in space-time; per-object RMSE,
+## maximum deviation and coverage are then computed with bincount, for one summary table per dataset
+## Date: 19 Oct 2026
+
+import numpy as np
+from scipy.fft import rfft, irfft, next_fast_len
+from scipy.spatial import cKDTree
+
+EB_s = 4.86e-3                # pix -> mm conversion, EBC
+FLIR_s = 6.9e-3               # pix -> mm conversion, FLIR
+
+SUMMARY_DTYPE = np.dtype([('obj_id', '<i8'), ('n', '<i8'), ('matched', '<i8'), ('coverage', '<f8'),
+                          ('rmse', '<f8'), ('max_dev', '<f8'), ('bias_x', '<f8'), ('bias_y', '<f8')])
+
+
+def load_eb_tracks(path, scale=EB_s):
+  """
+  Function loads the box centres written by the EB tracking (columns x, y, t, ..., obj_id in column 7)
+
+  OUTPUTS:
+  - track = dict of t [s], x, y [mm] and obj_id, ordered by time  [DICT of ARRAYS]
+  """
+  EB = np.loadtxt(path, ndmin=2)
+  order = np.argsort(EB[:, 2], kind='stable')
+  EB = EB[order]
+  return dict(t=EB[:, 2]*1e-6, x=EB[:, 0]*scale, y=EB[:, 1]*scale, obj_id=EB[:, 7].astype(np.int64))
+
+
+def load_flir_track(path, scale=FLIR_s, fps=33, mirror_width=None):
+  """
+  Function loads the per-frame Gaussian fits of the FLIR video (fit_results.txt: A x_mean x_var y_mean y_var)
+
+  INPUTS:
+  - fps = frame rate of the FLIR video                [FLOAT, Hz]
+  - mirror_width = image width to flip x, as the beam splitter mirrors the FLIR view  [INT, pixel]
+
+  OUTPUTS:
+  - track = dict of t [s], x, y [mm]                  [DICT of ARRAYS]
+  """
+  fits = np.loadtxt(path, ndmin=2)
+  x = fits[:, 1] if mirror_width is None else mirror_width - 1 - fits[:, 1]
+  return dict(t=np.arange(len(fits))/fps, x=x*scale, y=fits[:, 3]*scale)
+
+
+def estimate_time_offset(a, b, dt=None):
+  """
+  Function estimates the lag of track b behind track a by cross-correlating their mean-removed x(t) and y(t)
+
+  Both tracks are resampled on a common grid of step dt (default the median
+  sampling step of b), so the result does not depend on where the tracks
+  lie in space.
+
+  OUTPUTS:
+  - offset = add to the times of b to align it with a [FLOAT, s]
+  """
+  dt = np.median(np.diff(b['t'])) if dt is None else dt
+  grids = [np.arange(tr['t'][0], tr['t'][-1], dt) for tr in (a, b)]
+  n = next_fast_len(grids[0].size + grids[1].size)
+  corr = 0
+  for k in ('x', 'y'):
+    sa = np.interp(grids[0], a['t'], a[k])
+    sb = np.interp(grids[1], b['t'], b[k])
+    corr = corr + irfft(rfft(sa - sa.mean(), n)*np.conj(rfft(sb - sb.mean(), n)), n)
+  i = np.argmax(corr)
+  # parabolic interpolation of the peak for a sub-sample lag
+  c0, c1, c2 = corr[i - 1], corr[i], corr[(i + 1) % n]
+  lag = (i - n if i > n//2 else i) + (0.5*(c0 - c2)/(c0 - 2*c1 + c2) if c0 - 2*c1 + c2 < 0 else 0)
+  return grids[0][0] - grids[1][0] + lag*dt
+
+
+def align(eb, flir, t_offset=None, xy_offset=None):
+  """
+  Function shifts the FLIR track onto the EB one, in time and space
+
+  The time offset is estimated from the EB object with the most points, the
+  spatial offset as the median difference between that object and the FLIR
+  track interpolated at its times, unless they are given.
+
+  OUTPUTS:
+  - flir = shifted FLIR track                         [DICT of ARRAYS]
+  - t_offset, xy_offset = offsets applied             [FLOAT s, (FLOAT, FLOAT) mm]
+  """
+  ids, counts = np.unique(eb['obj_id'], return_counts=True)
+  main = eb['obj_id'] == ids[np.argmax(counts)]
+  ref = {k: v[main] for k, v in eb.items()}
+  if t_offset is None:
+    t_offset = estimate_time_offset(ref, flir)
+  t = flir['t'] + t_offset
+  if xy_offset is None:
+    inside = (ref['t'] >= t[0]) & (ref['t'] <= t[-1])
+    xy_offset = (np.median(ref['x'][inside] - np.interp(ref['t'][inside], t, flir['x'])),
+                 np.median(ref['y'][inside] - np.interp(ref['t'][inside], t, flir['y'])))
+  return dict(t=t, x=flir['x'] + xy_offset[0], y=flir['y'] + xy_offset[1]), t_offset, xy_offset
+
+
+def match_tracks(eb, flir, speed=None, max_dist=1.0):
+  """
+  Function matches every EB point to its nearest FLIR point in space-time
+
+  Time enters the tree as t*speed, so speed [mm/s] sets how many mm of
+  distance a second of time difference is worth (default: the median FLIR
+  speed, so a neighbour one frame away costs about the distance the beam moves
+  in a frame). speed=0 matches in space only.
+
+  INPUTS:
+  - eb, flir = aligned tracks                         [DICT of ARRAYS]
+  - speed = weight of time in the metric              [FLOAT, mm/s]
+  - max_dist = largest space-time distance of a match [FLOAT, mm]
+
+  OUTPUTS:
+  - index = matched FLIR point of each EB point, -1 if none  [INT ARRAY]
+  - dev = spatial distance to the match, nan if none  [FLOAT ARRAY, mm]
+  - dx, dy = EB - FLIR components                     [FLOAT ARRAY, mm]
+  """
+  if speed is None:
+    v = np.hypot(np.diff(flir['x']), np.diff(flir['y']))/np.diff(flir['t'])
+    speed = np.median(v[np.isfinite(v)])
+  tree = cKDTree(np.column_stack([flir['x'], flir['y'], flir['t']*speed]))
+  _, index = tree.query(np.column_stack([eb['x'], eb['y'], eb['t']*speed]), distance_upper_bound=max_dist,
+                        workers=-1)
+  found = index < tree.n
+  index = np.where(found, index, -1)
+  dx = np.where(found, eb['x'] - flir['x'][np.minimum(index, tree.n - 1)], np.nan)
+  dy = np.where(found, eb['y'] - flir['y'][np.minimum(index, tree.n - 1)], np.nan)
+  return index, np.hypot(dx, dy), dx, dy
+
+
+def object_metrics(obj_id, dev, dx, dy):
+  """
+  Function computes the per-object agreement, vectorised over all points
+
+  OUTPUTS:
+  - summary = per object: points, matched points, coverage (matched/points),
+    RMSE and maximum of the deviation, mean dx and dy  [SUMMARY_DTYPE ARRAY]
+  """
+  ids, inv = np.unique(obj_id, return_inverse=True)
+  found = np.isfinite(dev)
+  n = np.bincount(inv, minlength=ids.size)
+  matched = np.bincount(inv, weights=found, minlength=ids.size)
+  d = np.where(found, dev, 0)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    rmse = np.sqrt(np.bincount(inv, weights=d**2, minlength=ids.size)/matched)
+    bias_x = np.bincount(inv, weights=np.where(found, dx, 0), minlength=ids.size)/matched
+    bias_y = np.bincount(inv, weights=np.where(found, dy, 0), minlength=ids.size)/matched
+  max_dev = np.full(ids.size, np.nan)
+  np.fmax.at(max_dev, inv[found], dev[found])
+
+  out = np.empty(ids.size, SUMMARY_DTYPE)
+  out['obj_id'], out['n'], out['matched'], out['coverage'] = ids, n, matched, matched/n
+  out['rmse'], out['max_dev'], out['bias_x'], out['bias_y'] = rmse, max_dev, bias_x, bias_y
+  return out
+
+
+def flir_coverage(eb, flir, max_dist=1.0):
+  """ Fraction of the FLIR points, within the EB time span, with an EB point closer than max_dist [mm] """
+  inside = (flir['t'] >= eb['t'][0]) & (flir['t'] <= eb['t'][-1])
+  if not inside.any():
+    return np.nan
+  d, _ = cKDTree(np.column_stack([eb['x'], eb['y']])).query(
+    np.column_stack([flir['x'][inside], flir['y'][inside]]), distance_upper_bound=max_dist, workers=-1)
+  return np.mean(np.isfinite(d))
+
+
+def compare(eb, flir, t_offset=None, xy_offset=None, speed=None, max_dist=1.0):
+  """
+  Function aligns, matches and summarises one dataset
+
+  OUTPUTS:
+  - summary = per-object table                        [SUMMARY_DTYPE ARRAY]
+  - info = offsets, FLIR coverage and totals          [DICT]
+  """
+  flir, t_offset, xy_offset = align(eb, flir, t_offset, xy_offset)
+  _, dev, dx, dy = match_tracks(eb, flir, speed, max_dist)
+  summary = object_metrics(eb['obj_id'], dev, dx, dy)
+  found = np.isfinite(dev)
+  info = dict(t_offset=t_offset, xy_offset=xy_offset, flir_coverage=flir_coverage(eb, flir, max_dist),
+              n=dev.size, coverage=found.mean(), rmse=np.sqrt(np.mean(dev[found]**2)) if found.any() else np.nan,
+              max_dev=dev[found].max() if found.any() else np.nan)
+  return summary, info
+
+
+def format_summary(name, summary, info):
+  """ Table of one dataset, one line per object and one for all points """
+  lines = [f"{name}: time offset {info['t_offset']:.4f} s, offset ({info['xy_offset'][0]:.3f}, "
+           f"{info['xy_offset'][1]:.3f}) mm, FLIR coverage {info['flir_coverage']:.1%}",
+           f"  {'obj_id':>8}{'points':>10}{'matched':>10}{'coverage':>10}{'RMSE mm':>10}{'max mm':>10}"
+           f"{'bias x':>10}{'bias y':>10}"]
+  for r in summary:
+    lines.append(f"  {r['obj_id']:>8}{r['n']:>10}{r['matched']:>10}{r['coverage']:>10.1%}{r['rmse']:>10.4f}"
+                 f"{r['max_dev']:>10.4f}{r['bias_x']:>10.4f}{r['bias_y']:>10.4f}")
+  lines.append(f"  {'all':>8}{info['n']:>10}{int(summary['matched'].sum()):>10}{info['coverage']:>10.1%}"
+               f"{info['rmse']:>10.4f}{info['max_dev']:>10.4f}")
+  return '\n'.join(lines)
+
+
+def parse_args():
+  import argparse
+  """Parse command line arguments."""
+  parser = argparse.ArgumentParser(description='Quantitative comparison of EB tracked objects with the FLIR track.',
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('flir', help='FLIR Gaussian fits (fit_results.txt)')
+  parser.add_argument('eb', nargs='+', help='EB tracking .txt files, one summary table each')
+  parser.add_argument('--fps', dest='fps', type=float, default=33, help='Frame rate of the FLIR video, in Hz')
+  parser.add_argument('--mirror', dest='mirror_width', type=int, default=None,
+                      help='Flip the FLIR x coordinates for an image of this width, in pixels')
+  parser.add_argument('--t-offset', dest='t_offset', type=float, default=None,
+                      help='Time offset of the FLIR track, in s (default: cross-correlation)')
+  parser.add_argument('--xy-offset', dest='xy_offset', type=float, nargs=2, default=None,
+                      help='Spatial offset of the FLIR track, in mm (default: median difference)')
+  parser.add_argument('--speed', dest='speed', type=float, default=None,
+                      help='Weight of time in the matching metric, in mm/s (default: median FLIR speed)')
+  parser.add_argument('--max-dist', dest='max_dist', type=float, default=1.0, help='Largest match distance, in mm')
+  parser.add_argument('-o', '--output', dest='output', default=None,
+                      help='Save the per-object tables to <output>_<dataset>.txt')
+  return parser.parse_args()
+
+
+def main():
+  import os
+  args = parse_args()
+  flir = load_flir_track(args.flir, fps=args.fps, mirror_width=args.mirror_width)
+
+  for path in args.eb:
+    eb = load_eb_tracks(path)
+    summary, info = compare(eb, flir, args.t_offset, args.xy_offset, args.speed, args.max_dist)
+    name = os.path.splitext(os.path.basename(path))[0]
+    print(format_summary(name, summary, info))
+    if args.output:
+      np.savetxt(f'{args.output}_{name}.txt', np.column_stack([summary[k] for k in SUMMARY_DTYPE.names]),
+                 header=' '.join(SUMMARY_DTYPE.names), fmt='%.6g')
+
+
+if __name__ == "__main__":
+  main()